@@ -1,9 +1,12 @@
 import cv2
 import numpy as np
 import os
+import sys
 import glob
+import argparse
+import asyncio
 import tkinter as tk
-from tkinter import filedialog, messagebox
+from tkinter import filedialog, messagebox, simpledialog
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
 from ttkbootstrap.scrolled import ScrolledFrame
@@ -17,16 +20,2266 @@ from PIL import Image, ImageTk
 import concurrent.futures
 import queue
 import math
+import heapq
+import shutil
+import time
+import json
+import secrets
+import csv
+import itertools
+import subprocess
+import tempfile
+import socketserver
+import stat
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from multiprocessing import AuthenticationError
+from multiprocessing.managers import BaseManager
 
 # --- CONFIGURACIÓN ---
 CHESSBOARD_SIZE = (10, 7)  # Esquinas interiores del damero
 IMAGE_RESOLUTION = (4096, 3000)
-MAX_WORKERS = 8  # Número máximo de hilos para procesamiento concurrente
+NUCLEOS = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+MAX_WORKERS = max(8, NUCLEOS)  # Hilos por defecto (E/S, trabajadores, servicio): al menos 8, o uno por núcleo
+HILOS_POR_NUCLEO = 4  # Autoescalado de la detección: tope de hilos por núcleo (almacenamiento lento)
+HILOS_DETECCION_MAX = 128  # Tope absoluto de detecciones simultáneas (cada una retiene una imagen completa)
+VENTANA_AUTOESCALADO = 2.0  # Segundos de medida entre ajustes del número de hilos
 REDUCED_RESOLUTION = (1024, 768)  # Resolución reducida para procesamiento interno
+REJILLA_COBERTURA = (8, 6)  # Celdas (columnas, filas) para el análisis de cobertura del sensor
+REJILLA_SELECCION = (64, 48)  # Rejilla reducida para la selección automática de imágenes
+TAMANO_FIRMA = (32, 24)  # Miniatura para detectar fotogramas repetidos en ráfagas
+PASO_VIDEO = 10  # Fotogramas de vídeo: se considera uno de cada PASO_VIDEO
+UMBRAL_MOVIMIENTO_VIDEO = 0.0  # Diferencia media mínima de miniaturas para aceptar un fotograma (0 = solo paso)
+FILAS_RASTERIZADO = 1 << 20  # Filas de polígono por bloque al rasterizar (acota la memoria temporal)
+VERSION_RASTERIZADO = 2  # Se guarda con cada sesión; los acumuladores de otra versión se reconstruyen al abrirla
+UMBRAL_RAFAGA = 2.0  # Diferencia media máxima (niveles de gris) entre miniaturas de fotogramas repetidos
+TOLERANCIA_DUPLICADOS = 1.0  # Desplazamiento máximo de esquinas (% de la diagonal) para considerar duplicada una pose
+NITIDEZ_MINIMA = 50.0  # Varianza del laplaciano (en la imagen reducida) por debajo de la cual está desenfocada
+RECORTADOS_MAXIMOS = 60.0  # % máximo de píxeles saturados a negro o blanco (un damero ya tiene muchos)
+CONTRASTE_MINIMO = 15.0  # Desviación típica mínima de los niveles de gris
 # --- FIN CONFIGURACIÓN ---
 
+# Nombres de las variantes de preprocesamiento, en el orden en que se prueban
+NOMBRES_VARIANTES = ['original', 'ecualizada', 'clahe', 'gamma', 'bilateral', 'canny',
+                     'clahe_gamma', 'umbral_adaptativo']
+
+
+class PerfilImagen:
+    """Tiempos por etapa de la detección de una imagen (reales y de CPU del hilo)"""
+    def __init__(self, filename):
+        self.filename = filename
+        self.tiempos = {}  # etapa -> segundos
+        self.cpu = {}  # etapa -> segundos de CPU; la diferencia con tiempos es espera (disco, red, GIL)
+        self.variante = None  # variante que detectó el damero ('SB' si fue el fallback)
+        self.calidad = None  # (nitidez, % recortados, contraste) de la imagen reducida
+        self.defectos = []  # defectos de calidad por debajo de los umbrales ('desenfocada', ...)
+
+    @contextmanager
+    def etapa(self, nombre):
+        inicio = time.perf_counter()
+        inicio_cpu = time.thread_time()
+        try:
+            yield
+        finally:
+            self.tiempos[nombre] = self.tiempos.get(nombre, 0.0) + time.perf_counter() - inicio
+            self.cpu[nombre] = self.cpu.get(nombre, 0.0) + time.thread_time() - inicio_cpu
+
+
+class InformeEjecucion:
+    """Agrega los perfiles de todas las imágenes de una cámara y los guarda en JSON/CSV"""
+    def __init__(self, camera_name, detection_sensitivity, max_workers):
+        self.camera_name = camera_name
+        self.detection_sensitivity = detection_sensitivity
+        self.max_workers = max_workers
+        self.perfiles = []
+        self.contadores = {}  # contadores adicionales de la ejecución (p. ej. fotogramas de ráfaga)
+        self.lock = threading.Lock()
+        self.inicio = time.perf_counter()
+        self.duracion = None
+
+    def registrar(self, perfil):
+        with self.lock:
+            self.perfiles.append(perfil)
+
+    def finalizar(self):
+        self.duracion = time.perf_counter() - self.inicio
+
+    def resumen(self):
+        tiempos_por_etapa = {}
+        cpu_por_etapa = {}
+        variantes = {}
+        for perfil in self.perfiles:
+            for etapa, segundos in perfil.tiempos.items():
+                tiempos_por_etapa.setdefault(etapa, []).append(segundos)
+                cpu_por_etapa[etapa] = cpu_por_etapa.get(etapa, 0.0) + perfil.cpu.get(etapa, 0.0)
+            clave = perfil.variante if perfil.variante is not None else 'ninguna'
+            variantes[clave] = variantes.get(clave, 0) + 1
+
+        etapas = {}
+        for etapa, valores in sorted(tiempos_por_etapa.items()):
+            valores_ms = np.array(valores) * 1000.0
+            total_s = float(valores_ms.sum()) / 1000.0
+            etapas[etapa] = {
+                'n': len(valores),
+                'total_s': round(total_s, 3),
+                'cpu_s': round(cpu_por_etapa[etapa], 3),
+                'espera_pct': round(100.0 * max(0.0, 1.0 - cpu_por_etapa[etapa] / total_s), 1) if total_s > 0 else 0.0,
+                'media_ms': round(float(valores_ms.mean()), 2),
+                'mediana_ms': round(float(np.median(valores_ms)), 2),
+                'p95_ms': round(float(np.percentile(valores_ms, 95)), 2),
+                'max_ms': round(float(valores_ms.max()), 2),
+            }
+
+        detectadas = sum(1 for p in self.perfiles if p.variante is not None)
+        return {
+            'camara': self.camera_name,
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'sensibilidad': self.detection_sensitivity,
+            'max_workers': self.max_workers,
+            'duracion_s': round(self.duracion, 3) if self.duracion is not None else None,
+            'imagenes': len(self.perfiles),
+            'detectadas': detectadas,
+            'variantes_exitosas': variantes,
+            'contadores': self.contadores,
+            'etapas': etapas,
+        }
+
+    def guardar(self, output_path):
+        """Escribe <mapa>_informe.json (agregado) y <mapa>_informe.csv (por imagen)"""
+        base = os.path.splitext(output_path)[0]
+        json_path = base + "_informe.json"
+        csv_path = base + "_informe.csv"
+
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(self.resumen(), f, indent=2, ensure_ascii=False)
+
+        etapas = sorted({etapa for p in self.perfiles for etapa in p.tiempos})
+        with open(csv_path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['archivo', 'variante', 'nitidez', 'recortados_pct', 'contraste']
+                            + [f"{etapa}_ms" for etapa in etapas])
+            for perfil in self.perfiles:
+                writer.writerow(
+                    [os.path.basename(perfil.filename), perfil.variante or '']
+                    + ([f"{valor:.1f}" for valor in perfil.calidad] if perfil.calidad is not None else ['', '', ''])
+                    + [f"{perfil.tiempos[etapa] * 1000.0:.2f}" if etapa in perfil.tiempos else '' for etapa in etapas]
+                )
+        return json_path, csv_path
+
+
+class AutoescaladoHilos:
+    """Número de detecciones simultáneas que se ajusta durante la ejecución.
+
+    En cada ventana compara la CPU que usa el proceso con la disponible (núcleos × tiempo real)
+    y mide qué parte del tiempo de las tareas no es CPU propia (lectura de disco o red, GIL).
+    Si la CPU no está saturada y las tareas esperan, sube los hilos; si la subida no mejora
+    las imágenes por segundo, vuelve al valor anterior y lo mantiene hasta el final.
+    """
+
+    def __init__(self, nucleos=NUCLEOS, minimo=2, maximo=None, ventana=VENTANA_AUTOESCALADO):
+        self.nucleos = nucleos
+        self.minimo = minimo
+        self.maximo = maximo or min(HILOS_DETECCION_MAX, max(8, HILOS_POR_NUCLEO * nucleos))
+        self.hilos = min(max(nucleos, minimo), self.maximo)
+        self.ventana = ventana
+        self.historial = [self.hilos]
+        self.fijo = False
+        self.anterior = None  # (hilos, imágenes/s) antes de la última subida
+        self._reiniciar()
+
+    def _reiniciar(self):
+        self.inicio = time.perf_counter()
+        self.inicio_cpu = time.process_time()
+        self.completadas = 0
+        self.tiempo_tareas = 0.0
+        self.cpu_tareas = 0.0
+
+    def registrar(self, perfil):
+        """Anota una tarea terminada (desde el hilo que reparte las tareas)"""
+        self.completadas += 1
+        self.tiempo_tareas += perfil.tiempos.get("total", 0.0)
+        self.cpu_tareas += perfil.cpu.get("total", 0.0)
+
+    def ajustar(self):
+        """Cierra la ventana si ha pasado su tiempo. Devuelve una descripción si cambia el número de hilos"""
+        duracion = time.perf_counter() - self.inicio
+        if self.fijo or duracion < self.ventana or self.completadas < self.hilos:
+            return None
+        uso = (time.process_time() - self.inicio_cpu) / (duracion * self.nucleos)
+        espera = 1.0 - self.cpu_tareas / self.tiempo_tareas if self.tiempo_tareas > 0 else 0.0
+        rendimiento = self.completadas / duracion
+        self._reiniciar()
+        
+        anteriores = self.hilos
+        if self.anterior is not None and rendimiento < 1.05 * self.anterior[1]:
+            # Más hilos no compensaron (p. ej. espera del GIL o disco saturado)
+            self.hilos = self.anterior[0]
+            self.fijo = True
+        elif uso < 0.85 and espera > 0.2 and self.hilos < self.maximo:
+            self.anterior = (self.hilos, rendimiento)
+            self.hilos = min(self.maximo, self.hilos + max(1, self.hilos // 2))
+        else:
+            self.anterior = None
+            return None
+        self.historial.append(self.hilos)
+        return f"{anteriores} → {self.hilos} hilos (CPU {uso:.0%}, espera {espera:.0%}, {rendimiento:.1f} img/s)"
+
+
+@contextmanager
+def hilos_opencv(hilos, nucleos=NUCLEOS):
+    """Reparte los núcleos entre `hilos` detecciones simultáneas limitando los hilos internos de OpenCV"""
+    anteriores = cv2.getNumThreads()
+    cv2.setNumThreads(max(1, nucleos // max(1, hilos)))
+    try:
+        yield cv2.getNumThreads()
+    finally:
+        cv2.setNumThreads(anteriores)
+
+
+def contorno_esquinas_visibles(esquinas, chessboard_size):
+    """Tablero parcial (esquinas no vistas a NaN): (cuadrilátero 4 x 2, envolvente convexa V x 2).
+
+    El cuadrilátero une las esquinas visibles más próximas a cada esquina del tablero, en el
+    mismo orden que poligono_desde_esquinas, y sirve para la escala e inclinación; la
+    envolvente de todas las visibles es el área cubierta.
+    """
+    esquinas = np.asarray(esquinas, dtype=np.float32).reshape(-1, 2)
+    indices = np.flatnonzero(~np.isnan(esquinas).any(axis=1))
+    puntos = esquinas[indices]
+    col, fila = indices % chessboard_size[0], indices // chessboard_size[0]
+    cuadrilatero = puntos[[np.argmin(col + fila), np.argmax(col - fila), np.argmax(col + fila), np.argmin(col - fila)]]
+    contorno = cv2.convexHull(puntos).reshape(-1, 2)
+    return cuadrilatero, contorno
+
+
+def poligono_desde_esquinas(esquinas, chessboard_size):
+    """Calcula (pts, bbox, centroid) a partir de las esquinas interiores en resolución original"""
+    esquinas = np.asarray(esquinas).reshape(-1, 2)
+    
+    if np.isnan(esquinas).any():
+        # Tablero parcial: área de las esquinas visibles
+        _, extremos = contorno_esquinas_visibles(esquinas, chessboard_size)
+    else:
+        # Esquinas del tablero: superior izquierda, superior derecha, inferior derecha, inferior izquierda
+        extremos = esquinas[[0, chessboard_size[0] - 1, -1, -chessboard_size[0]]]
+    pts = extremos.astype(np.int32).reshape((-1, 1, 2))
+    
+    # Calcular bounding box
+    x_coords = pts[:,0,0]
+    y_coords = pts[:,0,1]
+    bbox = (int(min(x_coords)), int(min(y_coords)), int(max(x_coords)), int(max(y_coords)))
+    
+    # Calcular centroide
+    centroid = (int(np.mean(x_coords)), int(np.mean(y_coords)))
+    return pts, bbox, centroid
+
+
+def _internar_rutas(archivos):
+    """Separa las rutas en una tabla de carpetas sin repetir, el índice de carpeta y el nombre"""
+    carpetas, indices, id_carpeta, nombres = [], {}, [], []
+    for ruta in archivos:
+        nombre = os.path.basename(ruta)
+        carpeta = ruta[:len(ruta) - len(nombre)]  # con el separador final, para reconstruir la ruta exacta
+        if carpeta not in indices:
+            indices[carpeta] = len(carpetas)
+            carpetas.append(carpeta)
+        id_carpeta.append(indices[carpeta])
+        nombres.append(sys.intern(nombre))
+    return carpetas, np.array(id_carpeta, dtype=np.int32), nombres
+
+
+class Poligonos:
+    """Polígonos del tablero de todas las imágenes de una cámara, guardados por columnas.
+
+    Sustituye a la lista de tuplas (filename, polygon, bbox, centroid): las esquinas exteriores
+    (N x 4 x 2 float32), los bbox (N x 4) y los centroides (N x 2) son arrays, las rutas una tabla
+    de carpetas más nombres y la selección una máscara booleana. Indexar una posición sigue
+    devolviendo la tupla para el código que trata las imágenes de una en una.
+    
+    El área cubierta es `contornos`: los propios cuadriláteros o, si hay tableros parciales,
+    polígonos convexos N x V x 2 que repiten su último vértice hasta completar V.
+    """
+
+    def __init__(self, archivos, cuadrilateros, seleccion=None, contornos=None):
+        self.cuadrilateros = np.asarray(cuadrilateros, dtype=np.float32).reshape(-1, 4, 2)
+        if contornos is None:
+            self.contornos = self.cuadrilateros
+        else:
+            self.contornos = np.asarray(contornos, dtype=np.float32).reshape(len(self.cuadrilateros), -1, 2)
+        puntos = self.puntos
+        self.bboxes = np.concatenate([puntos.min(axis=1), puntos.max(axis=1)], axis=1)  # x_min, y_min, x_max, y_max
+        self.centroides = puntos.mean(axis=1).astype(np.int32)
+        self.carpetas, self.id_carpeta, self.nombres = _internar_rutas(archivos)
+        if seleccion is None:
+            self.seleccion = np.ones(len(self.nombres), dtype=bool)
+        else:
+            self.seleccion = np.array(seleccion, dtype=bool)
+
+    @classmethod
+    def desde_esquinas(cls, archivos, esquinas, chessboard_size):
+        """Polígonos a partir de las esquinas interiores (N x K x 2) de todas las imágenes"""
+        esquinas = np.asarray(esquinas)
+        extremos = [0, chessboard_size[0] - 1, -1, -chessboard_size[0]]  # mismo orden que poligono_desde_esquinas
+        cuadrilateros = esquinas[:, extremos]
+        parciales = np.flatnonzero(np.isnan(esquinas).any(axis=(1, 2)))
+        if not len(parciales):
+            return cls(archivos, cuadrilateros)
+        
+        # Tableros parciales (ChArUco): cuadrilátero aproximado y envolvente de las esquinas visibles
+        cuadrilateros = np.array(cuadrilateros, dtype=np.float32)
+        formas = [contorno_esquinas_visibles(esquinas[i], chessboard_size) for i in parciales]
+        vertices = max(4, max(len(contorno) for _, contorno in formas))
+        contornos = np.concatenate([cuadrilateros, np.repeat(cuadrilateros[:, 3:], vertices - 4, axis=1)], axis=1)
+        for i, (cuadrilatero, contorno) in zip(parciales, formas):
+            cuadrilateros[i] = cuadrilatero
+            contornos[i, :len(contorno)] = contorno
+            contornos[i, len(contorno):] = contorno[-1]
+        return cls(archivos, cuadrilateros, contornos=contornos)
+
+    def __len__(self):
+        return len(self.nombres)
+
+    def __getitem__(self, index):
+        """(filename, polygon, bbox, centroid) de una imagen, como en poligono_desde_esquinas"""
+        return (
+            self.archivo(index),
+            self.contornos[index].astype(np.int32).reshape(-1, 1, 2),
+            tuple(int(v) for v in self.bboxes[index]),
+            tuple(int(v) for v in self.centroides[index])
+        )
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    @property
+    def puntos(self):
+        """Contornos truncados a píxel entero (N x V x 2 int32), como los usa fillConvexPoly"""
+        return self.contornos.astype(np.int32)
+
+    @property
+    def archivos(self):
+        carpetas = self.carpetas
+        return [carpetas[c] + nombre for c, nombre in zip(self.id_carpeta.tolist(), self.nombres)]
+
+    def archivo(self, index):
+        return self.carpetas[self.id_carpeta[index]] + self.nombres[index]
+
+    def filtrar(self, mascara):
+        """Nuevos polígonos con solo las imágenes indicadas por la máscara booleana"""
+        indices = np.flatnonzero(mascara)
+        filtrados = Poligonos.__new__(Poligonos)
+        filtrados.cuadrilateros = self.cuadrilateros[indices]
+        filtrados.contornos = filtrados.cuadrilateros if self.contornos is self.cuadrilateros else self.contornos[indices]
+        filtrados.bboxes = self.bboxes[indices]
+        filtrados.centroides = self.centroides[indices]
+        filtrados.carpetas = self.carpetas
+        filtrados.id_carpeta = self.id_carpeta[indices]
+        filtrados.nombres = [self.nombres[i] for i in indices]
+        filtrados.seleccion = self.seleccion[indices]
+        return filtrados
+
+    def contienen(self, x, y, seleccion=None):
+        """Índices de los polígonos (seleccionados) que cubren el punto (x, y), borde incluido"""
+        bboxes = self.bboxes
+        candidatos = (bboxes[:, 0] <= x) & (x <= bboxes[:, 2]) & (bboxes[:, 1] <= y) & (y <= bboxes[:, 3])
+        if seleccion is not None:
+            candidatos &= np.asarray(seleccion, dtype=bool)
+        indices = np.flatnonzero(candidatos)
+        if not len(indices):
+            return indices
+        
+        # Dentro de un polígono convexo, el punto queda al mismo lado de todos los lados
+        quads = self.puntos[indices].astype(np.int64)
+        lados = np.roll(quads, -1, axis=1) - quads
+        hacia_punto = np.array([x, y], dtype=np.int64) - quads
+        cruces = lados[:, :, 0] * hacia_punto[:, :, 1] - lados[:, :, 1] * hacia_punto[:, :, 0]
+        dentro = (cruces >= 0).all(axis=1) | (cruces <= 0).all(axis=1)
+        return indices[dentro]
+
+
+def ruta_resultados(output_path):
+    """Carpeta de resultados de detección asociada a un mapa de calor"""
+    return os.path.splitext(output_path)[0] + "_deteccion"
+
+
+class ResultadosDeteccion:
+    """Esquinas completas de todas las imágenes detectadas de una cámara.
+
+    Se guardan en una carpeta con arrays .npy (esquinas en float32, N x K x 2) que se
+    pueden abrir con memoria mapeada, más un meta.json con rutas y parámetros.
+    """
+    VERSION = 1
+
+    def __init__(self, camera_name, chessboard_size, image_resolution, detection_sensitivity=None):
+        self.camera_name = camera_name
+        self.chessboard_size = tuple(chessboard_size)
+        self.image_resolution = tuple(image_resolution)
+        self.detection_sensitivity = detection_sensitivity
+        self.tablero = "damero"  # 'damero' o 'charuco' (esquinas no vistas a NaN)
+        self.archivos = []
+        self.variantes = []
+        self.esquinas = []  # lista de arrays (K, 2) mientras se acumula, array (N, K, 2) al cargar
+        self.tamanos = []  # (ancho, alto) original de cada imagen
+        self.total_files = None  # imágenes encontradas en la carpeta, detectadas o no
+        self.duplicados = None  # índice de la imagen conservada de la que cada una es duplicada (-1 si no)
+        self.calidad = []  # (nitidez, % recortados, contraste) de cada imagen, NaN si no se midió
+        self.umbrales_calidad = None  # umbrales con los que se midió (dict), o None
+
+    def __len__(self):
+        return len(self.archivos)
+
+    def agregar(self, filename, esquinas, tamano, variante=None, calidad=None):
+        self.archivos.append(filename)
+        self.esquinas.append(np.asarray(esquinas, dtype=np.float32).reshape(-1, 2))
+        self.tamanos.append(tamano)
+        self.variantes.append(variante)
+        self.calidad.append(calidad if calidad is not None else (np.nan, np.nan, np.nan))
+
+    def arrays(self):
+        """Devuelve (esquinas N x K x 2 float32, tamaños N x 2 int32)"""
+        num_esquinas = self.chessboard_size[0] * self.chessboard_size[1]
+        if isinstance(self.esquinas, list):
+            if self.esquinas:
+                self.esquinas = np.stack(self.esquinas).astype(np.float32)
+            else:
+                self.esquinas = np.zeros((0, num_esquinas, 2), dtype=np.float32)
+        if isinstance(self.tamanos, list):
+            self.tamanos = np.array(self.tamanos, dtype=np.int32).reshape(-1, 2)
+        if isinstance(self.calidad, list):
+            self.calidad = np.array(self.calidad, dtype=np.float32).reshape(-1, 3)
+        return self.esquinas, self.tamanos
+
+    def filtrar(self, mascara):
+        """Conserva solo las imágenes indicadas por la máscara booleana"""
+        esquinas, tamanos = self.arrays()
+        indices = np.flatnonzero(mascara)
+        self.archivos = [self.archivos[i] for i in indices]
+        self.variantes = [self.variantes[i] for i in indices]
+        self.esquinas = np.ascontiguousarray(esquinas[indices])
+        self.tamanos = np.ascontiguousarray(tamanos[indices])
+        self.calidad = np.ascontiguousarray(self.calidad[indices])
+        self.duplicados = None
+
+    def polygons_info(self):
+        """Reconstruye los polígonos (Poligonos) sin tocar las imágenes"""
+        esquinas, _ = self.arrays()
+        return Poligonos.desde_esquinas(self.archivos, esquinas, self.chessboard_size)
+
+    def guardar(self, output_path):
+        """Escribe la carpeta <mapa>_deteccion con esquinas.npy, tamanos.npy y meta.json"""
+        directorio = ruta_resultados(output_path)
+        os.makedirs(directorio, exist_ok=True)
+        esquinas, tamanos = self.arrays()
+        # cargar() proyecta estos archivos en memoria: se sustituyen, nunca se reescriben en su sitio
+        _guardar_npy(os.path.join(directorio, "esquinas.npy"), esquinas)
+        _guardar_npy(os.path.join(directorio, "tamanos.npy"), tamanos)
+        duplicados_path = os.path.join(directorio, "duplicados.npy")
+        if self.duplicados is not None:
+            _guardar_npy(duplicados_path, np.asarray(self.duplicados, dtype=np.int32))
+        elif os.path.exists(duplicados_path):
+            os.remove(duplicados_path)
+        # La calidad solo se guarda si se midió en alguna imagen
+        calidad_path = os.path.join(directorio, "calidad.npy")
+        if not np.isnan(self.calidad).all():
+            _guardar_npy(calidad_path, self.calidad)
+        elif os.path.exists(calidad_path):
+            os.remove(calidad_path)
+        meta = {
+            'version': self.VERSION,
+            'camara': self.camera_name,
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'chessboard_size': list(self.chessboard_size),
+            'image_resolution': list(self.image_resolution),
+            'sensibilidad': self.detection_sensitivity,
+            'tablero': self.tablero,
+            'total_archivos': self.total_files,
+            'archivos': self.archivos,
+            'variantes': self.variantes,
+            'umbrales_calidad': self.umbrales_calidad,
+        }
+        _guardar_json(os.path.join(directorio, "meta.json"), meta)
+        return directorio
+
+    @classmethod
+    def cargar(cls, directorio, mmap=True):
+        """Abre una carpeta de resultados; con mmap=True las esquinas no se leen a memoria"""
+        with open(os.path.join(directorio, "meta.json"), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        resultados = cls(meta['camara'], meta['chessboard_size'], meta['image_resolution'], meta.get('sensibilidad'))
+        resultados.archivos = meta['archivos']
+        resultados.variantes = meta['variantes']
+        resultados.total_files = meta.get('total_archivos')
+        resultados.tablero = meta.get('tablero', "damero")
+        mmap_mode = 'r' if mmap else None
+        resultados.esquinas = np.load(os.path.join(directorio, "esquinas.npy"), mmap_mode=mmap_mode)
+        resultados.tamanos = np.load(os.path.join(directorio, "tamanos.npy"), mmap_mode=mmap_mode)
+        duplicados_path = os.path.join(directorio, "duplicados.npy")
+        if os.path.exists(duplicados_path):
+            resultados.duplicados = np.load(duplicados_path)
+        calidad_path = os.path.join(directorio, "calidad.npy")
+        if os.path.exists(calidad_path):
+            resultados.calidad = np.load(calidad_path)
+        else:
+            resultados.calidad = np.full((len(resultados.archivos), 3), np.nan, dtype=np.float32)
+        resultados.umbrales_calidad = meta.get('umbrales_calidad')
+        return resultados
+
+
+def ruta_mapa_desde_resultados(directorio):
+    """Ruta del mapa de calor asociado a una carpeta de resultados de detección"""
+    directorio = os.path.normpath(directorio)
+    if directorio.endswith("_deteccion"):
+        directorio = directorio[:-len("_deteccion")]
+    return directorio + ".png"
+
+
+def _division_techo(a, b):
+    return -((-a) // b)
+
+
+def _division_truncada(a, b):
+    """a / b truncada hacia cero, como la división entera de C (b > 0)"""
+    return np.where(a >= 0, a // b, -((-a) // b))
+
+
+def _recortar_lineas(x1, y1, x2, y2, ancho, alto):
+    """cv2.clipLine vectorizado (mismas operaciones y truncados). Devuelve (x1, y1, x2, y2, visible)"""
+    derecha, abajo = ancho - 1, alto - 1
+    c1 = (x1 < 0) + (x1 > derecha) * 2 + (y1 < 0) * 4 + (y1 > abajo) * 8
+    c2 = (x2 < 0) + (x2 > derecha) * 2 + (y2 < 0) * 4 + (y2 > abajo) * 8
+    recortar = ((c1 & c2) == 0) & ((c1 | c2) != 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Primero contra los bordes superior e inferior...
+        r = recortar & ((c1 & 12) != 0)
+        a = np.where(c1 < 8, 0, abajo)
+        x1 = np.where(r, x1 + np.trunc((a - y1).astype(np.float64) * (x2 - x1) / (y2 - y1)).astype(np.int64), x1)
+        y1 = np.where(r, a, y1)
+        c1 = np.where(r, (x1 < 0) + (x1 > derecha) * 2, c1)
+        r = recortar & ((c2 & 12) != 0)
+        a = np.where(c2 < 8, 0, abajo)
+        x2 = np.where(r, x2 + np.trunc((a - y2).astype(np.float64) * (x2 - x1) / (y2 - y1)).astype(np.int64), x2)
+        y2 = np.where(r, a, y2)
+        c2 = np.where(r, (x2 < 0) + (x2 > derecha) * 2, c2)
+        # ...y después contra los laterales
+        lateral = recortar & ((c1 & c2) == 0) & ((c1 | c2) != 0)
+        r = lateral & (c1 != 0)
+        a = np.where(c1 == 1, 0, derecha)
+        y1 = np.where(r, y1 + np.trunc((a - x1).astype(np.float64) * (y2 - y1) / (x2 - x1)).astype(np.int64), y1)
+        x1 = np.where(r, a, x1)
+        c1 = np.where(r, 0, c1)
+        r = lateral & (c2 != 0)
+        a = np.where(c2 == 1, 0, derecha)
+        y2 = np.where(r, y2 + np.trunc((a - x2).astype(np.float64) * (y2 - y1) / (x2 - x1)).astype(np.int64), y2)
+        x2 = np.where(r, a, x2)
+        c2 = np.where(r, 0, c2)
+    return x1, y1, x2, y2, (c1 | c2) == 0
+
+
+def _unir_tramos(fila, izquierda, derecha):
+    """Une los tramos que se solapan o tocan dentro de cada fila. Devuelve (fila, izquierda, derecha)"""
+    # La fila desplazada separa las filas al ordenar y al acumular el máximo del final
+    escala = np.int64(1) << 32
+    orden = np.argsort(fila * escala + izquierda)
+    fila, izquierda, derecha = fila[orden], izquierda[orden], derecha[orden]
+    fin = np.maximum.accumulate(fila * escala + derecha)
+    nuevo = np.ones(len(fila), dtype=bool)
+    nuevo[1:] = fila[1:] * escala + izquierda[1:] > fin[:-1] + 1
+    inicios = np.flatnonzero(nuevo)
+    finales = np.append(inicios[1:] - 1, len(fila) - 1)
+    return fila[inicios], izquierda[inicios], fin[finales] - fila[inicios] * escala
+
+
+def _tramos_cuadrilateros(puntos, image_resolution):
+    """Tramos horizontales (fila, x izquierda, x derecha) que cubren N polígonos convexos (N x V x 2).
+
+    Reproduce cv2.fillConvexPoly (LINE_8, sin desplazamiento) píxel a píxel: el relleno por
+    filas con la x de los lados en coma fija de 16 bits y, encima, el contorno trazado con
+    líneas de 8 vecinos recortadas a la imagen. Las filas fuera de la imagen se omiten.
+    Una línea recortada cambia de pendiente y puede dejar huecos junto al relleno, así que
+    en esas filas puede haber más de un tramo.
+    """
+    ancho, alto = image_resolution
+    puntos = puntos.astype(np.int64)
+    num_poligonos, num_vertices = puntos.shape[:2]
+    y_min = np.maximum(puntos[:, :, 1].min(axis=1), 0)
+    y_max = np.minimum(puntos[:, :, 1].max(axis=1), alto - 1)
+    filas = np.maximum(y_max - y_min + 1, 0)
+    primera_fila = np.cumsum(filas) - filas  # posición de la primera fila de cada polígono
+    total = int(filas.sum())
+    
+    y = np.arange(total, dtype=np.int64) - np.repeat(primera_fila - y_min, filas)
+    vacio_izq, vacio_der = np.iinfo(np.int64).max, np.iinfo(np.int64).min
+    
+    def filas_de(desde, hasta):
+        """Índice de polígono y fila de cada fila [desde, hasta] de cada polígono (recortadas)"""
+        desde = np.maximum(desde, y_min)
+        hasta = np.minimum(hasta, y_max)
+        n = np.maximum(hasta - desde + 1, 0)
+        indice = np.repeat(np.arange(num_poligonos), n)
+        yy = np.arange(int(n.sum()), dtype=np.int64) - np.repeat(np.cumsum(n) - n - desde, n)
+        return indice, yy, primera_fila[indice] + yy - y_min[indice]
+    
+    # Relleno: cada lado no horizontal cubre las filas [arriba, abajo) con x en coma fija,
+    # avanzando un paso (redondeado hacia cero) por fila; la última fila solo la pinta el contorno
+    relleno_izq = np.full(total, vacio_izq, dtype=np.int64)
+    relleno_der = np.full(total, vacio_der, dtype=np.int64)
+    for k in range(num_vertices):
+        p0, p1 = puntos[:, k], puntos[:, (k + 1) % num_vertices]
+        invertir = p0[:, 1] > p1[:, 1]
+        p0, p1 = np.where(invertir[:, None], p1, p0), np.where(invertir[:, None], p0, p1)
+        dy = p1[:, 1] - p0[:, 1]
+        indice, yy, fila = filas_de(p0[:, 1], np.where(dy > 0, p1[:, 1] - 1, p0[:, 1] - 1))
+        paso = _division_truncada((p1[:, 0] - p0[:, 0]) * (2 << 16) + dy, np.maximum(2 * dy, 1))
+        x = (p0[indice, 0] << 16) + (yy - p0[indice, 1]) * paso[indice]
+        x = (x + (1 << 15)) >> 16
+        # Cada lado pasa una sola vez por cada fila: basta con indexar
+        relleno_izq[fila] = np.minimum(relleno_izq[fila], x)
+        relleno_der[fila] = np.maximum(relleno_der[fila], x)
+    fuera = (relleno_der < 0) | (relleno_izq >= ancho)
+    izquierda = np.where(fuera, vacio_izq, np.maximum(relleno_izq, 0))
+    derecha = np.where(fuera, vacio_der, np.minimum(relleno_der, ancho - 1))
+    
+    # Contorno: la línea del vértice anterior a cada vértice, recortada a la imagen y
+    # recorrida de izquierda a derecha (Bresenham de 8 vecinos, empates hacia el origen)
+    sueltos = []  # tramos de las líneas recortadas: (fila, izquierda, derecha)
+    for k in range(num_vertices):
+        x1, y1, x2, y2, visible = _recortar_lineas(
+            puntos[:, k - 1, 0], puntos[:, k - 1, 1], puntos[:, k, 0], puntos[:, k, 1], ancho, alto
+        )
+        recortada = ((x1 != puntos[:, k - 1, 0]) | (y1 != puntos[:, k - 1, 1])
+                     | (x2 != puntos[:, k, 0]) | (y2 != puntos[:, k, 1]))
+        invertir = x2 < x1
+        xs, ys = np.where(invertir, x2, x1), np.where(invertir, y2, y1)
+        xe, ye = np.where(invertir, x1, x2), np.where(invertir, y1, y2)
+        dx, dy = xe - xs, np.abs(ye - ys)
+        indice, yy, fila = filas_de(np.where(visible, np.minimum(ys, ye), 1), np.where(visible, np.maximum(ys, ye), 0))
+        xs, ys, dx, dy = xs[indice], ys[indice], dx[indice], dy[indice]
+        j = np.abs(yy - ys)  # paso en el eje menor (líneas tumbadas) o mayor (empinadas)
+        divisor = np.maximum(2 * dy, 1)
+        # Tumbadas: los i con ceil((2 dy i - dx) / (2 dx)) = j; empinadas: un píxel por fila
+        izq = np.where(dy == 0, xs, xs + np.maximum((2 * dx * j - dx) // divisor + 1, 0))
+        der = np.where(dy == 0, xs + dx, xs + np.minimum((2 * dx * j + dx) // divisor, dx))
+        empinada = dy > dx
+        x_empinada = xs + _division_techo(2 * dx * j - dy, divisor)
+        izq = np.where(empinada, x_empinada, izq)
+        der = np.where(empinada, x_empinada, der)
+        contigua = ~recortada[indice]
+        fila_contigua = fila[contigua]
+        izquierda[fila_contigua] = np.minimum(izquierda[fila_contigua], izq[contigua])
+        derecha[fila_contigua] = np.maximum(derecha[fila_contigua], der[contigua])
+        if not contigua.all():
+            sueltos.append((fila[~contigua], izq[~contigua], der[~contigua]))
+    if not sueltos:
+        return y, izquierda, derecha
+    
+    # Filas con líneas recortadas: su tramo principal y los de las líneas se unen aparte
+    fila, izq, der = (np.concatenate(partes) for partes in zip(*sueltos))
+    afectada = np.zeros(total, dtype=bool)
+    afectada[fila] = True
+    afectadas = np.flatnonzero(afectada)
+    principal = afectadas[izquierda[afectadas] <= derecha[afectadas]]
+    fila, izq, der = _unir_tramos(np.concatenate([principal, fila]), np.concatenate([izquierda[principal], izq]),
+                                  np.concatenate([derecha[principal], der]))
+    izquierda[afectadas], derecha[afectadas] = vacio_izq, vacio_der
+    return (np.concatenate([y, y[fila]]), np.concatenate([izquierda, izq]), np.concatenate([derecha, der]))
+
+
+def rasterizar_cuadrilateros(puntos, image_resolution, filas_por_bloque=FILAS_RASTERIZADO):
+    """Mapa de conteos de N polígonos convexos (N x 4 x 2, o N x V x 2) en una pasada.
+
+    Cada fila de cada polígono se convierte en un tramo que suma +1 al inicio y -1 tras el
+    final en un array de diferencias; una suma acumulada por filas da el conteo. Los
+    polígonos se procesan por bloques para acotar la memoria temporal. El resultado es
+    idéntico a sumar un cv2.fillConvexPoly por polígono; 2000 tableros en un mapa de
+    4096x3000 tardan alrededor de 1 s (frente a unos 4 s del bucle por polígono).
+    """
+    width, height = image_resolution
+    stride = width + 1
+    diferencias = np.zeros(height * stride, dtype=np.int32)
+    
+    puntos = np.asarray(puntos)
+    puntos = puntos.reshape(len(puntos), -1, 2)
+    filas = np.minimum(puntos[:, :, 1].max(axis=1), height - 1) - np.maximum(puntos[:, :, 1].min(axis=1), 0) + 1
+    filas_acumuladas = np.cumsum(np.maximum(filas, 0))
+    total_filas = int(filas_acumuladas[-1]) if len(filas_acumuladas) else 0
+    cortes = np.searchsorted(filas_acumuladas, np.arange(filas_por_bloque, total_filas, filas_por_bloque))
+    for bloque in np.split(puntos, cortes):
+        if not len(bloque):
+            continue
+        y, izquierda, derecha = _tramos_cuadrilateros(bloque, image_resolution)
+        xl = np.clip(izquierda, 0, width)
+        xr = np.clip(derecha, -1, width - 1)
+        valido = xl <= xr
+        if not valido.any():
+            continue
+        fila = y[valido] * stride
+        inicio = fila + xl[valido]
+        fin = fila + xr[valido] + 1
+        
+        # Contar solo en el rango de índices que toca el bloque
+        base = int(inicio.min())
+        tamano = int(fin.max()) - base + 1
+        conteo = np.bincount(inicio - base, minlength=tamano)
+        conteo -= np.bincount(fin - base, minlength=tamano)
+        diferencias[base:base + tamano] += conteo
+    
+    conteos = diferencias.reshape(height, stride)
+    np.cumsum(conteos, axis=1, out=conteos)
+    return conteos[:, :width].astype(np.float32)
+
+
+def rasterizar_poligonos(polygons_info, image_resolution, selected=None):
+    """Construye el mapa de calor sumando los polígonos seleccionados"""
+    puntos = polygons_info.puntos
+    if selected is not None:
+        puntos = puntos[np.asarray(selected, dtype=bool)]
+    return rasterizar_cuadrilateros(puntos, image_resolution)
+
+
+def mascara_poligono(polygons_info, index, image_resolution):
+    """Máscara de un polígono dentro de su bbox recortado: ((slice y, slice x), máscara) o None"""
+    width, height = image_resolution
+    x_min, y_min, x_max, y_max = polygons_info.bboxes[index].tolist()
+    x_min, y_min = max(x_min, 0), max(y_min, 0)
+    x_max, y_max = min(x_max, width - 1), min(y_max, height - 1)
+    if x_max < x_min or y_max < y_min:
+        return None
+    local = polygons_info.puntos[index:index + 1] - np.array([x_min, y_min], dtype=np.int32)
+    mascara = rasterizar_cuadrilateros(local, (x_max - x_min + 1, y_max - y_min + 1))
+    return (slice(y_min, y_max + 1), slice(x_min, x_max + 1)), mascara
+
+
+def guardar_sesion(output_path, selected, heatmap):
+    """Guarda la selección y el acumulador del visor junto a los resultados de detección"""
+    return guardar_sesion_en(ruta_resultados(output_path), selected, heatmap)
+
+
+def guardar_sesion_en(directorio, selected, heatmap):
+    """Guarda la selección y el acumulador en una carpeta de resultados concreta"""
+    os.makedirs(directorio, exist_ok=True)
+    _guardar_npy(os.path.join(directorio, "seleccion.npy"), np.asarray(selected, dtype=bool))
+    
+    # El acumulador solo contiene conteos enteros: se guarda en uint16 cuando cabe
+    if heatmap.size and heatmap.min() >= 0 and heatmap.max() < 65536:
+        heatmap = np.rint(heatmap).astype(np.uint16)
+    _guardar_npy(os.path.join(directorio, "heatmap.npy"), heatmap)
+    _guardar_json(os.path.join(directorio, "sesion.json"), {'rasterizado': VERSION_RASTERIZADO})
+    return directorio
+
+
+def _guardar_npy(path, array):
+    # Escribir en un archivo nuevo y sustituirlo: truncar el original rompería las proyecciones en memoria abiertas
+    tmp_path = path + ".tmp.npy"
+    np.save(tmp_path, array)
+    os.replace(tmp_path, path)
+
+
+def _guardar_json(path, datos):
+    # Igual que _guardar_npy: un lector nunca ve el archivo a medio escribir
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(datos, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def version_rasterizado(directorio):
+    """Versión del rasterizado con la que se guardó el acumulador de la sesión (None si no consta)"""
+    try:
+        with open(os.path.join(directorio, "sesion.json"), 'r', encoding='utf-8') as f:
+            return json.load(f).get('rasterizado')
+    except (OSError, ValueError):
+        return None
+
+
+def cargar_sesion(directorio, mmap=False):
+    """Abre una sesión guardada y devuelve (resultados, polygons_info, selected, heatmap).
+
+    Con mmap=True el acumulador guardado se proyecta en memoria de solo lectura (en su tipo
+    guardado) en lugar de cargarse como float32.
+    """
+    resultados = ResultadosDeteccion.cargar(directorio)
+    polygons_info = resultados.polygons_info()
+    
+    seleccion_path = os.path.join(directorio, "seleccion.npy")
+    if os.path.exists(seleccion_path):
+        seleccion = np.load(seleccion_path)
+        if len(seleccion) == len(polygons_info):
+            polygons_info.seleccion[:] = seleccion
+    selected = polygons_info.seleccion
+    
+    # Reutilizar el acumulador guardado si corresponde a esta resolución y a este rasterizado; si no, reconstruirlo
+    heatmap = None
+    heatmap_path = os.path.join(directorio, "heatmap.npy")
+    if os.path.exists(heatmap_path) and version_rasterizado(directorio) == VERSION_RASTERIZADO:
+        heatmap = np.load(heatmap_path, mmap_mode='r')
+        if not mmap:
+            heatmap = heatmap.astype(np.float32)
+        if heatmap.shape != (resultados.image_resolution[1], resultados.image_resolution[0]):
+            heatmap = None
+    if heatmap is None:
+        heatmap = rasterizar_poligonos(polygons_info, resultados.image_resolution, selected)
+    
+    return resultados, polygons_info, selected, heatmap
+
+
+def miniatura_heatmap(heatmap, tamano=(300, 225)):
+    """Miniatura RGB del mapa de calor; se reduce antes de colorear para no crear la imagen completa"""
+    minimo, maximo = float(heatmap.min()), float(heatmap.max())
+    reducido = cv2.resize(np.asarray(heatmap), tamano, interpolation=cv2.INTER_AREA).astype(np.float32)
+    escala = 255.0 / (maximo - minimo) if maximo > minimo else 0.0
+    normalizado = np.clip((reducido - minimo) * escala, 0, 255).astype(np.uint8)
+    color_map = cv2.applyColorMap(normalizado, cv2.COLORMAP_JET)
+    return cv2.cvtColor(color_map, cv2.COLOR_BGR2RGB)
+
+
+# Extensiones de imagen reconocidas (sin distinguir mayúsculas/minúsculas)
+EXTENSIONES_IMAGEN = ('.jpg', '.jpeg', '.png', '.bmp', '.tiff')
+EXTENSIONES_VIDEO = ('.mp4', '.avi', '.mov', '.mkv')
+
+
+def es_video(ruta):
+    return os.path.splitext(ruta)[1].lower() in EXTENSIONES_VIDEO
+
+
+def ruta_fotograma(video_path, indice):
+    """Referencia a un fotograma de vídeo, usada en lugar de la ruta de una imagen"""
+    return f"{video_path}#{indice}"
+
+
+def separar_fotograma(ruta):
+    """Devuelve (vídeo, índice) para una referencia a fotograma o (ruta, None) para una imagen"""
+    base, sep, indice = ruta.rpartition('#')
+    if sep and indice.isdigit() and es_video(base):
+        return base, int(indice)
+    return ruta, None
+
+
+def clave_orden(ruta):
+    """Orden de captura: por archivo y, dentro de un vídeo, por número de fotograma"""
+    video, indice = separar_fotograma(ruta)
+    return video, -1 if indice is None else indice
+
+
+def nombre_exportacion(ruta):
+    """Nombre de archivo de imagen para una ruta; los fotogramas se nombran <vídeo>_f<índice>.jpg"""
+    video, indice = separar_fotograma(ruta)
+    if indice is None:
+        return os.path.basename(ruta)
+    return f"{os.path.splitext(os.path.basename(video))[0]}_f{indice:06d}.jpg"
+
+
+def leer_imagen(ruta):
+    """Lee una imagen o, si la ruta referencia un fotograma, lo busca en el vídeo"""
+    video, indice = separar_fotograma(ruta)
+    if indice is None:
+        return cv2.imread(ruta)
+    cap = cv2.VideoCapture(video)
+    try:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, indice)
+        ok, frame = cap.read()
+    finally:
+        cap.release()
+    return frame if ok else None
+
+
+def muestrear_video(video_path, paso=PASO_VIDEO, umbral_movimiento=UMBRAL_MOVIMIENTO_VIDEO, cancelado=None):
+    """Lee un vídeo secuencialmente y genera (índice, fotograma) de los fotogramas muestreados.
+
+    Se considera uno de cada `paso` fotogramas (los demás solo se avanzan con grab, sin
+    convertirlos). Con `umbral_movimiento` > 0 se descartan además los que apenas difieren
+    del último fotograma devuelto. No se escribe nada a disco.
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        return
+    try:
+        indice = -1
+        firma_anterior = None
+        while cap.grab():
+            indice += 1
+            if indice % paso:
+                continue
+            if cancelado is not None and cancelado():
+                return
+            ok, frame = cap.retrieve()
+            if not ok:
+                return
+            if umbral_movimiento > 0:
+                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                firma = cv2.resize(gray, TAMANO_FIRMA, interpolation=cv2.INTER_AREA).astype(np.int16)
+                if firma_anterior is not None and np.mean(np.abs(firma - firma_anterior)) < umbral_movimiento:
+                    continue
+                firma_anterior = firma
+            yield indice, frame
+    finally:
+        cap.release()
+
+
+def estimar_fotogramas(video_path, paso=PASO_VIDEO):
+    """Número aproximado de fotogramas que se muestrearán de un vídeo (para el progreso)"""
+    cap = cv2.VideoCapture(video_path)
+    try:
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    finally:
+        cap.release()
+    return max(0, (total + paso - 1) // paso)
+
+
+def _listar_directorio(folder):
+    """Lee un directorio en una sola pasada: (imágenes y vídeos, subcarpetas), ordenadas por nombre.
+
+    Los archivos se devuelven como (ruta, es_enlace) y se ignoran los nombres ocultos.
+    """
+    archivos = []
+    subcarpetas = []
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if entry.name.startswith('.'):
+                continue
+            try:
+                if entry.is_dir():
+                    subcarpetas.append(entry.path)
+                elif (os.path.splitext(entry.name)[1].lower() in EXTENSIONES_IMAGEN + EXTENSIONES_VIDEO
+                      and entry.is_file()):
+                    archivos.append((entry.path, entry.is_symlink()))
+            except OSError:
+                continue
+    archivos.sort()
+    subcarpetas.sort()
+    return archivos, subcarpetas
+
+
+def es_carpeta_de_salida(nombre):
+    """True para las carpetas que genera la propia aplicación junto a los mapas"""
+    return (nombre in ("verificacion_damero", "seleccionadas")
+            or nombre.startswith("debug_") or nombre.endswith("_deteccion"))
+
+
+class CacheDirectorios:
+    """Listados de directorio reutilizados durante la sesión.
+
+    Cada entrada se valida con la fecha de modificación del directorio, así que
+    añadir o borrar archivos solo invalida ese directorio.
+    """
+    def __init__(self):
+        self.entradas = {}  # ruta normalizada -> (mtime_ns, archivos, subcarpetas)
+        self.lock = threading.Lock()
+
+    def listar(self, folder):
+        clave = os.path.normcase(os.path.abspath(folder))
+        mtime = os.stat(folder).st_mtime_ns
+        with self.lock:
+            entrada = self.entradas.get(clave)
+        if entrada is not None and entrada[0] == mtime:
+            return entrada[1], entrada[2]
+        
+        archivos, subcarpetas = _listar_directorio(folder)
+        with self.lock:
+            self.entradas[clave] = (mtime, archivos, subcarpetas)
+        return archivos, subcarpetas
+
+    def limpiar(self):
+        with self.lock:
+            self.entradas.clear()
+
+
+def buscar_imagenes(folder, recursive=False, cache=None):
+    """Busca imágenes y vídeos en la carpeta (y opcionalmente sus subcarpetas) con os.scandir"""
+    listar = cache.listar if cache is not None else _listar_directorio
+    result = []
+    unique_files = set()
+    visited_dirs = set()
+    pendientes = [folder]
+    while pendientes:
+        actual = pendientes.pop()
+        
+        # Evitar ciclos de enlaces simbólicos entre carpetas
+        real_dir = os.path.realpath(actual)
+        if os.path.normcase(real_dir) in visited_dirs:
+            continue
+        visited_dirs.add(os.path.normcase(real_dir))
+        
+        try:
+            archivos, subcarpetas = listar(actual)
+        except OSError:
+            continue
+        
+        for file_path, es_enlace in archivos:
+            # Eliminar duplicados por ruta real; solo los enlaces necesitan resolverse
+            if es_enlace:
+                real_path = os.path.realpath(file_path)
+            else:
+                real_path = os.path.join(real_dir, os.path.basename(file_path))
+            normalized_path = os.path.normcase(real_path)
+            if normalized_path not in unique_files:
+                unique_files.add(normalized_path)
+                result.append(file_path)
+        
+        if recursive:
+            # Recorrido en profundidad respetando el orden alfabético de las subcarpetas
+            pendientes.extend(reversed(subcarpetas))
+    return result
+
+
+def leer_dimensiones(ruta):
+    """Resolución (ancho, alto) leyendo solo la cabecera del archivo, o None si no es legible"""
+    try:
+        if es_video(ruta):
+            cap = cv2.VideoCapture(ruta)
+            try:
+                ancho = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+                alto = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            finally:
+                cap.release()
+            return (ancho, alto) if ancho > 0 and alto > 0 else None
+        
+        # PIL solo analiza la cabecera (SOF, IHDR, IFD...) hasta que se accede a los píxeles
+        with Image.open(ruta) as img:
+            ancho, alto = img.size
+            # cv2.imread aplica la orientación EXIF: los giros de 90° intercambian ancho y alto
+            if img.format in ("JPEG", "TIFF", "MPO") and img.getexif().get(0x0112, 1) in (5, 6, 7, 8):
+                ancho, alto = alto, ancho
+            return ancho, alto
+    except (OSError, SyntaxError, ValueError):
+        return None
+
+
+def escanear_metadatos(rutas, max_workers=MAX_WORKERS):
+    """Resoluciones, tamaño total y archivos ilegibles de una lista de rutas, sin decodificar imágenes"""
+    def leer(ruta):
+        try:
+            tamano = os.path.getsize(ruta)
+        except OSError:
+            tamano = 0
+        return ruta, leer_dimensiones(ruta), tamano
+    
+    resoluciones = {}  # (ancho, alto) -> rutas
+    ilegibles = []
+    total_bytes = 0
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for ruta, dimensiones, tamano in executor.map(leer, rutas):
+            total_bytes += tamano
+            if dimensiones is None:
+                ilegibles.append(ruta)
+            else:
+                resoluciones.setdefault(dimensiones, []).append(ruta)
+    return {
+        'archivos': len(rutas),
+        'bytes': total_bytes,
+        'resoluciones': resoluciones,
+        'ilegibles': ilegibles
+    }
+
+
+def resolucion_principal(metadatos):
+    """Resolución más frecuente de un escaneo de metadatos, o None si no hay ninguna"""
+    if not metadatos['resoluciones']:
+        return None
+    return max(metadatos['resoluciones'].items(), key=lambda kv: len(kv[1]))[0]
+
+
+def formatear_bytes(num_bytes):
+    for unidad in ("B", "KB", "MB", "GB"):
+        if num_bytes < 1024 or unidad == "GB":
+            return f"{num_bytes:.0f} {unidad}" if unidad == "B" else f"{num_bytes:.1f} {unidad}"
+        num_bytes /= 1024
+
+
+# Modos de exportación de la selección (etiqueta en el visor -> modo interno)
+MODOS_EXPORTACION = {
+    "Copia": "copia",
+    "Enlace duro": "enlace_duro",
+    "Enlace simbólico": "enlace_simbolico",
+    "Reflink (CoW)": "reflink",
+}
+
+
+def _archivos_identicos(origen, destino):
+    """True si el destino ya es el mismo archivo o una copia con igual tamaño y fecha"""
+    try:
+        if os.path.samefile(origen, destino):
+            return True
+        stat_origen, stat_destino = os.stat(origen), os.stat(destino)
+    except OSError:
+        return False
+    return (stat_origen.st_size == stat_destino.st_size
+            and abs(stat_origen.st_mtime - stat_destino.st_mtime) < 2)
+
+
+def _reflink(origen, destino):
+    """Clona el archivo compartiendo bloques (Btrfs/XFS); lanza OSError si no es posible"""
+    try:
+        import fcntl
+    except ImportError:
+        raise OSError("reflink no disponible en este sistema")
+    FICLONE = 0x40049409
+    with open(origen, 'rb') as src, open(destino, 'wb') as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+    shutil.copystat(origen, destino)
+
+
+def _exportar_archivo(origen, destino, modo, dev_destino):
+    """Exporta un archivo con el modo pedido; devuelve el modo realmente usado u 'omitido'"""
+    # Los fotogramas de vídeo se extraen como imagen
+    if separar_fotograma(origen)[1] is not None:
+        if os.path.exists(destino):
+            return 'omitido'
+        frame = leer_imagen(origen)
+        if frame is None or not cv2.imwrite(destino, frame):
+            raise OSError(f"No se pudo extraer el fotograma {origen}")
+        return 'extraido'
+    
+    if os.path.lexists(destino):
+        if _archivos_identicos(origen, destino):
+            return 'omitido'
+        os.remove(destino)
+
+    # Los enlaces duros y los reflinks solo son posibles dentro del mismo sistema de archivos
+    mismo_fs = os.stat(origen).st_dev == dev_destino
+    if modo == 'enlace_duro' and mismo_fs:
+        try:
+            os.link(origen, destino)
+            return 'enlace_duro'
+        except OSError:
+            pass
+    elif modo == 'enlace_simbolico':
+        try:
+            os.symlink(os.path.abspath(origen), destino)
+            return 'enlace_simbolico'
+        except OSError:
+            pass
+    elif modo == 'reflink' and mismo_fs:
+        try:
+            _reflink(origen, destino)
+            return 'reflink'
+        except OSError:
+            if os.path.lexists(destino):
+                os.remove(destino)
+
+    # Copia normal (también como alternativa si el modo pedido no es posible)
+    shutil.copy2(origen, destino)
+    return 'copia'
+
+
+def exportar_imagenes(rutas, out_dir, modo="copia", max_workers=MAX_WORKERS, progreso=None):
+    """Exporta imágenes en paralelo y escribe manifiesto.csv en la carpeta de destino.
+
+    Devuelve (resumen, ruta del manifiesto), con el número de archivos por resultado.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    dev_destino = os.stat(out_dir).st_dev
+
+    # Nombres de destino únicos: imágenes de carpetas distintas pueden llamarse igual
+    destinos = []
+    usados = set()
+    for ruta in rutas:
+        nombre = nombre_exportacion(ruta)
+        base, ext = os.path.splitext(nombre)
+        n = 2
+        while os.path.normcase(nombre) in usados:
+            nombre = f"{base}_{n}{ext}"
+            n += 1
+        usados.add(os.path.normcase(nombre))
+        destinos.append(os.path.join(out_dir, nombre))
+
+    resultados = [None] * len(rutas)
+    hechas = 0
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(_exportar_archivo, origen, destino, modo, dev_destino): i
+            for i, (origen, destino) in enumerate(zip(rutas, destinos))
+        }
+        for future in concurrent.futures.as_completed(futures):
+            i = futures[future]
+            try:
+                resultados[i] = (future.result(), "")
+            except OSError as e:
+                resultados[i] = ('error', str(e))
+            hechas += 1
+            if progreso:
+                progreso(hechas, len(rutas))
+
+    resumen = {}
+    manifest_path = os.path.join(out_dir, "manifiesto.csv")
+    with open(manifest_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['origen', 'destino', 'resultado', 'bytes', 'detalle'])
+        for origen, destino, (resultado, detalle) in zip(rutas, destinos, resultados):
+            resumen[resultado] = resumen.get(resultado, 0) + 1
+            try:
+                tamano = os.path.getsize(destino if resultado == 'extraido' else origen)
+            except OSError:
+                tamano = ''
+            writer.writerow([origen, os.path.basename(destino), resultado, tamano, detalle])
+    return resumen, manifest_path
+
+
+# Imágenes de verificación y depuración: formato (etiqueta -> extensión; None = la del original)
+FORMATOS_VERIFICACION = {
+    "Original": None,
+    "JPEG": ".jpg",
+    "PNG": ".png",
+    "WebP": ".webp",
+}
+
+# Qué imágenes se escriben (etiqueta en la interfaz -> modo interno)
+MUESTREO_VERIFICACION = {
+    "Todas las detectadas": "todas",
+    "Una de cada N detectadas": "cada_n",
+    "Solo fallos": "fallos",
+}
+
+
+def parametros_codificacion(extension, nivel):
+    """Parámetros de cv2.imencode: nivel es la calidad (JPEG/WebP, 0-100) o la compresión (PNG, 0-9)"""
+    extension = extension.lower()
+    if extension in ('.jpg', '.jpeg'):
+        return [cv2.IMWRITE_JPEG_QUALITY, int(nivel)]
+    if extension == '.webp':
+        return [cv2.IMWRITE_WEBP_QUALITY, int(nivel)]
+    if extension == '.png':
+        return [cv2.IMWRITE_PNG_COMPRESSION, int(min(max(nivel, 0), 9))]
+    return []
+
+
+class EscritorImagenes:
+    """Codifica y escribe imágenes en hilos propios a través de una cola acotada.
+
+    Los hilos de detección solo encolan la imagen ya dibujada; la codificación y la escritura
+    se hacen aquí. La cola limita la memoria: si el disco no da abasto, enviar() espera.
+    """
+
+    def __init__(self, extension=None, nivel=90, hilos=2, capacidad=32):
+        self.extension = extension
+        self.nivel = nivel
+        self.cola = queue.Queue(maxsize=capacidad)
+        self.carpetas = set()
+        self.lock = threading.Lock()
+        self.escritas = 0
+        self.errores = 0
+        self.hilos = [threading.Thread(target=self._trabajar, daemon=True) for _ in range(hilos)]
+        for hilo in self.hilos:
+            hilo.start()
+
+    def enviar(self, carpeta, nombre, imagen):
+        """Encola una imagen; nombre lleva la extensión del original, que se cambia si hay formato fijo"""
+        if self.extension:
+            nombre = os.path.splitext(nombre)[0] + self.extension
+        self.cola.put((carpeta, nombre, imagen))
+
+    def _trabajar(self):
+        while True:
+            tarea = self.cola.get()
+            if tarea is None:
+                return
+            carpeta, nombre, imagen = tarea
+            try:
+                # Crear cada carpeta una sola vez
+                if carpeta not in self.carpetas:
+                    os.makedirs(carpeta, exist_ok=True)
+                    with self.lock:
+                        self.carpetas.add(carpeta)
+                extension = os.path.splitext(nombre)[1] or '.jpg'
+                ok, datos = cv2.imencode(extension, imagen, parametros_codificacion(extension, self.nivel))
+                if not ok:
+                    raise OSError(f"No se pudo codificar {nombre}")
+                with open(os.path.join(carpeta, nombre), 'wb') as f:
+                    f.write(datos.tobytes())
+                with self.lock:
+                    self.escritas += 1
+            except (OSError, cv2.error):
+                with self.lock:
+                    self.errores += 1
+
+    def cerrar(self):
+        """Espera a que se escriba todo lo encolado y devuelve (escritas, errores)"""
+        for _ in self.hilos:
+            self.cola.put(None)
+        for hilo in self.hilos:
+            hilo.join()
+        return self.escritas, self.errores
+
+
+# Intervalos para las distribuciones de escala (lado relativo al sensor) e inclinación (grados)
+BINS_ESCALA = np.array([0.0, 0.2, 0.35, 0.5, 0.7, np.inf])
+BINS_INCLINACION = np.array([0.0, 10.0, 20.0, 30.0, 45.0, 90.0])
+UMBRAL_CELDA_CUBIERTA = 0.5  # Fracción mínima de una celda para considerarla cubierta
+
+
+def cuadrilateros_de_poligonos(polygons_info, selected=None):
+    """Esquinas de los polígonos (seleccionados) en un array N x 4 x 2 float32"""
+    if selected is None:
+        return polygons_info.cuadrilateros
+    return polygons_info.cuadrilateros[np.asarray(selected, dtype=bool)]
+
+
+def geometria_cuadrilateros(quads, image_resolution):
+    """Escala (lado relativo al sensor) e inclinación en grados de N cuadriláteros a la vez"""
+    width, height = image_resolution
+    
+    # Lados del cuadrilátero (sup, der, inf, izq) y área (fórmula del lazo)
+    quads = np.asarray(quads, dtype=np.float64).reshape(-1, 4, 2)
+    lados = np.linalg.norm(quads - np.roll(quads, -1, axis=1), axis=2)
+    x, y = quads[:, :, 0], quads[:, :, 1]
+    areas_quad = 0.5 * np.abs(np.sum(x * np.roll(y, -1, axis=1) - np.roll(x, -1, axis=1) * y, axis=1))
+    escalas = np.sqrt(areas_quad / float(width * height))
+    
+    # Inclinación aproximada por escorzo: cociente entre lados opuestos
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio_horizontal = np.minimum(lados[:, 0], lados[:, 2]) / np.maximum(lados[:, 0], lados[:, 2])
+        ratio_vertical = np.minimum(lados[:, 1], lados[:, 3]) / np.maximum(lados[:, 1], lados[:, 3])
+    ratios = np.nan_to_num(np.minimum(ratio_horizontal, ratio_vertical), nan=1.0)
+    inclinaciones = np.degrees(np.arccos(np.clip(ratios, 0.0, 1.0)))
+    return escalas, inclinaciones
+
+
+def analizar_cobertura(heatmap, quads, image_resolution, grid=REJILLA_COBERTURA):
+    """Calcula cobertura por celdas, distribución de escala/inclinación y una puntuación 0-100.
+
+    Todo se calcula de forma vectorizada: las celdas con imágenes integrales sobre el
+    acumulador y la geometría con operaciones sobre los N cuadriláteros a la vez.
+    """
+    width, height = image_resolution
+    cols, rows = grid
+    
+    # Cobertura por celda: fracción de píxeles cubiertos y conteo medio mediante imágenes integrales
+    covered_integral = cv2.integral((heatmap > 0).astype(np.uint8))
+    count_integral = cv2.integral(heatmap.astype(np.float32))
+    xs = np.linspace(0, heatmap.shape[1], cols + 1).astype(int)
+    ys = np.linspace(0, heatmap.shape[0], rows + 1).astype(int)
+    areas = np.outer(np.diff(ys), np.diff(xs)).astype(np.float64)
+    
+    def suma_celdas(integral):
+        return (integral[np.ix_(ys[1:], xs[1:])] - integral[np.ix_(ys[:-1], xs[1:])]
+                - integral[np.ix_(ys[1:], xs[:-1])] + integral[np.ix_(ys[:-1], xs[:-1])])
+    
+    celdas = suma_celdas(covered_integral) / areas
+    conteo_celdas = suma_celdas(count_integral) / areas
+    celdas_cubiertas = int(np.count_nonzero(celdas >= UMBRAL_CELDA_CUBIERTA))
+    
+    # Geometría de cada tablero
+    quads = np.asarray(quads, dtype=np.float64).reshape(-1, 4, 2)
+    escalas, inclinaciones = geometria_cuadrilateros(quads, image_resolution)
+    
+    hist_escala = np.histogram(escalas, bins=BINS_ESCALA)[0]
+    hist_inclinacion = np.histogram(inclinaciones, bins=BINS_INCLINACION)[0]
+    
+    # Un intervalo cuenta como representado si contiene al menos el 2% de las imágenes (mínimo una)
+    minimo = max(1, int(0.02 * len(quads)))
+    diversidad_escala = np.count_nonzero(hist_escala >= minimo) / len(hist_escala)
+    diversidad_inclinacion = np.count_nonzero(hist_inclinacion >= minimo) / len(hist_inclinacion)
+    
+    puntuacion = 100.0 * (0.6 * float(np.mean(np.minimum(celdas / UMBRAL_CELDA_CUBIERTA, 1.0)))
+                          + 0.2 * diversidad_escala + 0.2 * diversidad_inclinacion)
+    
+    return {
+        'imagenes': len(quads),
+        'puntuacion': round(puntuacion, 1),
+        'celdas_cubiertas': celdas_cubiertas,
+        'celdas_total': cols * rows,
+        'celdas': celdas,
+        'conteo_celdas': conteo_celdas,
+        'conteo_max': float(heatmap.max()) if heatmap.size else 0.0,
+        'escalas': escalas,
+        'inclinaciones': inclinaciones,
+        'hist_escala': hist_escala,
+        'hist_inclinacion': hist_inclinacion,
+    }
+
+
+def resumen_cobertura(analisis):
+    """Versión serializable (JSON) del análisis de cobertura"""
+    return {
+        'imagenes': analisis['imagenes'],
+        'puntuacion': analisis['puntuacion'],
+        'celdas_cubiertas': analisis['celdas_cubiertas'],
+        'celdas_total': analisis['celdas_total'],
+        'conteo_max': analisis['conteo_max'],
+        'celdas': np.round(analisis['celdas'], 3).tolist(),
+        'conteo_celdas': np.round(analisis['conteo_celdas'], 2).tolist(),
+        'hist_escala': analisis['hist_escala'].tolist(),
+        'hist_inclinacion': analisis['hist_inclinacion'].tolist(),
+    }
+
+
+def detectar_duplicados(quads, image_resolution, tolerancia=TOLERANCIA_DUPLICADOS, orden=None):
+    """Marca las poses casi idénticas a otra ya conservada.
+
+    Recorre las imágenes en `orden` (por defecto el de la lista) y usa un hash espacial
+    del centroide con celdas del tamaño de la tolerancia: solo se comparan las esquinas con
+    las imágenes conservadas de las 9 celdas vecinas. Una imagen es duplicada si ninguna de
+    sus 4 esquinas se desplaza más de `tolerancia` (% de la diagonal) respecto a una
+    conservada, también con el tablero girado 180°. Devuelve, para cada imagen, el índice
+    de la imagen conservada que duplica o -1.
+    """
+    quads = np.asarray(quads, dtype=np.float64).reshape(-1, 4, 2)
+    referencias = np.full(len(quads), -1, dtype=np.int32)
+    tol_px = tolerancia / 100.0 * math.hypot(*image_resolution)
+    if tol_px <= 0 or len(quads) == 0:
+        return referencias
+    
+    centroides = quads.mean(axis=1)
+    celdas = np.floor(centroides / tol_px).astype(np.int64)
+    girado = quads[:, [2, 3, 0, 1]]
+    indice = {}  # celda -> imágenes conservadas
+    
+    for i in (range(len(quads)) if orden is None else orden):
+        cx, cy = celdas[i]
+        candidatas = [j for dx in (-1, 0, 1) for dy in (-1, 0, 1) for j in indice.get((cx + dx, cy + dy), ())]
+        if candidatas:
+            candidatas = np.array(candidatas)
+            desplazamiento = np.minimum(
+                np.linalg.norm(quads[candidatas] - quads[i], axis=2).max(axis=1),
+                np.linalg.norm(girado[candidatas] - quads[i], axis=2).max(axis=1)
+            )
+            mas_cercana = int(np.argmin(desplazamiento))
+            if desplazamiento[mas_cercana] <= tol_px:
+                referencias[i] = candidatas[mas_cercana]
+                continue
+        indice.setdefault((cx, cy), []).append(i)
+    return referencias
+
+
+# Tratamiento de fotogramas repetidos en ráfagas (etiqueta en la interfaz -> modo interno)
+MODOS_RAFAGA = {
+    "Procesar todos": None,
+    "Reutilizar detección": "reutilizar",
+    "Omitir": "omitir",
+}
+
+
+def marcar_duplicados(resultados, polygons_info, tolerancia=TOLERANCIA_DUPLICADOS, descartar=False):
+    """Deselecciona (o descarta, en resultados y polígonos) las poses casi idénticas a otra anterior.
+
+    Devuelve (polygons_info, número de duplicadas).
+    """
+    if tolerancia <= 0 or not len(polygons_info):
+        return polygons_info, 0
+    archivos = polygons_info.archivos
+    orden = sorted(range(len(polygons_info)), key=lambda i: clave_orden(archivos[i]))
+    referencias = detectar_duplicados(
+        cuadrilateros_de_poligonos(polygons_info), resultados.image_resolution, tolerancia, orden
+    )
+    duplicadas = referencias >= 0
+    if duplicadas.any():
+        if descartar:
+            polygons_info = polygons_info.filtrar(~duplicadas)
+            resultados.filtrar(~duplicadas)
+        else:
+            resultados.duplicados = referencias
+            polygons_info.seleccion[:] = ~duplicadas
+    return polygons_info, int(duplicadas.sum())
+
+
+def firma_imagen(filename):
+    """Miniatura en gris de 32x24 para comparar fotogramas sin decodificarlos por completo"""
+    # Los JPEG se decodifican directamente a 1/8 de resolución, mucho más barato que la lectura completa
+    img = cv2.imread(filename, cv2.IMREAD_REDUCED_GRAYSCALE_8)
+    if img is None:
+        return None
+    return cv2.resize(img, TAMANO_FIRMA, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+
+def agrupar_rafagas(image_files, firmas, umbral=UMBRAL_RAFAGA):
+    """Asigna a cada fotograma el representante de su ráfaga.
+
+    Los fotogramas se recorren en orden de captura y se comparan con el primero de la
+    serie actual (no con el inmediatamente anterior, para que los cambios lentos no se
+    acumulen). Devuelve un diccionario archivo -> archivo representante.
+    """
+    representantes = {}
+    representante, firma_representante = None, None
+    for filename in image_files:
+        firma = firmas.get(filename)
+        if (firma is not None and firma_representante is not None
+                and np.mean(np.abs(firma - firma_representante)) <= umbral):
+            representantes[filename] = representante
+        else:
+            representante, firma_representante = filename, firma
+            representantes[filename] = filename
+    return representantes
+
+
+# Número de bits a 1 de cada byte, para contar celdas en los bitsets empaquetados
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint16)
+
+
+def bitsets_cobertura(quads, image_resolution, grid=REJILLA_SELECCION):
+    """Celdas de una rejilla reducida cubiertas por cada imagen, empaquetadas en bits (N x C/8)"""
+    width, height = image_resolution
+    cols, rows = grid
+    escala = np.array([cols / float(width), rows / float(height)])
+    mask = np.zeros((rows, cols), dtype=np.uint8)
+    bitsets = np.zeros((len(quads), (cols * rows + 7) // 8), dtype=np.uint8)
+    for i, quad in enumerate(quads):
+        mask[:] = 0
+        # Coordenadas en la rejilla con 4 bits de precisión subcelda
+        pts = np.round(np.asarray(quad).reshape(-1, 2) * escala * 16).astype(np.int32)
+        cv2.fillConvexPoly(mask, pts, 1, shift=4)
+        bitsets[i] = np.packbits(mask.ravel())
+    return bitsets
+
+
+def seleccionar_subconjunto(quads, image_resolution, max_imagenes=None, cobertura_objetivo=1.0,
+                            grid=REJILLA_SELECCION, contornos=None):
+    """Selección voraz de pocas imágenes que maximiza el área cubierta y la variedad de poses.
+
+    Cada paso elige la imagen que cubre más celdas nuevas de la rejilla reducida, con un
+    bonus si su combinación escala/inclinación aún no está representada. Cuando ninguna
+    imagen aporta nada nuevo se empieza otra ronda, de modo que las zonas se cubren varias
+    veces. Termina al llegar a `max_imagenes` o, si no se indica, al alcanzar
+    `cobertura_objetivo` (fracción del área que cubren todas las imágenes juntas).
+    Si se pasan `contornos` (tableros parciales), el área se mide con ellos en vez de con los
+    cuadriláteros. Devuelve los índices elegidos en orden de elección.
+    """
+    quads = np.asarray(quads, dtype=np.float64).reshape(-1, 4, 2)
+    n = len(quads)
+    if n == 0:
+        return []
+    
+    bitsets = bitsets_cobertura(quads if contornos is None else contornos, image_resolution, grid)
+    celdas_imagen = _POPCOUNT[bitsets].sum(axis=1)
+    union = np.bitwise_or.reduce(bitsets, axis=0)
+    celdas_union = int(_POPCOUNT[union].sum())
+    
+    # Cubo de pose de cada imagen (intervalo de escala x intervalo de inclinación)
+    escalas, inclinaciones = geometria_cuadrilateros(quads, image_resolution)
+    bin_escala = np.clip(np.digitize(escalas, BINS_ESCALA) - 1, 0, len(BINS_ESCALA) - 2)
+    bin_inclinacion = np.clip(np.digitize(inclinaciones, BINS_INCLINACION) - 1, 0, len(BINS_INCLINACION) - 2)
+    pose = bin_escala * (len(BINS_INCLINACION) - 1) + bin_inclinacion
+    num_poses = (len(BINS_ESCALA) - 1) * (len(BINS_INCLINACION) - 1)
+    peso_pose = 0.25 * grid[0] * grid[1] / num_poses
+    
+    limite = n if max_imagenes is None else min(int(max_imagenes), n)
+    disponible = np.ones(n, dtype=bool)
+    cubiertas = np.zeros_like(union)  # celdas cubiertas en la ronda actual
+    poses_cubiertas = np.zeros(num_poses, dtype=bool)
+    cubiertas_total = np.zeros_like(union)  # celdas cubiertas alguna vez
+    elegidas = []
+    
+    def ganancia(i):
+        return int(_POPCOUNT[bitsets[i] & ~cubiertas].sum()) + peso_pose * (not poses_cubiertas[pose[i]])
+    
+    def nueva_ronda():
+        # Ganancias iniciales de todas las imágenes disponibles, calculadas de una vez.
+        # A igual ganancia se prefiere la imagen que cubre menos área (menos redundante)
+        ganancias = _POPCOUNT[bitsets & ~cubiertas].sum(axis=1) + peso_pose * ~poses_cubiertas[pose]
+        cola = [(-float(ganancias[i]), int(celdas_imagen[i]), int(i)) for i in np.flatnonzero(disponible)]
+        heapq.heapify(cola)
+        return cola
+    
+    # Voraz perezoso: las ganancias solo pueden bajar dentro de una ronda, así que basta con
+    # recalcular la de la mejor candidata hasta que siga siendo la mejor
+    cola = nueva_ronda()
+    while len(elegidas) < limite and cola:
+        if max_imagenes is None and _POPCOUNT[cubiertas_total].sum() >= cobertura_objetivo * celdas_union:
+            break
+        
+        _, celdas, i = heapq.heappop(cola)
+        actual = ganancia(i)
+        if cola and actual < -cola[0][0]:
+            heapq.heappush(cola, (-actual, celdas, i))
+            continue
+        
+        if actual <= 0:
+            # Nada nuevo en esta ronda: empezar otra para cubrir cada zona una vez más
+            cubiertas[:] = 0
+            poses_cubiertas[:] = False
+            cola = nueva_ronda()
+            continue
+        
+        elegidas.append(i)
+        disponible[i] = False
+        cubiertas |= bitsets[i]
+        cubiertas_total |= bitsets[i]
+        poses_cubiertas[pose[i]] = True
+    
+    return elegidas
+
+
+# Calibración sobre las esquinas guardadas
+LADO_CUADRO = 1.0  # Unidades arbitrarias: no cambia los intrínsecos ni el error de reproyección
+MIN_IMAGENES_CALIBRACION = 3
+CAPACIDAD_CACHE_CALIBRACION = 32  # Selecciones distintas que se recuerdan en el visor
+
+
+def puntos_tablero(chessboard_size, lado=LADO_CUADRO):
+    """Coordenadas 3D (K x 3) de las esquinas interiores, en el mismo orden que las detectadas"""
+    cols, rows = chessboard_size
+    puntos = np.zeros((cols * rows, 3), dtype=np.float32)
+    puntos[:, :2] = np.mgrid[0:cols, 0:rows].T.reshape(-1, 2) * lado
+    return puntos
+
+
+def calibrar_camara(esquinas, tamanos, chessboard_size, indices, inicial=None):
+    """cv2.calibrateCamera con las esquinas guardadas de las imágenes `indices`.
+
+    Solo entran las imágenes del tamaño más frecuente de la selección; de los tableros
+    parciales se usan las esquinas visibles. `inicial` (un resultado anterior del mismo
+    tamaño) sirve de punto de partida. Devuelve un dict con rms, matriz, distorsion, tamano,
+    indices usados y error de reproyección por imagen, o None si no hay imágenes suficientes.
+    """
+    indices = np.asarray(indices, dtype=np.int64)
+    if len(indices) < MIN_IMAGENES_CALIBRACION:
+        return None
+    tamanos_sel = np.asarray(tamanos)[indices]
+    valores, cuentas = np.unique(tamanos_sel, axis=0, return_counts=True)
+    tamano = tuple(int(v) for v in valores[np.argmax(cuentas)])
+    indices = indices[(tamanos_sel == tamano).all(axis=1)]
+    
+    objeto = puntos_tablero(chessboard_size)
+    puntos_objeto, puntos_imagen, usados = [], [], []
+    for i in indices:
+        puntos = np.asarray(esquinas[i], dtype=np.float32)
+        visibles = ~np.isnan(puntos).any(axis=1)
+        if np.count_nonzero(visibles) < MIN_ESQUINAS_CHARUCO:
+            continue
+        puntos_objeto.append(objeto[visibles])
+        puntos_imagen.append(puntos[visibles].reshape(-1, 1, 2))
+        usados.append(int(i))
+    if len(usados) < MIN_IMAGENES_CALIBRACION:
+        return None
+    
+    flags, matriz, distorsion = 0, None, None
+    if inicial is not None and tuple(inicial['tamano']) == tamano:
+        flags = cv2.CALIB_USE_INTRINSIC_GUESS
+        matriz = np.array(inicial['matriz'], dtype=np.float64)
+        distorsion = np.array(inicial['distorsion'], dtype=np.float64)
+    rms, matriz, distorsion, rvecs, tvecs = cv2.calibrateCamera(
+        puntos_objeto, puntos_imagen, tamano, matriz, distorsion, flags=flags
+    )
+    if inicial is not None and flags and rms > 1.5 * inicial['rms'] + 0.05:
+        # El punto de partida llevó a un mínimo peor: se repite desde cero
+        rms, matriz, distorsion, rvecs, tvecs = cv2.calibrateCamera(
+            puntos_objeto, puntos_imagen, tamano, None, None
+        )
+    
+    # Error de reproyección de cada imagen (RMS de sus esquinas), como el global
+    errores = np.empty(len(usados))
+    for j, (objeto_j, imagen_j, rvec, tvec) in enumerate(zip(puntos_objeto, puntos_imagen, rvecs, tvecs)):
+        proyectadas, _ = cv2.projectPoints(objeto_j, rvec, tvec, matriz, distorsion)
+        errores[j] = math.sqrt(float(np.mean(np.sum((proyectadas - imagen_j) ** 2, axis=2))))
+    return {
+        'rms': float(rms),
+        'matriz': matriz,
+        'distorsion': distorsion.ravel(),
+        'tamano': tamano,
+        'indices': np.array(usados, dtype=np.int64),
+        'errores': errores.ravel(),
+    }
+
+
+def clave_seleccion(seleccion):
+    """Clave compacta de una selección (máscara empaquetada en bits)"""
+    return np.packbits(np.asarray(seleccion, dtype=bool)).tobytes() + len(seleccion).to_bytes(4, 'little')
+
+
+class CacheCalibraciones:
+    """Resultados de calibración por selección; el último calculado sirve de punto de partida"""
+
+    def __init__(self, capacidad=CAPACIDAD_CACHE_CALIBRACION):
+        self.capacidad = capacidad
+        self.resultados = {}  # clave -> resultado, en orden de inserción
+        self.ultimo = None
+
+    def obtener(self, clave):
+        return self.resultados.get(clave)
+
+    def guardar(self, clave, resultado):
+        self.resultados.pop(clave, None)
+        self.resultados[clave] = resultado
+        while len(self.resultados) > self.capacidad:
+            self.resultados.pop(next(iter(self.resultados)))
+        self.ultimo = resultado
+
+
+def guardar_calibracion(directorio, resultado, archivos, seleccion):
+    """Escribe calibracion.json en la carpeta de resultados"""
+    datos = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'seleccion': clave_seleccion(seleccion).hex(),
+        'rms': resultado['rms'],
+        'tamano': list(resultado['tamano']),
+        'matriz': np.asarray(resultado['matriz']).tolist(),
+        'distorsion': np.asarray(resultado['distorsion']).tolist(),
+        'imagenes': [{'archivo': archivos[i], 'error': float(error)}
+                     for i, error in zip(resultado['indices'].tolist(), resultado['errores'])],
+    }
+    path = os.path.join(directorio, "calibracion.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(datos, f, ensure_ascii=False, indent=1)
+    return path
+
+
+def cargar_calibracion(directorio, archivos):
+    """Lee calibracion.json: (clave de la selección, resultado) o None si no existe o no encaja"""
+    path = os.path.join(directorio, "calibracion.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        datos = json.load(f)
+    posiciones = {archivo: i for i, archivo in enumerate(archivos)}
+    try:
+        indices = np.array([posiciones[imagen['archivo']] for imagen in datos['imagenes']], dtype=np.int64)
+    except KeyError:
+        return None
+    resultado = {
+        'rms': datos['rms'],
+        'matriz': np.array(datos['matriz']),
+        'distorsion': np.array(datos['distorsion']),
+        'tamano': tuple(datos['tamano']),
+        'indices': indices,
+        'errores': np.array([imagen['error'] for imagen in datos['imagenes']]),
+    }
+    return bytes.fromhex(datos['seleccion']), resultado
+
+
+def calibrar_sesion(directorio):
+    """Calibra con la selección guardada de una sesión y escribe calibracion.json (resultado o None)"""
+    resultados = ResultadosDeteccion.cargar(directorio)
+    seleccion = np.ones(len(resultados), dtype=bool)
+    seleccion_path = os.path.join(directorio, "seleccion.npy")
+    if os.path.exists(seleccion_path):
+        guardada = np.load(seleccion_path)
+        if len(guardada) == len(resultados):
+            seleccion = guardada.astype(bool)
+    esquinas, tamanos = resultados.arrays()
+    resultado = calibrar_camara(esquinas, tamanos, resultados.chessboard_size, np.flatnonzero(seleccion))
+    if resultado is not None:
+        guardar_calibracion(directorio, resultado, resultados.archivos, seleccion)
+    return resultado
+
+
+def preprocesar_variantes(gray, sensitivity, perfil=None):
+    """Genera las variantes de preprocesamiento de la imagen en gris según la sensibilidad"""
+    perfil = perfil or PerfilImagen(None)
+
+    # Ajustar parámetros basados en la sensibilidad
+    # Mayor sensibilidad = procesamiento más agresivo y más variantes
+    blur_size = max(3, int(5 - sensitivity))
+    clahe_clip = 2.0 + sensitivity / 2.0
+    gamma_value = 1.0 + sensitivity / 5.0
+    canny_threshold1 = int(70 - sensitivity * 10)
+    canny_threshold2 = int(150 + sensitivity * 10)
+
+    # Aplicar múltiples técnicas de preprocesamiento para mejorar la detección
+    img_versions = []
+
+    # Siempre incluir la imagen original
+    img_versions.append(gray)
+
+    # Versión 1: Ecualización de histograma con filtro gaussiano
+    with perfil.etapa("pre_ecualizada"):
+        gray_eq = cv2.equalizeHist(gray)
+        gray_eq_blur = cv2.GaussianBlur(gray_eq, (blur_size, blur_size), 1.0)
+    img_versions.append(gray_eq_blur)
+
+    # Versión 2: Filtro adaptativo para mejorar contraste local
+    with perfil.etapa("pre_clahe"):
+        clahe = cv2.createCLAHE(clipLimit=clahe_clip, tileGridSize=(8, 8))
+        gray_clahe = clahe.apply(gray)
+        gray_clahe_blur = cv2.GaussianBlur(gray_clahe, (blur_size, blur_size), 1.0)
+    img_versions.append(gray_clahe_blur)
+
+    # Versión 3: Ajuste de gamma para mejorar detalles en áreas oscuras
+    with perfil.etapa("pre_gamma"):
+        gray_gamma = np.array(255 * (gray / 255) ** gamma_value, dtype='uint8')
+    img_versions.append(gray_gamma)
+
+    # Versión 4: Filtro bilateral para preservar bordes
+    with perfil.etapa("pre_bilateral"):
+        gray_bilateral = cv2.bilateralFilter(gray, 11, 17, 17)
+    img_versions.append(gray_bilateral)
+
+    # Versión 5: Detección de bordes con Canny + dilatación para conectar bordes
+    with perfil.etapa("pre_canny"):
+        edges = cv2.Canny(gray, canny_threshold1, canny_threshold2)
+        kernel = np.ones((5, 5), np.uint8)
+        edges_dilated = cv2.dilate(edges, kernel, iterations=1)
+    img_versions.append(255 - edges_dilated)  # Invertir para que los bordes sean oscuros
+
+    # Con alta sensibilidad, añadir versiones adicionales
+    if sensitivity > 3.0:
+        # Versión 6: Combinación de CLAHE y gamma
+        with perfil.etapa("pre_clahe_gamma"):
+            gray_clahe_gamma = np.array(255 * (gray_clahe / 255) ** gamma_value, dtype='uint8')
+        img_versions.append(gray_clahe_gamma)
+
+        # Versión 7: Umbralización adaptativa
+        with perfil.etapa("pre_umbral_adaptativo"):
+            gray_thresh = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                              cv2.THRESH_BINARY, 11, 2)
+        img_versions.append(255 - gray_thresh)  # Invertir para que el damero sea oscuro
+
+    return img_versions
+
+
+# Parámetros de detección más robustos y criterios estrictos para el refinamiento subpíxel
+FLAGS_DAMERO = cv2.CALIB_CB_ADAPTIVE_THRESH | cv2.CALIB_CB_NORMALIZE_IMAGE | \
+               cv2.CALIB_CB_FILTER_QUADS | cv2.CALIB_CB_FAST_CHECK
+CRITERIOS_SUBPIX = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 100, 0.000001)
+MARGEN_ROI = 0.5  # Seguimiento: margen alrededor del último tablero, relativo a su tamaño
+
+
+def detectar_damero(gray, img_versions, chessboard_size, perfil=None, cancelado=None, respaldo=True):
+    """Prueba cada variante, recurre a findChessboardCornersSB y refina con cornerSubPix.
+
+    Con respaldo=False no se prueba findChessboardCornersSB. Devuelve las esquinas refinadas (en la resolución de `gray`) o None.
+    """
+    perfil = perfil or PerfilImagen(None)
+
+    flags = FLAGS_DAMERO
+    criteria = CRITERIOS_SUBPIX
+
+    # Intentar detectar el damero en cada versión de la imagen
+    ret = False
+    corners = None
+
+    with perfil.etapa("deteccion"):
+        for i, img_version in enumerate(img_versions):
+            if cancelado is not None and cancelado():
+                return None
+
+            # Intentar con esta versión de la imagen
+            ret_attempt, corners_attempt = cv2.findChessboardCorners(img_version, chessboard_size, flags=flags)
+
+            if ret_attempt:
+                ret = True
+                corners = corners_attempt
+                perfil.variante = NOMBRES_VARIANTES[i]
+                break
+
+    # Si no se detectó con ninguna versión, intentar con findChessboardCornersSB (más robusto pero más lento)
+    if not ret and respaldo:
+        with perfil.etapa("sb"):
+            try:
+                # Este método es más robusto para dameros parcialmente visibles o con distorsión
+                ret, corners = cv2.findChessboardCornersSB(gray, chessboard_size, flags=flags)
+            except:
+                # Si el método no está disponible (versiones antiguas de OpenCV), usar el método estándar una última vez
+                ret, corners = cv2.findChessboardCorners(gray, chessboard_size, flags=flags)
+        if ret:
+            perfil.variante = 'SB'
+
+    if not ret:
+        return None
+
+    # Mejorar la precisión de las esquinas detectadas
+    # Usar una ventana más grande para el refinamiento de esquinas
+    # y criterios más estrictos para mayor precisión
+    with perfil.etapa("subpix"):
+        corners_subpix = cv2.cornerSubPix(gray, corners, (13, 13), (-1, -1), criteria)
+    return corners_subpix
+
+
+def detectar_damero_en_region(gray, chessboard_size, region, perfil=None):
+    """Busca el damero solo en el recorte (x0, y0, x1, y1) de la imagen en gris, sin variantes.
+
+    Las esquinas se refinan sobre la imagen completa con los mismos criterios que
+    detectar_damero, así que un acierto da el mismo resultado que la búsqueda completa.
+    Devuelve las esquinas en la resolución de `gray` o None.
+    """
+    perfil = perfil or PerfilImagen(None)
+    x0, y0, x1, y1 = region
+    with perfil.etapa("roi"):
+        ret, corners = cv2.findChessboardCorners(gray[y0:y1, x0:x1], chessboard_size, flags=FLAGS_DAMERO)
+    if not ret:
+        return None
+    perfil.variante = 'roi'
+    corners += np.array([x0, y0], dtype=np.float32)
+    with perfil.etapa("subpix"):
+        return cv2.cornerSubPix(gray, corners, (13, 13), (-1, -1), CRITERIOS_SUBPIX)
+
+
+class SeguimientoROI:
+    """Región de búsqueda prevista a partir de la última detección de una secuencia de fotogramas.
+
+    Guarda el bbox de la última detección normalizado a [0, 1], así que no depende de la
+    resolución de cada fotograma. Una imagen sin tablero no cambia la región.
+    """
+
+    def __init__(self, margen=MARGEN_ROI):
+        self.margen = margen
+        self.ultimo = None  # (x0, y0, x1, y1) normalizado
+        self.intentos = 0
+        self.aciertos = 0
+
+    def region(self, ancho, alto):
+        """Recorte (x0, y0, x1, y1) en píxeles de una imagen de ancho x alto, o None"""
+        if self.ultimo is None:
+            return None
+        x0, y0, x1, y1 = self.ultimo
+        mx, my = (x1 - x0) * self.margen, (y1 - y0) * self.margen
+        region = (int(max(x0 - mx, 0.0) * ancho), int(max(y0 - my, 0.0) * alto),
+                  int(math.ceil(min(x1 + mx, 1.0) * ancho)), int(math.ceil(min(y1 + my, 1.0) * alto)))
+        # Si el recorte es casi la imagen entera, no ahorra nada
+        if (region[2] - region[0]) * (region[3] - region[1]) >= 0.9 * ancho * alto:
+            return None
+        return region
+
+    def actualizar(self, esquinas, ancho, alto):
+        """Registra las esquinas detectadas (en píxeles de una imagen de ancho x alto) o None"""
+        if esquinas is None:
+            return
+        esquinas = np.asarray(esquinas, dtype=np.float32).reshape(-1, 2)
+        minimo, maximo = np.nanmin(esquinas, axis=0), np.nanmax(esquinas, axis=0)
+        self.ultimo = (minimo[0] / ancho, minimo[1] / alto, maximo[0] / ancho, maximo[1] / alto)
+
+
+def reducir_para_deteccion(img):
+    """Reduce la imagen a REDUCED_RESOLUTION. Devuelve (reducida, gris, escala de vuelta (x, y))"""
+    original_height, original_width = img.shape[:2]
+    scale_factor = min(REDUCED_RESOLUTION[0]/original_width, REDUCED_RESOLUTION[1]/original_height)
+    new_width = int(original_width * scale_factor)
+    new_height = int(original_height * scale_factor)
+    img_resized = cv2.resize(img, (new_width, new_height))
+    
+    # Mejoras en la detección del damero
+    gray = cv2.cvtColor(img_resized, cv2.COLOR_BGR2GRAY)
+    return img_resized, gray, (original_width / new_width, original_height / new_height)
+
+
+# Qué hacer con las imágenes por debajo de los umbrales de calidad (etiqueta -> modo)
+MODOS_CALIDAD = {
+    "Solo medir": "medir",
+    "Detección rápida en las malas": "rapida",
+    "Descartar las malas": "rechazar",
+}
+
+
+def calidad_imagen(gray):
+    """(nitidez, % de píxeles recortados, contraste) de la imagen en gris reducida.
+
+    La nitidez es la varianza del laplaciano; los recortados, los píxeles a 0-2 o 253-255;
+    el contraste, la desviación típica de los niveles de gris.
+    """
+    nitidez = float(cv2.Laplacian(gray, cv2.CV_32F).var())
+    histograma = cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel()
+    recortados = 100.0 * float(histograma[:3].sum() + histograma[253:].sum()) / gray.size
+    _, desviacion = cv2.meanStdDev(gray)
+    return nitidez, recortados, float(desviacion[0, 0])
+
+
+def crear_umbrales_calidad(nitidez=NITIDEZ_MINIMA, recortados=RECORTADOS_MAXIMOS, contraste=CONTRASTE_MINIMO):
+    """Umbrales de calidad como se guardan en meta.json"""
+    return {'nitidez': nitidez, 'recortados': recortados, 'contraste': contraste}
+
+
+def defectos_calidad(calidad, umbrales):
+    """Motivos (p. ej. ['desenfocada']) por los que la calidad no alcanza los umbrales"""
+    nitidez, recortados, contraste = calidad
+    defectos = []
+    if nitidez < umbrales['nitidez']:
+        defectos.append("desenfocada")
+    if recortados > umbrales['recortados']:
+        defectos.append("saturada")
+    if contraste < umbrales['contraste']:
+        defectos.append("sin contraste")
+    return defectos
+
+
+# Tipos de tablero (etiqueta en la interfaz -> detector)
+TIPOS_TABLERO = {
+    "Damero": "damero",
+    "ChArUco": "charuco",
+}
+
+# Diccionarios de marcadores ArUco (etiqueta -> constante de cv2.aruco)
+DICCIONARIOS_CHARUCO = {
+    "4x4 (50)": "DICT_4X4_50",
+    "5x5 (100)": "DICT_5X5_100",
+    "6x6 (250)": "DICT_6X6_250",
+    "ArUco original": "DICT_ARUCO_ORIGINAL",
+}
+DICCIONARIO_CHARUCO = "5x5 (100)"
+PROPORCION_MARCADOR_CHARUCO = 0.75  # Lado del marcador respecto al del cuadro
+MIN_ESQUINAS_CHARUCO = 6  # Esquinas visibles mínimas para aceptar un tablero parcial
+
+
+class DetectorDamero:
+    """Damero clásico: cascada de variantes de preprocesado y findChessboardCornersSB como último recurso"""
+
+    def __init__(self, chessboard_size, sensitivity):
+        self.chessboard_size = tuple(chessboard_size)
+        self.sensitivity = sensitivity
+
+    def detectar(self, gray, perfil=None, cancelado=None, region=None, completa=True):
+        """Devuelve (esquinas K x 2 en la resolución de gray o None, variantes probadas).
+
+        Con `region` se busca primero en ese recorte y, si no aparece, en la imagen completa.
+        Con completa=False solo se prueba la imagen original, sin variantes ni findChessboardCornersSB.
+        """
+        if region is not None:
+            corners = detectar_damero_en_region(gray, self.chessboard_size, region, perfil)
+            if corners is not None:
+                return corners.reshape(-1, 2), [gray]
+        img_versions = preprocesar_variantes(gray, self.sensitivity, perfil) if completa else [gray]
+        corners = detectar_damero(gray, img_versions, self.chessboard_size, perfil, cancelado, respaldo=completa)
+        return (None if corners is None else corners.reshape(-1, 2)), img_versions
+
+
+class DetectorCharuco:
+    """Tablero ChArUco: cada marcador identifica sus esquinas, así que basta con ver una parte.
+
+    chessboard_size son las esquinas interiores, igual que en el damero (un tablero de
+    (ancho + 1) x (alto + 1) cuadros). Las esquinas no vistas se devuelven como NaN.
+    """
+
+    def __init__(self, chessboard_size, diccionario=DICCIONARIO_CHARUCO,
+                 proporcion_marcador=PROPORCION_MARCADOR_CHARUCO):
+        if not hasattr(cv2, 'aruco') or not hasattr(cv2.aruco, 'CharucoDetector'):
+            raise RuntimeError("Esta versión de OpenCV no incluye el detector ChArUco (se necesita 4.7 o posterior)")
+        self.chessboard_size = tuple(chessboard_size)
+        marcadores = cv2.aruco.getPredefinedDictionary(getattr(cv2.aruco, DICCIONARIOS_CHARUCO[diccionario]))
+        self.board = cv2.aruco.CharucoBoard(
+            (self.chessboard_size[0] + 1, self.chessboard_size[1] + 1), 1.0, proporcion_marcador, marcadores
+        )
+        self.locales = threading.local()  # CharucoDetector no se comparte entre hilos
+
+    def detectar(self, gray, perfil=None, cancelado=None, region=None, completa=True):
+        """Devuelve (esquinas K x 2 en la resolución de gray, con NaN las no vistas, o None, [gray]).
+
+        La región de seguimiento y `completa` no se usan: los marcadores ya se buscan en una sola pasada.
+        """
+        perfil = perfil or PerfilImagen(None)
+        detector = getattr(self.locales, 'detector', None)
+        if detector is None:
+            detector = self.locales.detector = cv2.aruco.CharucoDetector(self.board)
+        
+        with perfil.etapa("deteccion"):
+            corners, ids, _, _ = detector.detectBoard(gray)
+        if ids is None or len(ids) < MIN_ESQUINAS_CHARUCO:
+            return None, [gray]
+        
+        # Esquinas en una sola fila o columna no delimitan ningún área
+        visibles = corners.reshape(-1, 2).astype(np.float32)
+        if cv2.contourArea(cv2.convexHull(visibles)) <= 0:
+            return None, [gray]
+        
+        esquinas = np.full((self.chessboard_size[0] * self.chessboard_size[1], 2), np.nan, dtype=np.float32)
+        esquinas[ids.ravel()] = visibles
+        perfil.variante = 'charuco'
+        return esquinas, [gray]
+
+
+# Sensibilidad automática: se prueba una muestra de la cámara con varios niveles y se elige el
+# más barato que detecta tantos tableros como el más agresivo
+NIVELES_SENSIBILIDAD = (2.0, 3.0, 4.0, 5.0)  # Niveles que se prueban; el último es la referencia
+MUESTRA_SENSIBILIDAD = 24  # Imágenes de cada cámara con las que se elige la sensibilidad (como mucho 1 de cada 10)
+MUESTRA_SENSIBILIDAD_MIN = 4  # Con menos imágenes en la muestra no se ajusta
+
+
+def muestra_estratificada(rutas, n):
+    """n rutas repartidas uniformemente en orden de captura (la central de cada tramo)"""
+    ordenadas = sorted(rutas, key=clave_orden)
+    if len(ordenadas) <= n:
+        return ordenadas
+    return [ordenadas[int((i + 0.5) * len(ordenadas) / n)] for i in range(n)]
+
+
+def ajustar_sensibilidad(rutas, chessboard_size, niveles=NIVELES_SENSIBILIDAD, muestra=MUESTRA_SENSIBILIDAD,
+                         hilos=MAX_WORKERS, cancelado=None):
+    """Elige la sensibilidad del damero con una muestra de las imágenes (los vídeos no se muestrean).
+
+    La muestra es como mucho una de cada 10 imágenes, para que su coste sea pequeño frente al
+    total. Cada imagen se decodifica una vez y se detecta con todos los niveles. Entre los que
+    detectan tantos tableros como el último nivel, se elige el de menor tiempo medio, salvo que
+    uno más bajo no sea al menos un 10% más lento. Devuelve (sensibilidad, {nivel: (detectadas,
+    ms por imagen)}, imágenes probadas), o None si la carpeta es demasiado pequeña.
+    """
+    imagenes = [r for r in rutas if not es_video(r)]
+    imagenes = muestra_estratificada(imagenes, min(muestra, len(imagenes) // 10))
+    if len(imagenes) < MUESTRA_SENSIBILIDAD_MIN:
+        return None
+    detectores = [DetectorDamero(chessboard_size, nivel) for nivel in niveles]
+    
+    def probar(ruta):
+        img = leer_imagen(ruta)
+        if img is None:
+            return None
+        _, gray, _ = reducir_para_deteccion(img)
+        pruebas = []
+        for detector in detectores:
+            inicio = time.perf_counter()
+            esquinas, _ = detector.detectar(gray, cancelado=cancelado)
+            pruebas.append((esquinas is not None, time.perf_counter() - inicio))
+        return pruebas
+    
+    with concurrent.futures.ThreadPoolExecutor(max_workers=hilos) as executor:
+        pruebas = [p for p in executor.map(probar, imagenes) if p is not None]
+    if len(pruebas) < MUESTRA_SENSIBILIDAD_MIN:
+        return None
+    
+    tabla = {}
+    for j, nivel in enumerate(niveles):
+        tabla[nivel] = (sum(p[j][0] for p in pruebas), 1000.0 * sum(p[j][1] for p in pruebas) / len(pruebas))
+    referencia = tabla[niveles[-1]][0]
+    elegida = None
+    for nivel in niveles:
+        if tabla[nivel][0] >= referencia and (elegida is None or tabla[nivel][1] < 0.9 * tabla[elegida][1]):
+            elegida = nivel
+    return elegida, tabla, len(pruebas)
+
+
+def crear_detector(tablero, chessboard_size, sensitivity, diccionario=DICCIONARIO_CHARUCO):
+    """Detector para el tipo de tablero ('damero' o 'charuco')"""
+    if tablero == "charuco":
+        return DetectorCharuco(chessboard_size, diccionario)
+    return DetectorDamero(chessboard_size, sensitivity)
+
+
+def dibujar_esquinas(img, esquinas, chessboard_size):
+    """Dibuja las esquinas detectadas; las de un tablero parcial, como puntos sueltos"""
+    esquinas = np.asarray(esquinas, dtype=np.float32).reshape(-1, 2)
+    visibles = ~np.isnan(esquinas).any(axis=1)
+    if visibles.all():
+        cv2.drawChessboardCorners(img, chessboard_size, esquinas.reshape(-1, 1, 2), True)
+        return
+    for x, y in esquinas[visibles]:
+        cv2.circle(img, (int(x), int(y)), 4, (0, 255, 255), -1)
+
+
+def detectar_esquinas(img, detector, perfil=None, cancelado=None):
+    """Detección completa sobre una imagen decodificada: esquinas (K, 2) en resolución original, o None"""
+    perfil = perfil or PerfilImagen(None)
+    with perfil.etapa("redimension"):
+        _, gray, escala = reducir_para_deteccion(img)
+    esquinas, _ = detector.detectar(gray, perfil, cancelado)
+    if esquinas is None:
+        return None
+    return esquinas * np.array(escala, dtype=np.float32)
+
+
+def detectar_archivo(ruta, detector, img=None, cancelado=None):
+    """Lee la imagen (si no se da ya decodificada) y la detecta: (esquinas, (ancho, alto), variante) o None"""
+    if img is None:
+        img = leer_imagen(ruta)
+    if img is None:
+        return None
+    perfil = PerfilImagen(ruta)
+    esquinas = detectar_esquinas(img, detector, perfil, cancelado)
+    if esquinas is None:
+        return None
+    return esquinas, (img.shape[1], img.shape[0]), perfil.variante
+
+
+def detectar_fuente(ruta, detector, paso_video=PASO_VIDEO, movimiento_video=UMBRAL_MOVIMIENTO_VIDEO, cancelado=None):
+    """Detecta una imagen o los fotogramas muestreados de un vídeo.
+
+    Devuelve ([(ruta, esquinas, (ancho, alto), variante) de los detectados], imágenes o fotogramas procesados).
+    """
+    detecciones = []
+    if not es_video(ruta):
+        deteccion = detectar_archivo(ruta, detector, cancelado=cancelado)
+        if deteccion is not None:
+            detecciones.append((ruta,) + deteccion)
+        return detecciones, 1
+    procesadas = 0
+    for indice, frame in muestrear_video(ruta, paso_video, movimiento_video, cancelado):
+        procesadas += 1
+        deteccion = detectar_archivo(ruta_fotograma(ruta, indice), detector, frame, cancelado)
+        if deteccion is not None:
+            detecciones.append((ruta_fotograma(ruta, indice),) + deteccion)
+    return detecciones, procesadas
+
+
+# API asíncrona: las detecciones de una carpeta según terminan, para integrar la comprobación
+# de cobertura en programas basados en asyncio sin bloquear su bucle de eventos
+INSTANTANEA_CADA = 25  # Detecciones entre instantáneas del acumulador (0 = solo la final)
+
+
+async def detectar_en_directo(rutas, chessboard_size=CHESSBOARD_SIZE, image_resolution=IMAGE_RESOLUTION,
+                              sensibilidad=3.0, tablero="damero", diccionario=DICCIONARIO_CHARUCO,
+                              paso_video=PASO_VIDEO, movimiento_video=UMBRAL_MOVIMIENTO_VIDEO,
+                              hilos=MAX_WORKERS, instantanea_cada=INSTANTANEA_CADA, executor=None):
+    """Generador asíncrono con el resultado de cada archivo según termina y del acumulador cada cierto tiempo.
+
+    rutas: carpeta o lista de imágenes y vídeos. Produce diccionarios:
+      {'evento': 'imagen', 'indice', 'archivo', 'esquinas' (K x 2, o None), 'tamano', 'variante'}
+        (de un vídeo, uno por fotograma detectado)
+      {'evento': 'instantanea', 'heatmap', 'detectadas', 'procesadas', 'hechas', 'total'}
+        cada `instantanea_cada` detecciones y siempre al final; el heatmap es una copia.
+    La detección y el acumulador corren en `executor` (o en uno propio de `hilos` hilos) con a lo
+    sumo 2 x hilos archivos en curso: mientras el consumidor no pide más, no se lanzan más.
+    Cancelar la tarea que lo consume, o cerrar el generador, interrumpe las detecciones en curso.
+    """
+    if isinstance(rutas, (str, os.PathLike)):
+        rutas = buscar_imagenes(os.fspath(rutas))
+    rutas = sorted(rutas, key=clave_orden)
+    chessboard_size = tuple(chessboard_size)
+    loop = asyncio.get_running_loop()
+    detector = crear_detector(tablero, chessboard_size, sensibilidad, diccionario)
+    propio = executor is None
+    if propio:
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=hilos)
+    cancelado = threading.Event()
+    heatmap = np.zeros((image_resolution[1], image_resolution[0]), dtype=np.float32)
+    nuevas = []  # (archivo, esquinas) detectadas desde la última instantánea
+    detectadas = procesadas = hechas = 0
+    
+    def acumular(lote):
+        if lote:
+            archivos, esquinas = zip(*lote)
+            poligonos = Poligonos.desde_esquinas(list(archivos), np.stack(esquinas), chessboard_size)
+            np.add(heatmap, rasterizar_poligonos(poligonos, image_resolution), out=heatmap)
+        return heatmap.copy()
+    
+    async def instantanea():
+        lote = nuevas[:]
+        nuevas.clear()
+        return {
+            'evento': 'instantanea',
+            'heatmap': await loop.run_in_executor(executor, acumular, lote),
+            'detectadas': detectadas,
+            'procesadas': procesadas,
+            'hechas': hechas,
+            'total': len(rutas),
+        }
+    
+    pendientes = iter(enumerate(rutas))
+    en_curso = {}
+    try:
+        while True:
+            while len(en_curso) < 2 * hilos:
+                siguiente = next(pendientes, None)
+                if siguiente is None:
+                    break
+                indice, ruta = siguiente
+                futuro = loop.run_in_executor(executor, detectar_fuente, ruta, detector, paso_video,
+                                              movimiento_video, cancelado.is_set)
+                en_curso[futuro] = (indice, ruta)
+            if not en_curso:
+                break
+            listos, _ = await asyncio.wait(en_curso, return_when=asyncio.FIRST_COMPLETED)
+            for futuro in listos:
+                indice, ruta = en_curso.pop(futuro)
+                encontradas, n = futuro.result()
+                procesadas += n
+                hechas += 1
+                if not encontradas and not es_video(ruta):
+                    yield {'evento': 'imagen', 'indice': indice, 'archivo': ruta,
+                           'esquinas': None, 'tamano': None, 'variante': None}
+                for archivo, esquinas, tamano, variante in encontradas:
+                    detectadas += 1
+                    nuevas.append((archivo, esquinas))
+                    yield {'evento': 'imagen', 'indice': indice, 'archivo': archivo,
+                           'esquinas': esquinas, 'tamano': tamano, 'variante': variante}
+                    if instantanea_cada and len(nuevas) >= instantanea_cada:
+                        yield await instantanea()
+        yield await instantanea()
+    finally:
+        cancelado.set()
+        for futuro in en_curso:
+            futuro.cancel()
+        if propio:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
 class HeatmapViewer(ttk.Toplevel):
-    def __init__(self, parent, initial_heatmap, polygons_info, camera_name, output_path, image_resolution, show_plots=True):
+    def __init__(self, parent, initial_heatmap, polygons_info, camera_name, output_path, image_resolution, show_plots=True, selected=None, duplicados=None,
+                 calidad=None, umbrales_calidad=None):
         super().__init__(parent)
         self.title(f"Mapa de Calor Interactivo - {camera_name}")
         self.geometry("1200x800")
@@ -34,8 +2287,7 @@ class HeatmapViewer(ttk.Toplevel):
         # Configurar tema y estilo
         self.style = ttk.Style()
         
-        self.initial_heatmap = initial_heatmap
-        self.polygons_info = polygons_info  # (filename, polygon, bbox, centroid)
+        self.polygons_info = polygons_info  # Poligonos: esquinas, bbox, centroides y rutas por columnas
         self.camera_name = camera_name
         self.output_path = output_path
         self.image_resolution = image_resolution
@@ -45,11 +2297,31 @@ class HeatmapViewer(ttk.Toplevel):
         self.hover_text = None
         self.current_highlight = None
         
-        # Estado de selección
-        self.selected = [True] * len(polygons_info)
-        self.current_heatmap = np.copy(initial_heatmap)
+        # Estado de selección (el mapa inicial debe corresponder a esta selección)
+        # La selección es la máscara de los propios polígonos
+        if selected is not None:
+            polygons_info.seleccion[:] = selected
+        self.selected = polygons_info.seleccion
+        # Copia propia en float32 (el mapa inicial puede ser una proyección de solo lectura)
+        self.current_heatmap = np.array(initial_heatmap, dtype=np.float32)
+        self.duplicados = duplicados  # índice de la imagen que duplica cada una (-1 si no)
+        self.calidad = calidad  # (nitidez, % recortados, contraste) de cada imagen, NaN si no se midió
+        self.umbrales_calidad = umbrales_calidad or crear_umbrales_calidad()
+        
+        # Calibración en segundo plano: un resultado por selección, partiendo del último
+        self.calibraciones = CacheCalibraciones()
+        self.calibration_after = None
+        self.calibration_running = False
+        self.corners = None  # ResultadosDeteccion de la sesión, se abre al calibrar por primera vez
+        try:
+            guardada = cargar_calibracion(ruta_resultados(output_path), polygons_info.archivos)
+        except (OSError, ValueError, KeyError):
+            guardada = None
+        if guardada is not None:
+            self.calibraciones.guardar(*guardada)
         
         self.setup_ui()
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
         
     def setup_ui(self):
         # Frame principal
@@ -135,16 +2407,56 @@ class HeatmapViewer(ttk.Toplevel):
         close_btn = ttk.Button(
             btn_frame, 
             text="❌ Cerrar", 
-            command=self.destroy,
+            command=self.on_close,
             bootstyle="danger-outline",
             width=10
         )
         close_btn.pack(side=tk.RIGHT)
         
+        # Modo de exportación de la selección y progreso
+        export_frame = ttk.Frame(side_frame)
+        export_frame.pack(fill=tk.X, pady=(5, 0))
+        
+        ttk.Label(export_frame, text="Exportar como:", bootstyle="secondary").pack(side=tk.LEFT)
+        self.export_mode = tk.StringVar(value=list(MODOS_EXPORTACION)[0])
+        ttk.Combobox(
+            export_frame,
+            textvariable=self.export_mode,
+            values=list(MODOS_EXPORTACION),
+            state="readonly",
+            width=16,
+            bootstyle="info"
+        ).pack(side=tk.LEFT, padx=(5, 0))
+        
+        self.export_progress = ttk.Progressbar(side_frame, mode='determinate', bootstyle="info")
+        self.export_progress.pack(fill=tk.X, pady=(5, 0))
+        self.export_thread = None
+        
+        auto_select_btn = ttk.Button(
+            side_frame,
+            text="✨ Selección automática",
+            command=self.auto_select,
+            bootstyle="success-outline"
+        )
+        auto_select_btn.pack(fill=tk.X, pady=(5, 0))
+        
+        # Calibración con las esquinas guardadas de la selección
+        self.auto_calibrate = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            side_frame,
+            text="📐 Calibrar la selección en segundo plano",
+            variable=self.auto_calibrate,
+            command=self.schedule_calibration,
+            bootstyle="round-toggle-success"
+        ).pack(anchor=tk.W, pady=(8, 0))
+        self.calibration_label = ttk.Label(side_frame, text="", bootstyle="secondary", wraplength=280)
+        self.calibration_label.pack(fill=tk.X, pady=(2, 0))
+        
         # Crear checkboxes numeradas con estilo mejorado
         self.checkboxes = []
-        for i, (filename, _, _, _) in enumerate(self.polygons_info):
-            var = tk.BooleanVar(value=True)
+        self.error_labels = []
+        for i, filename in enumerate(self.polygons_info.archivos):
+            var = tk.BooleanVar(value=bool(self.selected[i]))
             
             # Crear frame para cada elemento de la lista
             item_frame = ttk.Frame(self.checkbox_frame)
@@ -160,10 +2472,13 @@ class HeatmapViewer(ttk.Toplevel):
             )
             num_label.pack(side=tk.LEFT, padx=(0, 5))
             
-            # Checkbox con estilo mejorado
+            # Checkbox con estilo mejorado (indicando si es una pose duplicada)
+            text = os.path.basename(filename)
+            if self.duplicados is not None and self.duplicados[i] >= 0:
+                text += f" · duplicada de #{self.duplicados[i] + 1}"
             chk = ttk.Checkbutton(
                 item_frame, 
-                text=os.path.basename(filename), 
+                text=text, 
                 variable=var,
                 command=lambda idx=i: self.on_checkbox_change(idx),
                 bootstyle="round-toggle"
@@ -180,25 +2495,66 @@ class HeatmapViewer(ttk.Toplevel):
             )
             highlight_btn.pack(side=tk.RIGHT, padx=(5,0))
             
+            # Error de reproyección de la imagen en la última calibración
+            error_label = ttk.Label(item_frame, text="", width=8, anchor=tk.E, bootstyle="secondary")
+            error_label.pack(side=tk.RIGHT)
+            
+            # Calidad medida antes de la detección; en amarillo si no alcanza los umbrales
+            if self.calidad is not None and not np.isnan(self.calidad[i]).any():
+                nitidez, recortados, contraste = (float(valor) for valor in self.calidad[i])
+                defectos = defectos_calidad((nitidez, recortados, contraste), self.umbrales_calidad)
+                ttk.Label(
+                    item_frame,
+                    text=f"nit. {nitidez:.0f} · sat. {recortados:.0f}% · contr. {contraste:.0f}",
+                    bootstyle="warning" if defectos else "secondary"
+                ).pack(side=tk.RIGHT, padx=(5, 0))
+            
             self.checkboxes.append(var)
+            self.error_labels.append(error_label)
+        
+        # Mostrar la calibración guardada si corresponde a la selección actual
+        guardada = self.calibraciones.obtener(clave_seleccion(self.selected))
+        if guardada is not None:
+            self.show_calibration(guardada)
             
     def save_selected_images(self):
-        import shutil
-        from tkinter import messagebox
+        """Exporta las imágenes seleccionadas en segundo plano sin bloquear la ventana"""
+        if self.export_thread is not None and self.export_thread.is_alive():
+            messagebox.showinfo("Exportación", "Ya hay una exportación en curso")
+            return
 
         # Crear carpeta "seleccionadas" junto al output actual
         out_dir = os.path.join(os.path.dirname(self.output_path), "seleccionadas")
-        os.makedirs(out_dir, exist_ok=True)
+        archivos = self.polygons_info.archivos
+        rutas = [archivos[i] for i in np.flatnonzero(self.selected)]
+        modo = MODOS_EXPORTACION[self.export_mode.get()]
+        self.export_progress.config(value=0, maximum=max(1, len(rutas)))
+
+        def progreso(hechas, total):
+            self.after(0, lambda: self.export_progress.config(value=hechas))
 
-        saved = 0
-        for i, selected in enumerate(self.checkboxes):
-            if selected.get():
-                image_path = self.polygons_info[i][0]  # ruta original de la imagen
-                dest_path = os.path.join(out_dir, os.path.basename(image_path))
-                shutil.copy(image_path, dest_path)
-                saved += 1
+        def exportar():
+            try:
+                resumen, manifest_path = exportar_imagenes(rutas, out_dir, modo, progreso=progreso)
+            except OSError as e:
+                msg = f"No se pudo exportar la selección:\n{str(e)}"
+                self.after(0, lambda msg=msg: messagebox.showerror("Error", msg))
+                return
+            detalle = "\n".join(f"• {estado}: {n}" for estado, n in sorted(resumen.items()))
+            self.after(0, lambda: messagebox.showinfo(
+                "Guardado", f"{len(rutas)} imágenes exportadas en:\n{out_dir}\n\n{detalle}\n\nManifiesto: {manifest_path}"
+            ))
 
-        messagebox.showinfo("Guardado", f"{saved} imágenes guardadas en:\n{out_dir}")
+        self.export_thread = threading.Thread(target=exportar, daemon=True)
+        self.export_thread.start()
+        
+    def on_close(self):
+        """Guarda la sesión (selección y acumulador) antes de cerrar el visor"""
+        try:
+            guardar_sesion(self.output_path, self.selected, self.current_heatmap)
+        except OSError as e:
+            messagebox.showwarning("Sesión", f"No se pudo guardar la sesión:\n{str(e)}")
+        self.destroy()
         
     # Los métodos on_frame_configure y on_canvas_configure ya no son necesarios
     # con el ScrolledFrame de ttkbootstrap
@@ -206,38 +2562,132 @@ class HeatmapViewer(ttk.Toplevel):
     def on_checkbox_change(self, index):
         self.selected[index] = self.checkboxes[index].get()
         self.update_heatmap(index)  # Pasar el índice como parámetro
+        self.schedule_calibration()
+    
+    def apply_selection(self, selected):
+        """Sustituye la selección completa y reconstruye el mapa de calor"""
+        self.selected[:] = selected
+        for var, value in zip(self.checkboxes, self.selected.tolist()):
+            var.set(value)
+        self.current_heatmap = rasterizar_poligonos(self.polygons_info, self.image_resolution, self.selected)
+        self.update_heatmap_display()
+        self.schedule_calibration()
+    
+    def schedule_calibration(self):
+        """Recalibra poco después del último cambio de selección (varios clics seguidos, una calibración)"""
+        if self.calibration_after is not None:
+            self.after_cancel(self.calibration_after)
+            self.calibration_after = None
+        if self.auto_calibrate.get():
+            self.calibration_after = self.after(500, self.start_calibration)
+    
+    def start_calibration(self):
+        """Calibra la selección actual en un hilo, salvo que ya esté en caché o haya otra en curso"""
+        self.calibration_after = None
+        clave = clave_seleccion(self.selected)
+        resultado = self.calibraciones.obtener(clave)
+        if resultado is not None:
+            self.show_calibration(resultado)
+            return
+        if self.calibration_running:
+            return  # al terminar se comprueba si la selección cambió
+        
+        self.calibration_running = True
+        self.calibration_label.config(text="📐 Calibrando...", bootstyle="secondary")
+        seleccion = self.selected.copy()
+        inicial = self.calibraciones.ultimo
+        
+        def calibrar():
+            resultado, error = None, None
+            try:
+                if self.corners is None:
+                    corners = ResultadosDeteccion.cargar(ruta_resultados(self.output_path))
+                    if corners.archivos != self.polygons_info.archivos:
+                        raise ValueError("las esquinas guardadas no corresponden a esta sesión")
+                    self.corners = corners
+                esquinas, tamanos = self.corners.arrays()
+                resultado = calibrar_camara(esquinas, tamanos, self.corners.chessboard_size,
+                                            np.flatnonzero(seleccion), inicial)
+                if resultado is not None:
+                    guardar_calibracion(ruta_resultados(self.output_path), resultado, self.corners.archivos, seleccion)
+            except (OSError, ValueError, cv2.error) as e:
+                error = str(e)
+            self.after(0, lambda: self.calibration_done(clave, resultado, error))
+        
+        threading.Thread(target=calibrar, daemon=True).start()
+    
+    def calibration_done(self, clave, resultado, error):
+        self.calibration_running = False
+        if error is not None:
+            self.calibration_label.config(text=f"⚠️ No se pudo calibrar: {error}", bootstyle="danger")
+            return
+        if resultado is None:
+            self.calibration_label.config(
+                text=f"📐 Se necesitan al menos {MIN_IMAGENES_CALIBRACION} imágenes seleccionadas", bootstyle="secondary"
+            )
+        else:
+            self.calibraciones.guardar(clave, resultado)
+        if clave != clave_seleccion(self.selected):
+            # La selección cambió mientras se calibraba
+            self.schedule_calibration()
+        elif resultado is not None:
+            self.show_calibration(resultado)
+    
+    def show_calibration(self, resultado):
+        """Muestra el error global y, junto a cada imagen, su error de reproyección"""
+        matriz = resultado['matriz']
+        self.calibration_label.config(
+            text=f"📐 RMS {resultado['rms']:.3f} px · {len(resultado['indices'])} imágenes · "
+                 f"fx {matriz[0][0]:.0f} fy {matriz[1][1]:.0f} · cx {matriz[0][2]:.0f} cy {matriz[1][2]:.0f}",
+            bootstyle="success"
+        )
+        for label in self.error_labels:
+            label.config(text="", bootstyle="secondary")
+        # Las imágenes con más del doble del error global se marcan en rojo
+        for i, error in zip(resultado['indices'].tolist(), resultado['errores']):
+            self.error_labels[i].config(text=f"{error:.2f} px",
+                                        bootstyle="danger" if error > 2 * resultado['rms'] else "secondary")
+    
+    def auto_select(self):
+        """Elige automáticamente pocas imágenes que maximicen cobertura y variedad de poses"""
+        objetivo = simpledialog.askstring(
+            "Selección automática",
+            "Número de imágenes (p. ej. 80) o cobertura objetivo (p. ej. 95%):",
+            parent=self
+        )
+        if not objetivo:
+            return
+        
+        try:
+            objetivo = objetivo.strip()
+            if objetivo.endswith('%'):
+                elegidas = seleccionar_subconjunto(
+                    cuadrilateros_de_poligonos(self.polygons_info), self.image_resolution,
+                    cobertura_objetivo=float(objetivo[:-1]) / 100.0, contornos=self.polygons_info.contornos
+                )
+            else:
+                elegidas = seleccionar_subconjunto(
+                    cuadrilateros_de_poligonos(self.polygons_info), self.image_resolution,
+                    max_imagenes=int(objetivo), contornos=self.polygons_info.contornos
+                )
+        except ValueError:
+            messagebox.showerror("Error", f"Objetivo no válido: {objetivo}", parent=self)
+            return
+        
+        selected = np.zeros(len(self.polygons_info), dtype=bool)
+        selected[elegidas] = True
+        self.apply_selection(selected)
         
     # Añadir parámetro 'index' a la función
     def update_heatmap(self, index):
-        # Actualizar solo el área afectada para mejorar rendimiento
-        _, polygon, bbox, _ = self.polygons_info[index]
-        
-        # Crear máscara solo para el área del bounding box
-        x_min, y_min, x_max, y_max = bbox
-        width = x_max - x_min + 1
-        height = y_max - y_min + 1
-        
-        # Si el área es demasiado grande, usar solo el polígono
-        if width * height > 1000000:  # 1M píxeles
-            mask = np.zeros(self.image_resolution[::-1], dtype=np.float32)
-            cv2.fillConvexPoly(mask, polygon, 1.0)
+        # Actualizar solo el bounding box de la imagen, con el mismo rasterizado que el mapa completo
+        region = mascara_poligono(self.polygons_info, index, self.image_resolution)
+        if region is not None:
+            ventana, local_mask = region
             if self.selected[index]:
-                self.current_heatmap += mask
+                self.current_heatmap[ventana] += local_mask
             else:
-                self.current_heatmap -= mask
-        else:
-            # Crear máscara solo para el área del bounding box
-            local_mask = np.zeros((height, width), dtype=np.float32)
-            local_polygon = polygon.copy()
-            local_polygon[:, :, 0] -= x_min
-            local_polygon[:, :, 1] -= y_min
-            cv2.fillConvexPoly(local_mask, local_polygon, 1.0)
-            
-            # Actualizar solo la región relevante
-            if self.selected[index]:
-                self.current_heatmap[y_min:y_max+1, x_min:x_max+1] += local_mask
-            else:
-                self.current_heatmap[y_min:y_max+1, x_min:x_max+1] -= local_mask
+                self.current_heatmap[ventana] -= local_mask
         
         self.update_heatmap_display()
         
@@ -251,13 +2701,12 @@ class HeatmapViewer(ttk.Toplevel):
         
         # Mostrar números de imagen si hay menos de 50
         if len(self.polygons_info) <= 50:
-            for i, (_, _, _, centroid) in enumerate(self.polygons_info):
-                if self.selected[i]:
-                    center_x, center_y = centroid
-                    self.ax.text(center_x, center_y, str(i+1), 
-                                color='white', fontsize=8, 
-                                ha='center', va='center',
-                                bbox=dict(facecolor='black', alpha=0.5, boxstyle='round,pad=0.2'))
+            for i in np.flatnonzero(self.selected):
+                center_x, center_y = self.polygons_info.centroides[i]
+                self.ax.text(center_x, center_y, str(i+1), 
+                            color='white', fontsize=8, 
+                            ha='center', va='center',
+                            bbox=dict(facecolor='black', alpha=0.5, boxstyle='round,pad=0.2'))
         
         self.ax.set_title(f"Mapa de Calor - {self.camera_name}\n{np.count_nonzero(self.selected)}/{len(self.polygons_info)} imágenes seleccionadas")
         self.ax.axis('off')
@@ -315,15 +2764,8 @@ class HeatmapViewer(ttk.Toplevel):
             x, y = int(event.xdata), int(event.ydata)
             
             # Buscar qué imágenes cubren este píxel
-            covering_images = []
-            for i, (filename, polygon, bbox, _) in enumerate(self.polygons_info):
-                if self.selected[i]:
-                    # Primero verificar el bounding box para optimización
-                    x_min, y_min, x_max, y_max = bbox
-                    if x_min <= x <= x_max and y_min <= y <= y_max:
-                        # Luego verificar el polígono
-                        if cv2.pointPolygonTest(polygon, (x, y), False) >= 0:
-                            covering_images.append((i+1, filename))
+            covering_images = [(i+1, self.polygons_info.archivo(i))
+                               for i in self.polygons_info.contienen(x, y, self.selected)]
             
             if covering_images:
                 # Crear texto informativo con emojis y mejor formato
@@ -355,19 +2797,13 @@ class HeatmapViewer(ttk.Toplevel):
             x, y = int(event.xdata), int(event.ydata)
             
             # Buscar la primera imagen que cubre este píxel
-            for i, (filename, polygon, bbox, _) in enumerate(self.polygons_info):
-                if self.selected[i]:
-                    # Primero verificar el bounding box para optimización
-                    x_min, y_min, x_max, y_max = bbox
-                    if x_min <= x <= x_max and y_min <= y <= y_max:
-                        # Luego verificar el polígono
-                        if cv2.pointPolygonTest(polygon, (x, y), False) >= 0:
-                            self.show_full_image(filename, i+1)
-                            break
+            indices = self.polygons_info.contienen(x, y, self.selected)
+            if len(indices):
+                self.show_full_image(self.polygons_info.archivo(indices[0]), indices[0]+1)
     
     def show_full_image(self, image_path, image_num):
         """Muestra la imagen original en una nueva ventana con estilo mejorado"""
-        img = cv2.imread(image_path)
+        img = leer_imagen(image_path)
         if img is not None:
             # Convertir a RGB para visualización
             img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
@@ -515,13 +2951,7 @@ class HeatmapGallery(ttk.Toplevel):
             content.pack(fill=tk.BOTH, expand=True)
             
             # Generar miniatura
-            heatmap_normalized = cv2.normalize(item['heatmap'], None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
-            color_map = cv2.applyColorMap(heatmap_normalized, cv2.COLORMAP_JET)
-            img_rgb = cv2.cvtColor(color_map, cv2.COLOR_BGR2RGB)
-            
-            # Reducir tamaño para miniatura
-            preview = cv2.resize(img_rgb, (300, 225))
-            img_tk = self.convert_to_tk(preview)
+            img_tk = self.convert_to_tk(self.thumbnail(item))
             
             # Mostrar miniatura
             img_label = ttk.Label(content, image=img_tk, cursor="hand2")
@@ -542,6 +2972,15 @@ class HeatmapGallery(ttk.Toplevel):
             )
             info_label.pack(side=tk.LEFT)
             
+            # Puntuación de cobertura (celdas del sensor, escala e inclinación)
+            analisis = self.coverage_analysis(item)
+            score_label = ttk.Label(
+                info_frame,
+                text=f"Cobertura {analisis['puntuacion']:.0f}% · celdas {analisis['celdas_cubiertas']}/{analisis['celdas_total']}",
+                bootstyle="success" if analisis['puntuacion'] >= 70 else "warning"
+            )
+            score_label.pack(side=tk.LEFT, padx=(10, 0))
+            
             # Botón para abrir
             open_btn = ttk.Button(
                 info_frame, 
@@ -552,6 +2991,34 @@ class HeatmapGallery(ttk.Toplevel):
             )
             open_btn.pack(side=tk.RIGHT)
     
+    def load_item(self, item, mmap=True):
+        """(polygons_info, selected, heatmap, resultados) del item: en memoria o leídos de su sesión.
+
+        resultados (ResultadosDeteccion, con duplicados y calidad) es None si la sesión no se guardó.
+        """
+        directorio = ruta_resultados(item['output_path'])
+        if 'heatmap' in item and not os.path.exists(os.path.join(directorio, "heatmap.npy")):
+            return item['polygons_info'], item.get('selected'), item['heatmap'], None
+        resultados, polygons_info, selected, heatmap = cargar_sesion(directorio, mmap)
+        return polygons_info, selected, heatmap, resultados
+    
+    def thumbnail(self, item):
+        """Miniatura de una cámara (se calcula una vez y se guarda en el item)"""
+        if 'miniatura' not in item:
+            _, _, heatmap, _ = self.load_item(item)
+            item['miniatura'] = miniatura_heatmap(heatmap)
+        return item['miniatura']
+    
+    def coverage_analysis(self, item):
+        """Análisis de cobertura de una cámara (se calcula una vez y se guarda en el item)"""
+        if 'cobertura' not in item:
+            polygons_info, selected, heatmap, _ = self.load_item(item)
+            quads = cuadrilateros_de_poligonos(polygons_info, selected)
+            item['cobertura'] = analizar_cobertura(
+                heatmap, quads, item.get('image_resolution', self.image_resolution)
+            )
+        return item['cobertura']
+    
     def convert_to_tk(self, img_rgb):
         """Convierte una imagen RGB a formato Tkinter"""
         img_pil = Image.fromarray(img_rgb)
@@ -560,15 +3027,26 @@ class HeatmapGallery(ttk.Toplevel):
     
     def open_heatmap_viewer(self, item):
         """Abre el visor interactivo para el mapa seleccionado"""
+        # El acumulador se lee de la sesión al abrir el visor (con la selección guardada al cerrarlo)
+        try:
+            polygons_info, selected, heatmap, resultados = self.load_item(item)
+        except (OSError, ValueError, KeyError) as e:
+            messagebox.showerror("Sesión", f"No se pudo abrir la sesión de {item['camera_name']}:\n{str(e)}")
+            return
+        
         # Crear y mostrar el visor de mapa de calor con estilo ttkbootstrap
         viewer = HeatmapViewer(
             self.master, 
-            item['heatmap'], 
-            item['polygons_info'], 
+            heatmap, 
+            polygons_info, 
             item['camera_name'], 
             item['output_path'], 
-            self.image_resolution, 
-            self.show_plots
+            item.get('image_resolution', self.image_resolution), 
+            self.show_plots,
+            selected=selected,
+            duplicados=resultados.duplicados if resultados is not None else None,
+            calidad=resultados.calidad if resultados is not None else None,
+            umbrales_calidad=resultados.umbrales_calidad if resultados is not None else None
         )
         
         # Asegurar que la ventana sea modal
@@ -590,6 +3068,8 @@ class HeatmapApp:
         self.folders_history = []
         self.processing_mode = tk.StringVar(value="single")
         self.camera_folders = []
+        self.directory_cache = CacheDirectorios()  # Listados de directorio reutilizados en la sesión
+        self.metadata_scan_id = 0  # Descarta escaneos de metadatos de una carpeta ya no seleccionada
         
         # Cargar historial de carpetas
         self.setup_ui()
@@ -672,7 +3152,7 @@ class HeatmapApp:
         
         # Botón actualizar lista
         refresh_btn = ttk.Button(btn_frame, text="↻ Actualizar", 
-                         command=self.refresh_folder_info,
+                         command=lambda: self.refresh_folder_info(limpiar_cache=True),
                          bootstyle="success-outline",
                          width=12)
         refresh_btn.pack(side=tk.LEFT)
@@ -739,6 +3219,26 @@ class HeatmapApp:
         ttk.Label(chess_frame, text="Alto:").grid(row=0, column=2, sticky=tk.W, padx=(15, 5))
         ttk.Entry(chess_frame, textvariable=self.chess_height, width=5, bootstyle="primary").grid(row=0, column=3)
         
+        # Tipo de tablero: damero clásico o ChArUco (admite tableros parcialmente visibles)
+        self.board_type = tk.StringVar(value=list(TIPOS_TABLERO)[0])
+        self.charuco_dictionary = tk.StringVar(value=DICCIONARIO_CHARUCO)
+        ttk.Combobox(
+            chess_frame,
+            textvariable=self.board_type,
+            values=list(TIPOS_TABLERO),
+            state="readonly",
+            width=8,
+            bootstyle="success"
+        ).grid(row=1, column=0, columnspan=2, sticky=tk.W, pady=(8, 0))
+        ttk.Combobox(
+            chess_frame,
+            textvariable=self.charuco_dictionary,
+            values=list(DICCIONARIOS_CHARUCO),
+            state="readonly",
+            width=12,
+            bootstyle="success"
+        ).grid(row=1, column=2, columnspan=2, sticky=tk.W, padx=(15, 0), pady=(8, 0))
+        
         # Resolución de imagen (en columna izquierda)
         res_label_frame = ttk.LabelFrame(left_config, text="Resolución de imagen", bootstyle="success")
         res_label_frame.pack(fill=tk.X, ipady=5)
@@ -755,6 +3255,69 @@ class HeatmapApp:
         ttk.Label(res_frame, text="Alto:").grid(row=0, column=2, sticky=tk.W, padx=(15, 5))
         ttk.Entry(res_frame, textvariable=self.img_height, width=6, bootstyle="primary").grid(row=0, column=3)
         
+        # Poses duplicadas (en columna izquierda)
+        dup_label_frame = ttk.LabelFrame(left_config, text="Poses duplicadas", bootstyle="success")
+        dup_label_frame.pack(fill=tk.X, pady=(10, 0), ipady=5)
+        
+        dup_frame = ttk.Frame(dup_label_frame)
+        dup_frame.pack(padx=10, pady=10)
+        
+        self.duplicate_tolerance = tk.StringVar(value=str(TOLERANCIA_DUPLICADOS))
+        ttk.Label(dup_frame, text="Tolerancia (% diagonal, 0 = no):").grid(row=0, column=0, sticky=tk.W, padx=(0, 5))
+        ttk.Entry(dup_frame, textvariable=self.duplicate_tolerance, width=5, bootstyle="primary").grid(row=0, column=1)
+        
+        self.drop_duplicates = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            dup_frame,
+            text="Descartar (en vez de deseleccionar)",
+            variable=self.drop_duplicates,
+            bootstyle="round-toggle-success"
+        ).grid(row=1, column=0, columnspan=2, sticky=tk.W, pady=(5, 0))
+        
+        # Muestreo de vídeos (en columna izquierda)
+        video_label_frame = ttk.LabelFrame(left_config, text="Vídeo", bootstyle="success")
+        video_label_frame.pack(fill=tk.X, pady=(10, 0), ipady=5)
+        
+        video_frame = ttk.Frame(video_label_frame)
+        video_frame.pack(padx=10, pady=10)
+        
+        self.video_step = tk.StringVar(value=str(PASO_VIDEO))
+        ttk.Label(video_frame, text="Un fotograma de cada:").grid(row=0, column=0, sticky=tk.W, padx=(0, 5))
+        ttk.Entry(video_frame, textvariable=self.video_step, width=5, bootstyle="primary").grid(row=0, column=1)
+        
+        self.video_motion = tk.StringVar(value=str(UMBRAL_MOVIMIENTO_VIDEO))
+        ttk.Label(video_frame, text="Movimiento mínimo (0 = no):").grid(row=1, column=0, sticky=tk.W, padx=(0, 5), pady=(5, 0))
+        ttk.Entry(video_frame, textvariable=self.video_motion, width=5, bootstyle="primary").grid(row=1, column=1, pady=(5, 0))
+        
+        # Calidad de imagen: se mide antes de detectar (en columna izquierda)
+        quality_label_frame = ttk.LabelFrame(left_config, text="Calidad de imagen", bootstyle="success")
+        quality_label_frame.pack(fill=tk.X, pady=(10, 0), ipady=5)
+        
+        quality_frame = ttk.Frame(quality_label_frame)
+        quality_frame.pack(padx=10, pady=10)
+        
+        self.quality_mode = tk.StringVar(value=list(MODOS_CALIDAD)[0])
+        ttk.Combobox(
+            quality_frame,
+            textvariable=self.quality_mode,
+            values=list(MODOS_CALIDAD),
+            state="readonly",
+            width=28,
+            bootstyle="success"
+        ).grid(row=0, column=0, columnspan=2, sticky=tk.W)
+        
+        self.min_sharpness = tk.StringVar(value=str(NITIDEZ_MINIMA))
+        ttk.Label(quality_frame, text="Nitidez mínima:").grid(row=1, column=0, sticky=tk.W, padx=(0, 5), pady=(5, 0))
+        ttk.Entry(quality_frame, textvariable=self.min_sharpness, width=5, bootstyle="primary").grid(row=1, column=1, pady=(5, 0))
+        
+        self.max_clipped = tk.StringVar(value=str(RECORTADOS_MAXIMOS))
+        ttk.Label(quality_frame, text="Píxeles saturados máx. (%):").grid(row=2, column=0, sticky=tk.W, padx=(0, 5), pady=(5, 0))
+        ttk.Entry(quality_frame, textvariable=self.max_clipped, width=5, bootstyle="primary").grid(row=2, column=1, pady=(5, 0))
+        
+        self.min_contrast = tk.StringVar(value=str(CONTRASTE_MINIMO))
+        ttk.Label(quality_frame, text="Contraste mínimo:").grid(row=3, column=0, sticky=tk.W, padx=(0, 5), pady=(5, 0))
+        ttk.Entry(quality_frame, textvariable=self.min_contrast, width=5, bootstyle="primary").grid(row=3, column=1, pady=(5, 0))
+        
         # Opciones adicionales (en columna derecha)
         options_label_frame = ttk.LabelFrame(right_config, text="Opciones adicionales", bootstyle="success")
         options_label_frame.pack(fill=tk.X, expand=True)
@@ -769,6 +3332,52 @@ class HeatmapApp:
         )
         save_check.pack(anchor=tk.W, padx=10, pady=(10, 5))
         
+        # Formato y muestreo de las imágenes de verificación y depuración
+        verify_frame = ttk.Frame(options_label_frame)
+        verify_frame.pack(anchor=tk.W, padx=30, pady=(0, 5))
+        self.verify_format = tk.StringVar(value=list(FORMATOS_VERIFICACION)[0])
+        ttk.Combobox(
+            verify_frame,
+            textvariable=self.verify_format,
+            values=list(FORMATOS_VERIFICACION),
+            state="readonly",
+            width=9,
+            bootstyle="success"
+        ).grid(row=0, column=0, sticky=tk.W)
+        ttk.Label(verify_frame, text="Calidad/compresión:").grid(row=0, column=1, sticky=tk.W, padx=(10, 5))
+        self.verify_level = tk.StringVar(value="90")
+        ttk.Entry(verify_frame, textvariable=self.verify_level, width=4, bootstyle="primary").grid(row=0, column=2)
+        
+        self.verify_sampling = tk.StringVar(value=list(MUESTREO_VERIFICACION)[0])
+        ttk.Combobox(
+            verify_frame,
+            textvariable=self.verify_sampling,
+            values=list(MUESTREO_VERIFICACION),
+            state="readonly",
+            width=24,
+            bootstyle="success"
+        ).grid(row=1, column=0, columnspan=2, sticky=tk.W, pady=(5, 0))
+        self.verify_every = tk.StringVar(value="10")
+        ttk.Entry(verify_frame, textvariable=self.verify_every, width=4, bootstyle="primary").grid(row=1, column=2, pady=(5, 0))
+        
+        self.track_roi = tk.BooleanVar(value=False)
+        track_check = ttk.Checkbutton(
+            options_label_frame,
+            text="Seguir el tablero entre fotogramas consecutivos",
+            variable=self.track_roi,
+            bootstyle="round-toggle-success"
+        )
+        track_check.pack(anchor=tk.W, padx=10, pady=5)
+        
+        self.calibrate_cameras = tk.BooleanVar(value=False)
+        calibrate_check = ttk.Checkbutton(
+            options_label_frame,
+            text="Calibrar cada cámara al terminar",
+            variable=self.calibrate_cameras,
+            bootstyle="round-toggle-success"
+        )
+        calibrate_check.pack(anchor=tk.W, padx=10, pady=5)
+        
         self.show_plots = tk.BooleanVar(value=True)
         plots_check = ttk.Checkbutton(
             options_label_frame, 
@@ -794,7 +3403,30 @@ class HeatmapApp:
             variable=self.save_debug_images,
             bootstyle="round-toggle-success"
         )
-        debug_check.pack(anchor=tk.W, padx=10, pady=(5, 10))
+        debug_check.pack(anchor=tk.W, padx=10, pady=5)
+        
+        self.recursive_search = tk.BooleanVar(value=False)
+        recursive_check = ttk.Checkbutton(
+            options_label_frame, 
+            text="Buscar imágenes en subcarpetas", 
+            variable=self.recursive_search,
+            command=self.refresh_folder_info,
+            bootstyle="round-toggle-success"
+        )
+        recursive_check.pack(anchor=tk.W, padx=10, pady=5)
+        
+        burst_frame = ttk.Frame(options_label_frame)
+        burst_frame.pack(anchor=tk.W, padx=10, pady=(5, 10))
+        ttk.Label(burst_frame, text="Fotogramas repetidos:").pack(side=tk.LEFT)
+        self.burst_mode = tk.StringVar(value=list(MODOS_RAFAGA)[0])
+        ttk.Combobox(
+            burst_frame,
+            textvariable=self.burst_mode,
+            values=list(MODOS_RAFAGA),
+            state="readonly",
+            width=20,
+            bootstyle="success"
+        ).pack(side=tk.LEFT, padx=(5, 0))
         
         # Control de sensibilidad de detección
         sensitivity_frame = ttk.LabelFrame(config_frame, text="Sensibilidad de detección", bootstyle="success")
@@ -830,11 +3462,16 @@ class HeatmapApp:
         
         ttk.Label(label_frame, text="Baja", bootstyle="secondary").pack(side=tk.LEFT)
         ttk.Label(label_frame, text="Alta", bootstyle="secondary").pack(side=tk.RIGHT)
-    
-    def update_sensitivity_label(self, value):
-        # Actualizar la etiqueta con el valor actual del control deslizante
-        self.sensitivity_value_label.config(text=f"{float(value):.1f}")
         
+        # Sensibilidad automática: se elige por cámara con una muestra de sus imágenes
+        self.auto_sensitivity = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            sensitivity_frame,
+            text="Automática (según una muestra de cada cámara)",
+            variable=self.auto_sensitivity,
+            bootstyle="round-toggle-success"
+        ).pack(anchor=tk.W, padx=10, pady=(0, 10))
+    
         # Botones de acción
         action_frame = ttk.Frame(main_frame)
         action_frame.grid(row=4, column=0, columnspan=3, pady=(0, 20))
@@ -858,6 +3495,12 @@ class HeatmapApp:
                                     state='disabled')
         self.cancel_btn.grid(row=0, column=2)
         
+        open_session_btn = ttk.Button(action_frame, text="📂 Abrir Sesión", 
+                                     command=self.open_session,
+                                     bootstyle="info-outline",
+                                     width=15)
+        open_session_btn.grid(row=0, column=3, padx=(10, 0))
+        
         # Barra de progreso
         progress_frame = ttk.Frame(main_frame)
         progress_frame.grid(row=5, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=(0, 10))
@@ -911,6 +3554,10 @@ class HeatmapApp:
         
         self.on_mode_change()
     
+    def update_sensitivity_label(self, value):
+        # Actualizar la etiqueta con el valor actual del control deslizante
+        self.sensitivity_value_label.config(text=f"{float(value):.1f}")
+    
     def on_mode_change(self):
         self.refresh_folder_info()
     
@@ -924,7 +3571,10 @@ class HeatmapApp:
     def on_folder_selected(self, event=None):
         self.refresh_folder_info()
     
-    def refresh_folder_info(self):
+    def refresh_folder_info(self, limpiar_cache=False):
+        if limpiar_cache:
+            self.directory_cache.limpiar()
+        
         folder = self.selected_folder.get()
         if not folder or not os.path.exists(folder):
             self.info_text.delete(1.0, tk.END)
@@ -951,7 +3601,11 @@ class HeatmapApp:
             self.info_text.insert(tk.END, f"❌ No se encontraron imágenes\n")
             self.generate_btn.config(state='disabled')
         else:
-            self.info_text.insert(tk.END, f"📸 Imágenes encontradas: {len(image_files)}\n\n")
+            num_videos = sum(1 for f in image_files if es_video(f))
+            self.info_text.insert(tk.END, f"📸 Imágenes encontradas: {len(image_files) - num_videos}\n")
+            if num_videos:
+                self.info_text.insert(tk.END, f"🎬 Vídeos encontrados: {num_videos}\n")
+            self.info_text.insert(tk.END, "\n")
             
             # Mostrar algunas imágenes de ejemplo
             sample_files = image_files[:5]
@@ -963,11 +3617,16 @@ class HeatmapApp:
                 self.info_text.insert(tk.END, f"  ... y {len(image_files) - 5} más\n")
             
             self.generate_btn.config(state='normal')
+            self.scan_metadata([(None, image_files)])
     
     def process_multi_folder_info(self, folder):
         # Buscar subcarpetas
-        subfolders = [f for f in os.listdir(folder) 
-                     if os.path.isdir(os.path.join(folder, f)) and not f.startswith('.')]
+        try:
+            _, subfolder_paths = self.directory_cache.listar(folder)
+        except OSError:
+            subfolder_paths = []
+        subfolders = [os.path.basename(path) for path in subfolder_paths
+                      if not es_carpeta_de_salida(os.path.basename(path))]
         
         self.info_text.insert(tk.END, f"📁 Modo: Múltiples cámaras\n")
         self.info_text.insert(tk.END, f"📂 Carpeta principal: {folder}\n")
@@ -995,7 +3654,11 @@ class HeatmapApp:
                 total_images += len(image_files)
                 
                 self.info_text.insert(tk.END, f"📷 {subfolder}:\n")
-                self.info_text.insert(tk.END, f"  └── {len(image_files)} imágenes\n")
+                num_videos = sum(1 for f in image_files if es_video(f))
+                if num_videos:
+                    self.info_text.insert(tk.END, f"  └── {len(image_files) - num_videos} imágenes, {num_videos} vídeos\n")
+                else:
+                    self.info_text.insert(tk.END, f"  └── {len(image_files)} imágenes\n")
             else:
                 self.info_text.insert(tk.END, f"⚠️ {subfolder}:\n")
                 self.info_text.insert(tk.END, f"  └── Sin imágenes válidas\n")
@@ -1003,29 +3666,53 @@ class HeatmapApp:
         if self.camera_folders:
             self.info_text.insert(tk.END, f"\n📊 Total: {len(self.camera_folders)} cámaras, {total_images} imágenes\n")
             self.generate_btn.config(state='normal')
+            self.scan_metadata([(camera['name'], camera['images']) for camera in self.camera_folders])
         else:
             self.info_text.insert(tk.END, f"\n❌ No se encontraron carpetas con imágenes válidas\n")
             self.generate_btn.config(state='disabled')
     
+    def scan_metadata(self, camaras):
+        """Lee en segundo plano las cabeceras de los archivos de cada cámara y muestra el resumen"""
+        self.metadata_scan_id += 1
+        scan_id = self.metadata_scan_id
+        
+        def escanear():
+            metadatos = [(nombre, escanear_metadatos(archivos)) for nombre, archivos in camaras]
+            self.root.after(0, lambda: self.show_metadata(scan_id, metadatos))
+        
+        threading.Thread(target=escanear, daemon=True).start()
+    
+    def show_metadata(self, scan_id, metadatos):
+        # Ignorar resultados de una carpeta que ya no está seleccionada
+        if scan_id != self.metadata_scan_id:
+            return
+        
+        total_archivos = sum(m['archivos'] for _, m in metadatos)
+        total_bytes = sum(m['bytes'] for _, m in metadatos)
+        conteo = {}
+        self.info_text.insert(tk.END, f"\n📐 Resoluciones (cabeceras):\n")
+        for nombre, m in metadatos:
+            for resolucion, rutas in m['resoluciones'].items():
+                conteo[resolucion] = conteo.get(resolucion, 0) + len(rutas)
+            partes = [f"{w}×{h} ({len(rutas)})" for (w, h), rutas in
+                      sorted(m['resoluciones'].items(), key=lambda kv: -len(kv[1]))]
+            if m['ilegibles']:
+                partes.append(f"{len(m['ilegibles'])} ilegibles")
+            aviso = "⚠️ " if len(m['resoluciones']) > 1 or m['ilegibles'] else ""
+            prefijo = f"{nombre}: " if nombre else ""
+            self.info_text.insert(tk.END, f"  {aviso}{prefijo}{', '.join(partes)}\n")
+        self.info_text.insert(tk.END, f"💾 {total_archivos} archivos, {formatear_bytes(total_bytes)}\n")
+        
+        # Rellenar la resolución con la más frecuente
+        if conteo:
+            ancho, alto = max(conteo.items(), key=lambda kv: kv[1])[0]
+            self.img_width.set(str(ancho))
+            self.img_height.set(str(alto))
+            if len(conteo) > 1:
+                self.info_text.insert(tk.END, f"⚠️ Resoluciones mezcladas: se usa {ancho}×{alto}\n")
+    
     def find_images_in_folder(self, folder):
-            image_extensions = ['*.jpg', '*.jpeg', '*.png', '*.bmp', '*.tiff']
-            image_files = []
-            for ext in image_extensions:
-                image_files.extend(glob.glob(os.path.join(folder, ext)))
-                image_files.extend(glob.glob(os.path.join(folder, ext.upper())))
-            
-            # Eliminar duplicados usando rutas reales normalizadas
-            unique_files = set()
-            result = []
-            for file_path in image_files:
-                # Obtener la ruta real (resuelve enlaces simbólicos)
-                real_path = os.path.realpath(file_path)
-                # Normalizar la ruta para comparación consistente
-                normalized_path = os.path.normcase(real_path)
-                if normalized_path not in unique_files:
-                    unique_files.add(normalized_path)
-                    result.append(file_path)
-            return result
+        return buscar_imagenes(folder, self.recursive_search.get(), self.directory_cache)
     
     def log_message(self, message):
         timestamp = datetime.now().strftime("%H:%M:%S")
@@ -1063,6 +3750,25 @@ class HeatmapApp:
                 raise ValueError("El tamaño del damero debe ser positivo")
             if img_resolution[0] <= 0 or img_resolution[1] <= 0:
                 raise ValueError("La resolución de imagen debe ser positiva")
+            if float(self.duplicate_tolerance.get()) < 0:
+                raise ValueError("La tolerancia de duplicados no puede ser negativa")
+            if int(self.video_step.get()) <= 0:
+                raise ValueError("El paso de muestreo de vídeo debe ser positivo")
+            if float(self.video_motion.get()) < 0:
+                raise ValueError("El umbral de movimiento no puede ser negativo")
+            if not 0 <= int(self.verify_level.get()) <= 100:
+                raise ValueError("La calidad de las imágenes de verificación debe estar entre 0 y 100")
+            if int(self.verify_every.get()) <= 0:
+                raise ValueError("El intervalo de muestreo de verificación debe ser positivo")
+            if float(self.min_sharpness.get()) < 0 or float(self.min_contrast.get()) < 0:
+                raise ValueError("Los umbrales de nitidez y contraste no pueden ser negativos")
+            if not 0 <= float(self.max_clipped.get()) <= 100:
+                raise ValueError("El porcentaje de píxeles saturados debe estar entre 0 y 100")
+            if TIPOS_TABLERO.get(self.board_type.get()) == "charuco":
+                try:
+                    DetectorCharuco(chess_size, self.charuco_dictionary.get())
+                except RuntimeError as e:
+                    raise ValueError(str(e))
                 
         except ValueError as e:
             messagebox.showerror("Error de configuración", f"Configuración inválida: {str(e)}")
@@ -1075,7 +3781,10 @@ class HeatmapApp:
         self.generate_btn.config(state='disabled')
         self.cancel_btn.config(state='normal')
         self.log_text.delete(1.0, tk.END)
-        self.log_message(f"🔍 Sensibilidad de detección: {detection_sensitivity:.1f}")
+        if self.auto_sensitivity.get() and TIPOS_TABLERO.get(self.board_type.get()) == "damero":
+            self.log_message("🔍 Sensibilidad de detección: automática por cámara")
+        else:
+            self.log_message(f"🔍 Sensibilidad de detección: {detection_sensitivity:.1f}")
         if save_debug_images:
             self.log_message("🔍 Guardando imágenes de depuración")
         
@@ -1102,7 +3811,7 @@ class HeatmapApp:
         
         output_path = os.path.join(os.path.dirname(folder), f"mapa_calor_{os.path.basename(folder)}.png")
         
-        success, heatmap, polygons_info, processed_count, total_files = self.crear_mapa_de_cobertura(
+        success, heatmap, polygons_info, processed_count, total_files, selected = self.crear_mapa_de_cobertura(
             folder, chess_size, img_resolution, output_path, "Cámara única", detection_sensitivity, save_debug_images
         )
         
@@ -1112,8 +3821,15 @@ class HeatmapApp:
             color_map = cv2.applyColorMap(heatmap_normalized, cv2.COLORMAP_JET)
             cv2.imwrite(output_path, color_map)
             
+            # Analizar cobertura por celdas, escala e inclinación
+            analisis = analizar_cobertura(heatmap, cuadrilateros_de_poligonos(polygons_info, selected), img_resolution)
+            self.log_message(
+                f"📊 Cobertura {analisis['puntuacion']:.0f}% "
+                f"({analisis['celdas_cubiertas']}/{analisis['celdas_total']} celdas)"
+            )
+            
             # Abrir visor interactivo
-            self.open_heatmap_viewer(heatmap, polygons_info, "Cámara única", output_path, img_resolution)
+            self.open_heatmap_viewer(heatmap, polygons_info, "Cámara única", output_path, img_resolution, selected)
             
             self.log_message(f"✅ Mapa de calor generado: {output_path}")
         else:
@@ -1150,7 +3866,7 @@ class HeatmapApp:
             # Generar nombre de archivo de salida
             output_path = os.path.join(folder, f"mapa_calor_{camera_name}.png")
             
-            success, heatmap, polygons_info, processed_count, total_files = self.crear_mapa_de_cobertura(
+            success, heatmap, polygons_info, processed_count, total_files, selected = self.crear_mapa_de_cobertura(
                 camera_path, chess_size, img_resolution, output_path, camera_name, detection_sensitivity, save_debug_images
             )
             
@@ -1160,21 +3876,40 @@ class HeatmapApp:
                 color_map = cv2.applyColorMap(heatmap_normalized, cv2.COLORMAP_JET)
                 cv2.imwrite(output_path, color_map)
                 
-                # Guardar datos para la galería
-                gallery_items.append({
+                # Analizar cobertura por celdas, escala e inclinación
+                analisis = analizar_cobertura(heatmap, cuadrilateros_de_poligonos(polygons_info, selected), img_resolution)
+                self.log_message(
+                    f"📊 {camera_name}: cobertura {analisis['puntuacion']:.0f}% "
+                    f"({analisis['celdas_cubiertas']}/{analisis['celdas_total']} celdas)"
+                )
+                
+                # Guardar datos para la galería: solo la miniatura y el resumen; el acumulador
+                # queda en la sesión (_deteccion) y el visor lo abre cuando se necesita
+                item = {
                     'camera_name': camera_name,
-                    'heatmap': heatmap,
-                    'polygons_info': polygons_info,
                     'output_path': output_path,
                     'processed_count': processed_count,
-                    'total_files': total_files
-                })
+                    'total_files': total_files,
+                    'cobertura': analisis,
+                    'miniatura': miniatura_heatmap(heatmap)
+                }
+                if not os.path.exists(os.path.join(ruta_resultados(output_path), "heatmap.npy")):
+                    # Sin sesión guardada no hay de dónde volver a leerlo
+                    item.update(heatmap=heatmap, polygons_info=polygons_info, selected=selected)
+                gallery_items.append(item)
+                del heatmap, polygons_info
                 
                 successful_cameras += 1
                 self.log_message(f"✅ {camera_name}: Completado")
             else:
                 self.log_message(f"❌ {camera_name}: Sin imágenes válidas")
         
+        # Calibración de todas las cámaras a la vez con sus esquinas guardadas
+        if self.calibrate_cameras.get() and gallery_items and not self.cancel_processing_flag:
+            self.progress_label.config(text="Calibrando...")
+            self.root.update_idletasks()
+            self.calibrar_camaras(gallery_items)
+        
         # Progreso final
         self.progress.config(value=100)
         self.progress_label.config(text="Completado")
@@ -1197,9 +3932,27 @@ class HeatmapApp:
             self.log_message("❌ No se pudo procesar ninguna cámara")
             messagebox.showwarning("Advertencia", "No se pudo procesar ninguna cámara")
     
+    def calibrar_camaras(self, gallery_items):
+        """Calibra en paralelo cada cámara con su selección y deja calibracion.json en su sesión"""
+        directorios = {item['camera_name']: ruta_resultados(item['output_path']) for item in gallery_items}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            futuros = {executor.submit(calibrar_sesion, directorio): camera_name
+                       for camera_name, directorio in directorios.items()}
+            for future in concurrent.futures.as_completed(futuros):
+                camera_name = futuros[future]
+                try:
+                    resultado = future.result()
+                except (OSError, ValueError, cv2.error) as e:
+                    self.log_message(f"⚠️ {camera_name}: no se pudo calibrar: {str(e)}")
+                    continue
+                if resultado is None:
+                    self.log_message(f"⚠️ {camera_name}: imágenes insuficientes para calibrar")
+                    continue
+                peor = int(resultado['indices'][np.argmax(resultado['errores'])])
+                self.log_message(f"📐 {camera_name}: RMS {resultado['rms']:.3f} px con {len(resultado['indices'])} imágenes "
+                                 f"(peor: #{peor + 1}, {resultado['errores'].max():.2f} px)")
+    
     def crear_mapa_de_cobertura(self, images_path, chessboard_size, image_resolution, output_path, camera_name, detection_sensitivity, save_debug_images):
-        heatmap = np.zeros((image_resolution[1], image_resolution[0]), dtype=np.float32)
-        polygons_info = []  # (filename, polygon, bbox, centroid)
         criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 30, 0.001)
         
         # Crear carpeta para imágenes de depuración si es necesario
@@ -1212,199 +3965,173 @@ class HeatmapApp:
         image_files = self.find_images_in_folder(images_path)
         total_files = len(image_files)
         if not image_files:
-            return False, None, [], 0, 0
+            return False, None, [], 0, 0, []
         
         processed_count = 0
         progress_lock = threading.Lock()  # Para actualizar progress de manera segura
         
-        def procesar_imagen(filename):
-            if self.cancel_processing_flag:
-                return None
-                
-            img = cv2.imread(filename)
-            if img is None:
-                return None
-            
-            # Reducir la imagen para procesamiento
-            original_height, original_width = img.shape[:2]
-            scale_factor = min(REDUCED_RESOLUTION[0]/original_width, REDUCED_RESOLUTION[1]/original_height)
-            new_width = int(original_width * scale_factor)
-            new_height = int(original_height * scale_factor)
-            img_resized = cv2.resize(img, (new_width, new_height))
-            
-            # Mejoras en la detección del damero
-            gray = cv2.cvtColor(img_resized, cv2.COLOR_BGR2GRAY)
-            
-            # Usar el nivel de sensibilidad pasado como parámetro
-            sensitivity = detection_sensitivity
-            
-            # Ajustar parámetros basados en la sensibilidad
-            # Mayor sensibilidad = procesamiento más agresivo y más variantes
-            blur_size = max(3, int(5 - sensitivity))
-            clahe_clip = 2.0 + sensitivity / 2.0
-            gamma_value = 1.0 + sensitivity / 5.0
-            canny_threshold1 = int(70 - sensitivity * 10)
-            canny_threshold2 = int(150 + sensitivity * 10)
-            
-            # Aplicar múltiples técnicas de preprocesamiento para mejorar la detección
-            img_versions = []
-            
-            # Siempre incluir la imagen original
-            img_versions.append(gray)
-            
-            # Versión 1: Ecualización de histograma con filtro gaussiano
-            gray_eq = cv2.equalizeHist(gray)
-            gray_eq_blur = cv2.GaussianBlur(gray_eq, (blur_size, blur_size), 1.0)
-            img_versions.append(gray_eq_blur)
-            
-            # Versión 2: Filtro adaptativo para mejorar contraste local
-            clahe = cv2.createCLAHE(clipLimit=clahe_clip, tileGridSize=(8, 8))
-            gray_clahe = clahe.apply(gray)
-            gray_clahe_blur = cv2.GaussianBlur(gray_clahe, (blur_size, blur_size), 1.0)
-            img_versions.append(gray_clahe_blur)
-            
-            # Versión 3: Ajuste de gamma para mejorar detalles en áreas oscuras
-            gray_gamma = np.array(255 * (gray / 255) ** gamma_value, dtype='uint8')
-            img_versions.append(gray_gamma)
-            
-            # Versión 4: Filtro bilateral para preservar bordes
-            gray_bilateral = cv2.bilateralFilter(gray, 11, 17, 17)
-            img_versions.append(gray_bilateral)
-            
-            # Versión 5: Detección de bordes con Canny + dilatación para conectar bordes
-            edges = cv2.Canny(gray, canny_threshold1, canny_threshold2)
-            kernel = np.ones((5, 5), np.uint8)
-            edges_dilated = cv2.dilate(edges, kernel, iterations=1)
-            img_versions.append(255 - edges_dilated)  # Invertir para que los bordes sean oscuros
-            
-            # Con alta sensibilidad, añadir versiones adicionales
-            if sensitivity > 3.0:
-                # Versión 6: Combinación de CLAHE y gamma
-                gray_clahe_gamma = np.array(255 * (gray_clahe / 255) ** gamma_value, dtype='uint8')
-                img_versions.append(gray_clahe_gamma)
-                
-                # Versión 7: Umbralización adaptativa
-                gray_thresh = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-                                                  cv2.THRESH_BINARY, 11, 2)
-                img_versions.append(255 - gray_thresh)  # Invertir para que el damero sea oscuro
-            
-            # Configurar parámetros de detección más robustos
-            flags = cv2.CALIB_CB_ADAPTIVE_THRESH | cv2.CALIB_CB_NORMALIZE_IMAGE | \
-                    cv2.CALIB_CB_FILTER_QUADS | cv2.CALIB_CB_FAST_CHECK
-            criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 100, 0.000001)
-            
-            # Intentar detectar el damero en cada versión de la imagen
-            ret = False
-            corners = None
-            
-            for img_version in img_versions:
-                if self.cancel_processing_flag:
-                    return None
-                    
-                # Intentar con esta versión de la imagen
-                ret_attempt, corners_attempt = cv2.findChessboardCorners(img_version, chessboard_size, flags=flags)
+        tablero = TIPOS_TABLERO.get(self.board_type.get(), "damero")
+        if self.auto_sensitivity.get() and tablero == "damero":
+            # Sensibilidad automática: se elige con una muestra antes de procesar la carpeta entera
+            inicio = time.perf_counter()
+            ajuste = ajustar_sensibilidad(image_files, chessboard_size, cancelado=lambda: self.cancel_processing_flag)
+            if ajuste is None:
+                self.log_message(f"🎚️ {camera_name}: muy pocas imágenes para elegir la sensibilidad; se usa {detection_sensitivity:.1f}")
+            else:
+                detection_sensitivity, tabla, muestra = ajuste
+                detalle = ", ".join(f"{nivel:.1f}: {detectadas}/{muestra} en {ms:.0f} ms"
+                                    for nivel, (detectadas, ms) in tabla.items())
+                self.log_message(f"🎚️ {camera_name}: sensibilidad automática {detection_sensitivity:.1f} "
+                                 f"({detalle}; {time.perf_counter() - inicio:.1f}s)")
+        
+        autoescalado = AutoescaladoHilos()
+        informe = InformeEjecucion(camera_name, detection_sensitivity, autoescalado.maximo)
+        resultados = ResultadosDeteccion(camera_name, chessboard_size, image_resolution, detection_sensitivity)
+        resultados.tablero = tablero
+        modo_calidad = MODOS_CALIDAD.get(self.quality_mode.get(), "medir")
+        umbrales = crear_umbrales_calidad(float(self.min_sharpness.get()), float(self.max_clipped.get()),
+                                          float(self.min_contrast.get()))
+        resultados.umbrales_calidad = umbrales
+        calidad_bajas = [0]  # imágenes por debajo de los umbrales (descartadas o con detección rápida)
+        detector = crear_detector(tablero, chessboard_size, detection_sensitivity, self.charuco_dictionary.get())
+        
+        # Imágenes de verificación y depuración: se codifican y escriben en hilos aparte
+        escritor = None
+        verify_dir = os.path.join(os.path.dirname(output_path), "verificacion_damero")
+        muestreo = MUESTREO_VERIFICACION.get(self.verify_sampling.get(), "todas")
+        cada_n = int(self.verify_every.get())
+        detectadas = [0]
+        if self.save_individual.get() or save_debug_images:
+            escritor = EscritorImagenes(FORMATOS_VERIFICACION.get(self.verify_format.get()), int(self.verify_level.get()))
+        
+        def debe_escribir(detectada):
+            """Aplica el muestreo de verificación a una imagen detectada o fallida"""
+            if muestreo == "fallos":
+                return not detectada
+            if not detectada:
+                return False
+            if muestreo == "cada_n":
+                with progress_lock:
+                    detectadas[0] += 1
+                    return (detectadas[0] - 1) % cada_n == 0
+            return True
+        
+        def enviar_variantes(img_versions, base_filename):
+            font = cv2.FONT_HERSHEY_SIMPLEX
+            for i, img_version in enumerate(img_versions):
+                # Convertir a color para poder dibujar
+                if len(img_version.shape) == 2:
+                    img_version_color = cv2.cvtColor(img_version, cv2.COLOR_GRAY2BGR)
+                else:
+                    img_version_color = img_version.copy()
                 
-                if ret_attempt:
-                    ret = True
-                    corners = corners_attempt
-                    break
-            
-            # Si no se detectó con ninguna versión, intentar con findChessboardCornersSB (más robusto pero más lento)
-            if not ret:
-                try:
-                    # Este método es más robusto para dameros parcialmente visibles o con distorsión
-                    ret, corners = cv2.findChessboardCornersSB(gray, chessboard_size, flags=flags)
-                except:
-                    # Si el método no está disponible (versiones antiguas de OpenCV), usar el método estándar una última vez
-                    ret, corners = cv2.findChessboardCorners(gray, chessboard_size, flags=flags)
+                # Añadir etiqueta de versión
+                cv2.putText(img_version_color, f"Versión {i}", (10, 30), font, 0.7, (0, 0, 255), 2)
+                escritor.enviar(debug_folder, f"v{i}_{base_filename}", img_version_color)
+        
+        def procesar_imagen(filename, img=None, seguimiento=None):
+            perfil = PerfilImagen(filename)
+            with perfil.etapa("total"):
+                resultado = detectar_imagen(filename, perfil, img, seguimiento)
+            return resultado, perfil
+        
+        def detectar_imagen(filename, perfil, img=None, seguimiento=None):
+            if self.cancel_processing_flag:
+                return None
             
-            if not ret:
+            # Los fotogramas de vídeo llegan ya decodificados
+            if img is None:
+                with perfil.etapa("decodificacion"):
+                    img = leer_imagen(filename)
+            if img is None:
                 return None
             
-            # Mejorar la precisión de las esquinas detectadas
-            # Usar una ventana más grande para el refinamiento de esquinas
-            # y criterios más estrictos para mayor precisión
-            corners_subpix = cv2.cornerSubPix(gray, corners, (13, 13), (-1, -1), criteria)
+            # Reducir la imagen para procesamiento
+            with perfil.etapa("redimension"):
+                original_height, original_width = img.shape[:2]
+                img_resized, gray, (scale_back_x, scale_back_y) = reducir_para_deteccion(img)
+            
+            # Calidad (nitidez, saturación, contraste): barata sobre la imagen reducida
+            with perfil.etapa("calidad"):
+                perfil.calidad = calidad_imagen(gray)
+            defectos = defectos_calidad(perfil.calidad, umbrales) if modo_calidad != "medir" else []
+            perfil.defectos = defectos
+            if defectos:
+                with progress_lock:
+                    calidad_bajas[0] += 1
+                if modo_calidad == "rechazar":
+                    return None  # Se informa desde el bucle de reparto, no desde el hilo de detección
             
-            # Obtener las esquinas del tablero
-            top_left = corners_subpix[0][0]
-            top_right = corners_subpix[chessboard_size[0] - 1][0]
-            bottom_right = corners_subpix[-1][0]
-            bottom_left = corners_subpix[-chessboard_size[0]][0]
+            # Usar el nivel de sensibilidad pasado como parámetro
+            sensitivity = detection_sensitivity
             
-            # Escalar de vuelta a la resolución original
-            scale_back_x = original_width / new_width
-            scale_back_y = original_height / new_height
-            top_left = (top_left[0] * scale_back_x, top_left[1] * scale_back_y)
-            top_right = (top_right[0] * scale_back_x, top_right[1] * scale_back_y)
-            bottom_right = (bottom_right[0] * scale_back_x, bottom_right[1] * scale_back_y)
-            bottom_left = (bottom_left[0] * scale_back_x, bottom_left[1] * scale_back_y)
+            # Con seguimiento se busca primero cerca del tablero del fotograma anterior del tramo
+            region = None
+            if seguimiento is not None:
+                region = seguimiento.region(gray.shape[1], gray.shape[0])
             
-            # Crear polígono
-            pts = np.array([top_left, top_right, bottom_right, bottom_left], np.int32).reshape((-1, 1, 2))
+            # Damero: variantes de preprocesamiento y detección; ChArUco: marcadores sobre la imagen gris.
+            # Las imágenes de mala calidad (modo "rapida") solo se prueban sin preprocesar
+            corners_subpix, img_versions = detector.detectar(
+                gray, perfil, cancelado=lambda: self.cancel_processing_flag, region=region, completa=not defectos
+            )
+            if seguimiento is not None:
+                seguimiento.intentos += region is not None
+                seguimiento.aciertos += perfil.variante == 'roi'
+                seguimiento.actualizar(corners_subpix, gray.shape[1], gray.shape[0])
+            if corners_subpix is None:
+                # Con muestreo "solo fallos" se guarda la imagen (y sus variantes) en la que no se encontró el damero
+                if escritor is not None and debe_escribir(False):
+                    base_filename = nombre_exportacion(filename)
+                    if self.save_individual.get():
+                        escritor.enviar(verify_dir, f"fallo_{base_filename}", img_resized)
+                    if save_debug_images and debug_folder:
+                        enviar_variantes(img_versions, f"fallo_{base_filename}")
+                return None
             
-            # Calcular bounding box
-            x_coords = pts[:,0,0]
-            y_coords = pts[:,0,1]
-            bbox = (int(min(x_coords)), int(min(y_coords)), int(max(x_coords)), int(max(y_coords)))
+            # Escalar todas las esquinas de vuelta a la resolución original
+            esquinas = corners_subpix * np.array([scale_back_x, scale_back_y], dtype=np.float32)
             
-            # Calcular centroide
-            centroid = (int(np.mean(x_coords)), int(np.mean(y_coords)))
+            # Crear polígono, bounding box y centroide a partir de las esquinas del tablero
+            pts, bbox, centroid = poligono_desde_esquinas(esquinas, chessboard_size)
             
             # Opcionalmente guardar una imagen con el damero detectado para verificación
-            if self.save_individual.get() or save_debug_images:
-                # Crear una copia de la imagen original para dibujar
-                img_with_corners = img_resized.copy()
-                # Dibujar las esquinas y el patrón del damero
-                cv2.drawChessboardCorners(img_with_corners, chessboard_size, corners_subpix, ret)
-                # Dibujar el polígono que delimita el damero
-                pts_draw = np.array([top_left, top_right, bottom_right, bottom_left], np.int32).reshape((-1, 1, 2))
-                pts_draw = (pts_draw / np.array([scale_back_x, scale_back_y], dtype=np.float32)).astype(np.int32)
-                cv2.polylines(img_with_corners, [pts_draw], True, (0, 255, 0), 2)
-                # Dibujar el centroide
-                centroid_draw = (int(centroid[0] / scale_back_x), int(centroid[1] / scale_back_y))
-                cv2.circle(img_with_corners, centroid_draw, 5, (0, 0, 255), -1)
-                
-                base_filename = os.path.basename(filename)
-                
-                # Guardar en subcarpeta de verificación si está habilitado
-                if self.save_individual.get():
-                    verify_dir = os.path.join(os.path.dirname(output_path), "verificacion_damero")
-                    os.makedirs(verify_dir, exist_ok=True)
-                    verify_path = os.path.join(verify_dir, f"detected_{base_filename}")
-                    cv2.imwrite(verify_path, img_with_corners)
-                
-                # Guardar en carpeta de depuración si está habilitado
-                if save_debug_images and debug_folder:
-                    # Añadir información adicional a la imagen
-                    font = cv2.FONT_HERSHEY_SIMPLEX
-                    cv2.putText(img_with_corners, f"Sensibilidad: {sensitivity:.1f}", (10, 30), font, 0.7, (0, 0, 255), 2)
+            if escritor is not None and debe_escribir(True):
+                with perfil.etapa("verificacion"):
+                    # Crear una copia de la imagen original para dibujar
+                    img_with_corners = img_resized.copy()
+                    # Dibujar las esquinas y el patrón del damero
+                    dibujar_esquinas(img_with_corners, corners_subpix, chessboard_size)
+                    # Dibujar el polígono que delimita el damero
+                    pts_draw = (pts / np.array([scale_back_x, scale_back_y], dtype=np.float32)).astype(np.int32)
+                    cv2.polylines(img_with_corners, [pts_draw], True, (0, 255, 0), 2)
+                    # Dibujar el centroide
+                    centroid_draw = (int(centroid[0] / scale_back_x), int(centroid[1] / scale_back_y))
+                    cv2.circle(img_with_corners, centroid_draw, 5, (0, 0, 255), -1)
                     
-                    # Guardar versiones de preprocesamiento también
-                    for i, img_version in enumerate(img_versions):
-                        # Convertir a color para poder dibujar
-                        if len(img_version.shape) == 2:
-                            img_version_color = cv2.cvtColor(img_version, cv2.COLOR_GRAY2BGR)
-                        else:
-                            img_version_color = img_version.copy()
-                            
-                        # Añadir etiqueta de versión
-                        cv2.putText(img_version_color, f"Versión {i}", (10, 30), font, 0.7, (0, 0, 255), 2)
-                        
-                        # Guardar
-                        version_path = os.path.join(debug_folder, f"v{i}_{base_filename}")
-                        cv2.imwrite(version_path, img_version_color)
+                    base_filename = nombre_exportacion(filename)
                     
-                    # Guardar imagen con detección
-                    debug_path = os.path.join(debug_folder, f"detected_{base_filename}")
-                    cv2.imwrite(debug_path, img_with_corners)
+                    # Guardar en subcarpeta de verificación si está habilitado
+                    if self.save_individual.get():
+                        escritor.enviar(verify_dir, f"detected_{base_filename}", img_with_corners)
+                    
+                    # Guardar en carpeta de depuración si está habilitado
+                    if save_debug_images and debug_folder:
+                        # Añadir información adicional a una copia (la anterior puede no estar escrita aún)
+                        img_with_corners = img_with_corners.copy()
+                        font = cv2.FONT_HERSHEY_SIMPLEX
+                        cv2.putText(img_with_corners, f"Sensibilidad: {sensitivity:.1f}", (10, 30), font, 0.7, (0, 0, 255), 2)
+                        
+                        # Guardar versiones de preprocesamiento también
+                        enviar_variantes(img_versions, base_filename)
+                        
+                        # Guardar imagen con detección
+                        escritor.enviar(debug_folder, f"detected_{base_filename}", img_with_corners)
             
             # Liberar memoria de manera más agresiva
             del img, img_resized, gray, img_versions
             if 'img_with_corners' in locals():
                 del img_with_corners
-            if 'img_version_color' in locals():
-                del img_version_color
             if 'pts_draw' in locals():
                 del pts_draw
             if 'centroid_draw' in locals():
@@ -1412,48 +4139,270 @@ class HeatmapApp:
             if self.optimize_performance.get():
                 gc.collect()
                 
-            return filename, pts, bbox, centroid
+            return filename, pts, bbox, centroid, esquinas, (original_width, original_height)
 
-        # Usar ThreadPoolExecutor para procesamiento concurrente
-        with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-            futures = {executor.submit(procesar_imagen, f): f for f in image_files}
-            
-            for future in concurrent.futures.as_completed(futures):
-                if self.cancel_processing_flag:
-                    executor.shutdown(wait=False, cancel_futures=True)
+        # Los vídeos se leen como secuencias de fotogramas; el resto son imágenes sueltas
+        videos = [f for f in image_files if es_video(f)]
+        image_files = [f for f in image_files if not es_video(f)]
+        video_step = int(self.video_step.get())
+        video_motion = float(self.video_motion.get())
+        if videos:
+            # Total aproximado: imágenes más los fotogramas muestreados según el paso
+            total_files = len(image_files) + sum(estimar_fotogramas(v, video_step) for v in videos)
+        
+        # Ráfagas: los fotogramas casi idénticos al primero de su serie no pasan por la detección
+        modo_rafaga = MODOS_RAFAGA.get(self.burst_mode.get())
+        archivos_a_detectar = image_files
+        seguidores = {}  # representante -> fotogramas repetidos
+        if modo_rafaga and image_files:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+                firmas = dict(zip(image_files, executor.map(firma_imagen, image_files)))
+            representantes = agrupar_rafagas(image_files, firmas)
+            archivos_a_detectar = [f for f in image_files if representantes[f] == f]
+            for filename, representante in representantes.items():
+                if representante != filename:
+                    seguidores.setdefault(representante, []).append(filename)
+            repetidos = len(image_files) - len(archivos_a_detectar)
+            informe.contadores[f"rafaga_{modo_rafaga}"] = repetidos
+            self.log_message(f"🎞️ {camera_name}: {repetidos} fotogramas repetidos ({modo_rafaga})")
+        
+        fotogramas_muestreados = {}  # vídeo -> fotogramas enviados a detección
+        
+        # Seguimiento: las imágenes, en orden de captura, se reparten en tramos consecutivos
+        # (tantos como hilos puede llegar a haber); dentro de cada tramo se procesan en orden
+        # para prever dónde estará el tablero
+        tramos = []
+        if self.track_roi.get() and archivos_a_detectar:
+            ordenados = sorted(archivos_a_detectar, key=clave_orden)
+            tamano_tramo = math.ceil(len(ordenados) / autoescalado.maximo)
+            tramos = [(iter(ordenados[i:i + tamano_tramo]), SeguimientoROI())
+                      for i in range(0, len(ordenados), tamano_tramo)]
+        tramo_de = {}  # future -> tramo
+        tramos_libres = list(tramos)  # tramos sin ninguna imagen en curso
+        
+        def enviar_de_tramo(executor, pendientes, tramo):
+            filename = next(tramo[0], None)
+            if filename is not None:
+                future = executor.submit(procesar_imagen, filename, None, tramo[1])
+                tramo_de[future] = tramo
+                pendientes.add(future)
+        
+        def fuentes():
+            """Imágenes a detectar y, después, los fotogramas muestreados de cada vídeo"""
+            if not tramos:
+                for filename in archivos_a_detectar:
+                    yield filename, None
+            for video in videos:
+                self.log_message(f"🎬 Leyendo vídeo: {os.path.basename(video)}")
+                for indice, frame in muestrear_video(video, video_step, video_motion,
+                                                     cancelado=lambda: self.cancel_processing_flag):
+                    fotogramas_muestreados[video] = fotogramas_muestreados.get(video, 0) + 1
+                    yield ruta_fotograma(video, indice), frame
+        
+        # Usar ThreadPoolExecutor para procesamiento concurrente. Las tareas se envían a medida
+        # que hay hueco, así los fotogramas de vídeo no se acumulan en memoria; el hueco
+        # (detecciones simultáneas) lo decide el autoescalado
+        with hilos_opencv(autoescalado.hilos) as hilos_internos, \
+                concurrent.futures.ThreadPoolExecutor(max_workers=autoescalado.maximo) as executor:
+            self.log_message(f"🧵 {camera_name}: {NUCLEOS} núcleos, {autoescalado.hilos} hilos de detección "
+                             f"(autoescalado hasta {autoescalado.maximo}), OpenCV con {hilos_internos} hilo(s) interno(s)")
+            pendientes = set()
+            fuentes_restantes = fuentes()
+            fuentes_agotadas = False
+            while True:
+                while len(pendientes) < autoescalado.hilos:
+                    if tramos_libres:
+                        enviar_de_tramo(executor, pendientes, tramos_libres.pop(0))
+                        continue
+                    if fuentes_agotadas:
+                        break
+                    siguiente = next(fuentes_restantes, None)
+                    if siguiente is None:
+                        fuentes_agotadas = True
+                    else:
+                        pendientes.add(executor.submit(procesar_imagen, *siguiente))
+                if not pendientes or self.cancel_processing_flag:
                     break
+                
+                completados, pendientes = concurrent.futures.wait(
+                    pendientes, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in completados:
+                    result, perfil = future.result()
+                    if future in tramo_de:
+                        # La siguiente imagen del tramo se enviará ya con la región actualizada
+                        tramos_libres.append(tramo_de.pop(future))
+                    if result:
+                        filename, pts, bbox, centroid, esquinas, tamano = result
+                        
+                        # Los fotogramas repetidos de la ráfaga reutilizan esta misma detección
+                        archivos = [(filename, perfil.variante)]
+                        if modo_rafaga == "reutilizar":
+                            archivos += [(seguidor, "rafaga") for seguidor in seguidores.get(filename, [])]
+                        
+                        for filename, variante in archivos:
+                            resultados.agregar(filename, esquinas, tamano, variante, perfil.calidad)
+                            
+                            with progress_lock:
+                                processed_count += 1
+                                current_progress = min(100, processed_count / total_files * 100)
+                                if hasattr(self, 'progress') and hasattr(self, 'root'):
+                                    self.root.after(0, lambda p=current_progress: self.progress.config(value=p))
+                                self.log_message(f"✅ Procesada: {os.path.basename(filename)} ({processed_count}/{total_files})")
+                    elif perfil.defectos and modo_calidad == "rechazar":
+                        self.log_message(f"🌫️ Descartada por calidad: {os.path.basename(perfil.filename)} "
+                                         f"({', '.join(perfil.defectos)})")
                     
-                result = future.result()
-                if result:
-                    filename, pts, bbox, centroid = result
-                    polygons_info.append((filename, pts, bbox, centroid))
-                    
-                    # Crear máscara temporal solo para esta imagen
-                    mask = np.zeros((image_resolution[1], image_resolution[0]), dtype=np.float32)
-                    cv2.fillConvexPoly(mask, pts, 1.0)
-                    heatmap += mask
-                    
-                    # Liberar memoria inmediatamente
-                    del mask
-                    if self.optimize_performance.get():
-                        gc.collect()
-                    
-                    with progress_lock:
-                        processed_count += 1
-                        current_progress = min(100, processed_count / total_files * 100)
-                        if hasattr(self, 'progress') and hasattr(self, 'root'):
-                            self.root.after(0, lambda p=current_progress: self.progress.config(value=p))
-                        self.log_message(f"✅ Procesada: {os.path.basename(filename)} ({processed_count}/{total_files})")
+                    informe.registrar(perfil)
+                    autoescalado.registrar(perfil)
+                
+                cambio = autoescalado.ajustar()
+                if cambio:
+                    self.log_message(f"🧵 {camera_name}: {cambio}")
+        
+        informe.contadores["hilos_finales"] = autoescalado.hilos
+        informe.contadores["hilos_opencv"] = hilos_internos
+        if len(autoescalado.historial) > 1:
+            self.log_message(f"🧵 {camera_name}: configuración final de {autoescalado.hilos} hilos "
+                             f"({' → '.join(str(h) for h in autoescalado.historial)})")
+
+        if modo_calidad != "medir":
+            informe.contadores[f"calidad_{modo_calidad}"] = calidad_bajas[0]
+            if calidad_bajas[0]:
+                self.log_message(f"🌫️ {camera_name}: {calidad_bajas[0]} imágenes por debajo de los umbrales de calidad "
+                                 f"({'descartadas' if modo_calidad == 'rechazar' else 'con detección rápida'})")
+        
+        if tramos:
+            intentos = sum(seguimiento.intentos for _, seguimiento in tramos)
+            aciertos = sum(seguimiento.aciertos for _, seguimiento in tramos)
+            informe.contadores["seguimiento_aciertos"] = aciertos
+            self.log_message(f"🎯 {camera_name}: {aciertos}/{intentos} tableros encontrados en la región prevista")
+        
+        if escritor is not None:
+            escritas, errores = escritor.cerrar()
+            self.log_message(f"🖼️ {camera_name}: {escritas} imágenes de verificación escritas"
+                             + (f", {errores} con error" if errores else ""))
+        
+        if videos:
+            # El total estimado se sustituye por los fotogramas realmente muestreados
+            informe.contadores["fotogramas_video"] = sum(fotogramas_muestreados.values())
+            total_files = len(image_files) + informe.contadores["fotogramas_video"]
+        
+        # Guardar el informe de tiempos por etapa junto al mapa de calor
+        informe.finalizar()
+        try:
+            json_path, _ = informe.guardar(output_path)
+            self.log_message(f"⏱️ {camera_name}: {len(informe.perfiles)} imágenes en {informe.duracion:.1f}s - informe: {json_path}")
+        except OSError as e:
+            self.log_message(f"⚠️ No se pudo guardar el informe de tiempos: {str(e)}")
 
         if processed_count == 0:
-            return False, None, [], 0, 0
+            return False, None, [], 0, 0, []
+        
+        # Polígonos de todas las imágenes detectadas, en columnas
+        polygons_info = resultados.polygons_info()
+        
+        # Las poses se escalan al tamaño real de cada imagen, pero se pintan en un mapa de la resolución indicada
+        distintas = sum(1 for tamano in resultados.tamanos if tuple(tamano) != tuple(image_resolution))
+        if distintas:
+            self.log_message(f"⚠️ {camera_name}: {distintas} imágenes no tienen la resolución "
+                             f"{image_resolution[0]}×{image_resolution[1]} del mapa de calor")
+        
+        # Poses casi idénticas a otra anterior (en orden de captura): se deseleccionan o se descartan
+        descartar = self.drop_duplicates.get()
+        polygons_info, duplicadas = marcar_duplicados(
+            resultados, polygons_info, float(self.duplicate_tolerance.get()), descartar
+        )
+        if duplicadas:
+            self.log_message(f"🔁 {camera_name}: {duplicadas} poses duplicadas "
+                             f"{'descartadas' if descartar else 'deseleccionadas'}")
+        
+        selected = polygons_info.seleccion
+        
+        # Mapa de calor de las imágenes seleccionadas, rasterizado de una vez
+        inicio = time.perf_counter()
+        heatmap = rasterizar_poligonos(polygons_info, image_resolution, selected)
+        self.log_message(f"🧮 {camera_name}: mapa de calor de {int(np.count_nonzero(selected))} polígonos "
+                         f"en {(time.perf_counter() - inicio) * 1000:.0f} ms")
+        
+        # Guardar todas las esquinas detectadas (y la sesión inicial del visor)
+        # para reutilizarlas sin volver a leer las imágenes
+        resultados.total_files = total_files
+        try:
+            resultados_path = resultados.guardar(output_path)
+            guardar_sesion(output_path, selected, heatmap)
+            self.log_message(f"💾 Esquinas guardadas: {resultados_path}")
+        except OSError as e:
+            self.log_message(f"⚠️ No se pudieron guardar las esquinas detectadas: {str(e)}")
             
-        return True, heatmap, polygons_info, processed_count, total_files
+        return True, heatmap, polygons_info, processed_count, total_files, selected
 
-    def open_heatmap_viewer(self, heatmap, polygons_info, camera_name, output_path, image_resolution):
-        # Ejecutar en el hilo principal
+    def open_session(self):
+        """Abre sesiones guardadas sin volver a detectar: una cámara o todas las de una carpeta"""
+        directorio = filedialog.askdirectory(title="Seleccionar sesión (_deteccion) o carpeta con sesiones")
+        if not directorio:
+            return
+        
+        directorios = buscar_sesiones(directorio)
+        if not directorios:
+            messagebox.showwarning("Advertencia", "No se encontraron sesiones guardadas en la carpeta")
+            return
+        
+        if len(directorios) == 1:
+            try:
+                resultados, polygons_info, selected, heatmap = cargar_sesion(directorios[0], mmap=True)
+            except (OSError, ValueError, KeyError) as e:
+                self.log_message(f"⚠️ No se pudo abrir la sesión {directorios[0]}: {str(e)}")
+                return
+            self.log_message(f"📂 Sesión abierta: {resultados.camera_name} ({len(resultados)} imágenes)")
+            HeatmapViewer(
+                self.root, heatmap, polygons_info, resultados.camera_name,
+                ruta_mapa_desde_resultados(directorios[0]), resultados.image_resolution, self.show_plots.get(),
+                selected=selected, duplicados=resultados.duplicados,
+                calidad=resultados.calidad, umbrales_calidad=resultados.umbrales_calidad
+            )
+            return
+        
+        # Con varias sesiones solo se guarda la miniatura y el resumen; los visores las abren al pulsar
+        gallery_items = []
+        for sesion in directorios:
+            try:
+                resultados, polygons_info, selected, heatmap = cargar_sesion(sesion, mmap=True)
+                analisis = analizar_cobertura(
+                    heatmap, cuadrilateros_de_poligonos(polygons_info, selected), resultados.image_resolution
+                )
+                miniatura = miniatura_heatmap(heatmap)
+            except (OSError, ValueError, KeyError) as e:
+                self.log_message(f"⚠️ No se pudo abrir la sesión {sesion}: {str(e)}")
+                continue
+            del heatmap, polygons_info
+            gallery_items.append({
+                'camera_name': resultados.camera_name,
+                'output_path': ruta_mapa_desde_resultados(sesion),
+                'image_resolution': resultados.image_resolution,
+                'processed_count': len(resultados),
+                'total_files': resultados.total_files or len(resultados),
+                'cobertura': analisis,
+                'miniatura': miniatura
+            })
+            self.log_message(f"📂 Sesión abierta: {resultados.camera_name} ({len(resultados)} imágenes)")
+        
+        if gallery_items:
+            HeatmapGallery(self.root, gallery_items, gallery_items[0]['image_resolution'], self.show_plots.get())
+    
+    def open_heatmap_viewer(self, heatmap, polygons_info, camera_name, output_path, image_resolution, selected=None):
+        # Ejecutar en el hilo principal; las duplicadas y la calidad se leen de los resultados guardados
+        resultados = None
+        try:
+            resultados = ResultadosDeteccion.cargar(ruta_resultados(output_path))
+        except (OSError, ValueError, KeyError):
+            pass
         self.root.after(0, lambda: HeatmapViewer(
-            self.root, heatmap, polygons_info, camera_name, output_path, image_resolution, self.show_plots.get()
+            self.root, heatmap, polygons_info, camera_name, output_path, image_resolution, self.show_plots.get(),
+            selected=selected,
+            duplicados=resultados.duplicados if resultados is not None else None,
+            calidad=resultados.calidad if resultados is not None else None,
+            umbrales_calidad=resultados.umbrales_calidad if resultados is not None else None
         ))
     
     def add_to_history(self, folder):
@@ -1488,7 +4437,1371 @@ class HeatmapApp:
             self.folder_combobox.config(values=[])
             self.save_folder_history()
 
+# Procesamiento distribuido: un coordinador reparte lotes de imágenes por una cola compartida
+# y los trabajadores (en otros equipos con las mismas rutas, o procesos locales) devuelven
+# solo las esquinas detectadas
+PUERTO_DISTRIBUIDO = 50000
+LOTE_DISTRIBUIDO = 32  # Imágenes por tarea (cada vídeo es una tarea)
+REINTENTO_DISTRIBUIDO = 300.0  # Segundos desde que un trabajador toma un lote hasta volver a encolarlo
+VARIABLE_CLAVE = "MAPA_COBERTURA_CLAVE"  # Variable de entorno con la clave compartida
+
+
+class _ColaTareas(queue.Queue):
+    """Cola de tareas que recuerda cuándo tomó un trabajador cada lote (id -> time.monotonic())"""
+
+    def __init__(self):
+        super().__init__()
+        self.entregadas = {}
+
+    def get(self, block=True, timeout=None):
+        tarea = super().get(block, timeout)
+        if tarea is not None:
+            self.entregadas[tarea[0]] = time.monotonic()
+        return tarea
+
+
+class _ServidorColas(BaseManager):
+    pass
+
+
+class _ClienteColas(BaseManager):
+    pass
+
+
+def servir_colas(puerto, clave, host=""):
+    """Sirve en un hilo las colas de tareas y resultados. Devuelve (tareas, resultados, puerto)
+
+    La cola intercambia objetos serializados con pickle: nunca se sirve sin clave.
+    """
+    if not clave:
+        raise ValueError("Las colas distribuidas necesitan una clave")
+    tareas = _ColaTareas()
+    resultados = queue.Queue()
+    _ServidorColas.register('tareas', callable=lambda: tareas)
+    _ServidorColas.register('resultados', callable=lambda: resultados)
+    servidor = _ServidorColas(address=(host, puerto), authkey=clave.encode()).get_server()
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return tareas, resultados, servidor.address[1]
+
+
+def conectar_colas(direccion, clave=""):
+    """Conecta con las colas de un coordinador en 'host:puerto'"""
+    host, _, puerto = direccion.rpartition(':')
+    _ClienteColas.register('tareas')
+    _ClienteColas.register('resultados')
+    gestor = _ClienteColas(address=(host or 'localhost', int(puerto)), authkey=clave.encode())
+    gestor.connect()
+    return gestor.tareas(), gestor.resultados()
+
+
+def procesar_lote(tarea, hilos=MAX_WORKERS):
+    """Detecta los dameros de una tarea del coordinador.
+
+    Devuelve (id, cámara, archivos, esquinas N x K x 2, tamaños N x 2, variantes, procesadas).
+    """
+    id_lote, camara, rutas, parametros = tarea
+    chessboard_size = tuple(parametros['chessboard_size'])
+    num_esquinas = chessboard_size[0] * chessboard_size[1]
+    detector = crear_detector(parametros.get('tablero', "damero"), chessboard_size, parametros['sensibilidad'],
+                              parametros.get('diccionario', DICCIONARIO_CHARUCO))
+
+    def fuentes():
+        for ruta in rutas:
+            if es_video(ruta):
+                for indice, frame in muestrear_video(ruta, parametros['paso_video'], parametros['movimiento_video']):
+                    yield ruta_fotograma(ruta, indice), frame
+            else:
+                yield ruta, None
+
+    def detectar(fuente):
+        ruta, img = fuente
+        return ruta, detectar_archivo(ruta, detector, img)
+
+    archivos, esquinas, tamanos, variantes = [], [], [], []
+    procesadas = 0
+    with concurrent.futures.ThreadPoolExecutor(max_workers=hilos) as executor:
+        # Por bloques, para que los fotogramas de un vídeo no se acumulen en memoria
+        fuentes_restantes = fuentes()
+        while True:
+            bloque = list(itertools.islice(fuentes_restantes, 2 * hilos))
+            if not bloque:
+                break
+            procesadas += len(bloque)
+            for ruta, deteccion in executor.map(detectar, bloque):
+                if deteccion is not None:
+                    puntos, tamano, variante = deteccion
+                    archivos.append(ruta)
+                    esquinas.append(puntos)
+                    tamanos.append(tamano)
+                    variantes.append(variante)
+
+    esquinas = np.stack(esquinas).astype(np.float32) if esquinas else np.zeros((0, num_esquinas, 2), np.float32)
+    tamanos = np.array(tamanos, dtype=np.int32).reshape(-1, 2)
+    return id_lote, camara, archivos, esquinas, tamanos, variantes, procesadas
+
+
+def trabajar(direccion, clave="", hilos=MAX_WORKERS, log=print):
+    """Bucle de un trabajador: toma lotes hasta que el coordinador avisa del final o se desconecta"""
+    tareas, resultados = conectar_colas(direccion, clave)
+    lotes = 0
+    while True:
+        try:
+            tarea = tareas.get()
+            if tarea is None:
+                # Aviso de final: se devuelve a la cola para los demás trabajadores
+                tareas.put(None)
+                break
+            inicio = time.perf_counter()
+            resultado = procesar_lote(tarea, hilos)
+            resultados.put(resultado)
+        except (EOFError, OSError):
+            log("🔌 Coordinador desconectado")
+            break
+        lotes += 1
+        log(f"✅ Lote {resultado[0]} ({resultado[1]}): {len(resultado[2])}/{resultado[6]} detectadas "
+            f"en {time.perf_counter() - inicio:.1f}s")
+    return lotes
+
+
+def coordinar(camaras, parametros, puerto=PUERTO_DISTRIBUIDO, clave="", lote=LOTE_DISTRIBUIDO,
+              trabajadores_locales=0, hilos=MAX_WORKERS, reintento=REINTENTO_DISTRIBUIDO, log=print):
+    """Reparte las imágenes de cada cámara en lotes y reúne las esquinas que devuelven los trabajadores.
+
+    camaras: lista de (nombre, rutas). Devuelve {nombre: ResultadosDeteccion}, con total_files
+    igual a las imágenes y fotogramas analizados.
+    """
+    # La cola intercambia objetos serializados: sin clave se genera una para esta ejecución
+    if not clave:
+        clave = secrets.token_hex(16)
+        log(f"🔑 Clave generada para los trabajadores: {clave} (--clave o ${VARIABLE_CLAVE})")
+    tareas, cola_resultados, puerto = servir_colas(puerto, clave)
+    pendientes = {}
+    for camara, rutas in camaras:
+        imagenes = [r for r in rutas if not es_video(r)]
+        lotes = [imagenes[i:i + lote] for i in range(0, len(imagenes), lote)]
+        lotes += [[r] for r in rutas if es_video(r)]
+        for rutas_lote in lotes:
+            tarea = (len(pendientes), camara, rutas_lote, parametros)
+            pendientes[tarea[0]] = tarea
+            tareas.put(tarea)
+    total_lotes = len(pendientes)
+    log(f"📡 Coordinador en el puerto {puerto}: {total_lotes} lotes de {len(camaras)} cámaras")
+
+    # Trabajadores en este mismo equipo (la clave se pasa por el entorno, no en la línea de órdenes)
+    locales = [
+        subprocess.Popen([sys.executable, os.path.abspath(__file__), "trabajador", f"localhost:{puerto}",
+                          "--hilos", str(hilos)], env=dict(os.environ, **{VARIABLE_CLAVE: clave}))
+        for _ in range(trabajadores_locales)
+    ]
+
+    detecciones = {camara: [] for camara, _ in camaras}
+    totales = {camara: 0 for camara, _ in camaras}
+    inicio = time.perf_counter()
+    try:
+        while pendientes:
+            # Un trabajador pudo caerse con un lote: solo se reparten de nuevo los que se tomaron hace
+            # más de 'reintento' segundos (los demás, como un vídeo largo, siguen en marcha)
+            ahora = time.monotonic()
+            vencidos = [id_lote for id_lote, tomada in list(tareas.entregadas.items())
+                        if id_lote in pendientes and ahora - tomada > reintento]
+            if vencidos:
+                log(f"⏳ {len(vencidos)} lotes sin resultado tras {reintento:.0f}s: se vuelven a encolar")
+                for id_lote in vencidos:
+                    del tareas.entregadas[id_lote]
+                    tareas.put(pendientes[id_lote])
+            try:
+                id_lote, camara, archivos, esquinas, tamanos, variantes, procesadas = cola_resultados.get(
+                    timeout=min(reintento, 10.0))
+            except queue.Empty:
+                continue
+            tareas.entregadas.pop(id_lote, None)
+            if pendientes.pop(id_lote, None) is None:
+                continue  # Resultado repetido de un lote reencolado
+            detecciones[camara].extend(zip(archivos, esquinas, tamanos, variantes))
+            totales[camara] += procesadas
+            hechos = total_lotes - len(pendientes)
+            log(f"📥 {hechos}/{total_lotes} lotes ({camara}: {len(archivos)}/{procesadas} detectadas, "
+                f"{time.perf_counter() - inicio:.1f}s)")
+    finally:
+        tareas.put(None)
+        for proceso in locales:
+            proceso.wait()
+
+    # Los lotes llegan en cualquier orden: se ordenan por captura como en el procesamiento local
+    por_camara = {}
+    for camara, encontradas in detecciones.items():
+        resultados = ResultadosDeteccion(camara, parametros['chessboard_size'], parametros['image_resolution'],
+                                         parametros['sensibilidad'])
+        resultados.tablero = parametros.get('tablero', "damero")
+        for archivo, esquinas, tamano, variante in sorted(encontradas, key=lambda d: clave_orden(d[0])):
+            resultados.agregar(archivo, esquinas, tuple(int(v) for v in tamano), variante)
+        resultados.total_files = totales[camara]
+        por_camara[camara] = resultados
+    return por_camara
+
+
+def mapa_de_resultados(resultados, image_resolution, tolerancia=TOLERANCIA_DUPLICADOS):
+    """Marca las poses duplicadas y acumula el mapa de la selección. Devuelve (polygons_info, heatmap, duplicadas)"""
+    polygons_info, duplicadas = marcar_duplicados(resultados, resultados.polygons_info(), tolerancia)
+    heatmap = rasterizar_poligonos(polygons_info, image_resolution, polygons_info.seleccion)
+    return polygons_info, heatmap, duplicadas
+
+
+def guardar_mapa(resultados, output_path, selected, heatmap):
+    """Escribe el mapa de calor, los resultados de detección y la sesión, como la interfaz"""
+    resultados.guardar(output_path)
+    guardar_sesion(output_path, selected, heatmap)
+    heatmap_normalized = cv2.normalize(heatmap, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+    cv2.imwrite(output_path, cv2.applyColorMap(heatmap_normalized, cv2.COLORMAP_JET))
+
+
+# Servicio local: un proceso de larga duración conserva el grupo de hilos y las detecciones
+# en memoria, de modo que tras cada disparo solo se detectan las imágenes nuevas
+PUERTO_SERVICIO = 8765
+CAPACIDAD_CACHE_SERVICIO = 100000  # Imágenes o vídeos cuyas detecciones se recuerdan
+TRABAJOS_RETENIDOS = 64  # Trabajos terminados que aún se pueden consultar
+ESTADOS_FINALES = ("terminado", "cancelado", "error")
+VARIABLE_TOKEN_SERVICIO = "MAPA_COBERTURA_TOKEN"  # Variable de entorno con el token de la API
+ARCHIVO_TOKEN_SERVICIO = Path.home() / '.mapa_cobertura_token'
+HOSTS_SERVICIO = ("127.0.0.1", "localhost")
+
+
+def firma_archivo(ruta):
+    """(mtime en ns, tamaño) de un archivo, o None si no existe: cambia si se vuelve a escribir"""
+    try:
+        st = os.stat(ruta)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def _medidas(valor):
+    """'10x7' o [10, 7] -> (10, 7)"""
+    if isinstance(valor, str):
+        valor = valor.lower().split('x')
+    medidas = tuple(int(v) for v in valor)
+    if len(medidas) != 2 or min(medidas) <= 0:
+        raise ValueError(f"Medidas no válidas: {valor}")
+    return medidas
+
+
+def parametros_trabajo(datos):
+    """Valida la petición de un trabajo del servicio. Devuelve (carpeta, parámetros) con los valores por defecto"""
+    if not isinstance(datos, dict) or not datos.get('carpeta'):
+        raise ValueError("Falta 'carpeta'")
+    carpeta = os.path.abspath(datos['carpeta'])
+    if not os.path.isdir(carpeta):
+        raise ValueError(f"No existe la carpeta {carpeta}")
+    parametros = {
+        'chessboard_size': list(_medidas(datos.get('damero', CHESSBOARD_SIZE))),
+        'image_resolution': list(_medidas(datos.get('resolucion', IMAGE_RESOLUTION))),
+        'sensibilidad': float(datos.get('sensibilidad', 3.0)),
+        'tablero': datos.get('tablero', "damero"),
+        'diccionario': datos.get('diccionario', DICCIONARIO_CHARUCO),
+        'paso_video': int(datos.get('paso_video', PASO_VIDEO)),
+        'movimiento_video': float(datos.get('movimiento_video', UMBRAL_MOVIMIENTO_VIDEO)),
+        'tolerancia': float(datos.get('tolerancia', TOLERANCIA_DUPLICADOS)),
+        'guardar': bool(datos.get('guardar', False)),
+    }
+    if parametros['tablero'] not in TIPOS_TABLERO.values():
+        raise ValueError(f"Tipo de tablero desconocido: {parametros['tablero']}")
+    if parametros['diccionario'] not in DICCIONARIOS_CHARUCO:
+        raise ValueError(f"Diccionario desconocido: {parametros['diccionario']}")
+    if parametros['paso_video'] < 1:
+        raise ValueError("'paso_video' debe ser al menos 1")
+    return carpeta, parametros
+
+
+def clave_deteccion(parametros):
+    """Parámetros de los que depende la detección de cada archivo (clave de la caché del servicio)"""
+    return json.dumps([parametros[k] for k in ('tablero', 'chessboard_size', 'sensibilidad', 'diccionario',
+                                               'paso_video', 'movimiento_video')])
+
+
+class TrabajoCobertura:
+    """Un trabajo del servicio. Sus eventos se conservan para poder seguirlos desde el principio"""
+
+    def __init__(self, id_trabajo, carpeta, parametros):
+        self.id = id_trabajo
+        self.carpeta = carpeta
+        self.parametros = parametros
+        self.estado = "en cola"
+        self.total = 0
+        self.hechas = 0
+        self.en_cache = 0
+        self.resultado = None
+        self.error = None
+        self.cancelado = False
+        self.inicio = time.perf_counter()
+        self.duracion = None
+        self.eventos = []
+        self.condicion = threading.Condition()
+
+    @property
+    def terminado(self):
+        return self.estado in ESTADOS_FINALES
+
+    def emitir(self, evento, **datos):
+        with self.condicion:
+            self.eventos.append(dict(evento=evento, **datos))
+            self.condicion.notify_all()
+
+    def comenzar(self, total, camaras):
+        with self.condicion:
+            self.estado = "en curso"
+            self.total = total
+            self.emitir("inicio", camaras=camaras, total=total)
+
+    def avanzar(self, camara, hechas, en_cache=0):
+        with self.condicion:
+            self.hechas += hechas
+            self.en_cache += en_cache
+            self.emitir("progreso", camara=camara, hechas=self.hechas, total=self.total)
+
+    def finalizar(self, estado, resultado=None, error=None):
+        with self.condicion:
+            self.estado = estado
+            self.resultado = resultado
+            self.error = error
+            self.duracion = time.perf_counter() - self.inicio
+            self.emitir(estado, **self.resumen())
+
+    def resumen(self, completo=True):
+        with self.condicion:
+            resumen = {
+                'id': self.id,
+                'carpeta': self.carpeta,
+                'estado': self.estado,
+                'hechas': self.hechas,
+                'total': self.total,
+                'en_cache': self.en_cache,
+                'segundos': round(self.duracion if self.duracion is not None else time.perf_counter() - self.inicio, 3),
+            }
+            if self.error is not None:
+                resumen['error'] = self.error
+            if completo and self.resultado is not None:
+                resumen['resultado'] = self.resultado
+            return resumen
+
+    def esperar(self):
+        with self.condicion:
+            self.condicion.wait_for(lambda: self.terminado)
+
+    def seguir(self, desde=0):
+        """Genera los eventos a partir del número `desde` hasta que el trabajo termina"""
+        while True:
+            with self.condicion:
+                self.condicion.wait_for(lambda: len(self.eventos) > desde or self.terminado)
+                nuevos = self.eventos[desde:]
+                terminado = self.terminado
+            yield from nuevos
+            desde += len(nuevos)
+            if terminado:
+                return
+
+
+class ServicioCobertura:
+    """Grupo de hilos de detección y caché de detecciones compartidos por todos los trabajos"""
+
+    def __init__(self, hilos=MAX_WORKERS, capacidad=CAPACIDAD_CACHE_SERVICIO, log=print):
+        self.hilos = hilos
+        self.capacidad = capacidad
+        self.log = log
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=hilos)
+        self.cerrojo = threading.Lock()
+        self.cache = {}  # (ruta, clave de detección) -> (firma, detecciones, procesadas); la más reciente al final
+        self.detectores = {}  # clave de detección -> detector
+        self.trabajos = {}  # id -> TrabajoCobertura, en orden de creación
+        self.contador = itertools.count(1)
+        self.aciertos = 0
+        self.fallos = 0
+        self.inicio = time.time()
+
+    def estado(self):
+        with self.cerrojo:
+            return {
+                'hilos': self.hilos,
+                'en_cache': len(self.cache),
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'trabajos': len(self.trabajos),
+                'activos': sum(not trabajo.terminado for trabajo in self.trabajos.values()),
+                'segundos': round(time.time() - self.inicio, 1),
+            }
+
+    def crear_trabajo(self, carpeta, parametros):
+        """Registra un trabajo y lo lanza en su propio hilo; la detección usa el grupo compartido"""
+        with self.cerrojo:
+            trabajo = TrabajoCobertura(next(self.contador), carpeta, parametros)
+            self.trabajos[trabajo.id] = trabajo
+            terminados = [t.id for t in self.trabajos.values() if t.terminado]
+            for id_trabajo in terminados[:max(0, len(terminados) - TRABAJOS_RETENIDOS)]:
+                del self.trabajos[id_trabajo]
+        threading.Thread(target=self.ejecutar, args=(trabajo,), daemon=True).start()
+        return trabajo
+
+    def trabajo(self, id_trabajo):
+        with self.cerrojo:
+            return self.trabajos.get(id_trabajo)
+
+    def listar(self):
+        with self.cerrojo:
+            return list(self.trabajos.values())
+
+    def detector(self, clave, parametros):
+        with self.cerrojo:
+            detector = self.detectores.get(clave)
+            if detector is None:
+                detector = self.detectores[clave] = crear_detector(
+                    parametros['tablero'], parametros['chessboard_size'], parametros['sensibilidad'],
+                    parametros['diccionario']
+                )
+            return detector
+
+    def consultar(self, ruta, clave, firma):
+        """(detecciones, procesadas) recordadas para el archivo, o None si no está o ha cambiado"""
+        with self.cerrojo:
+            entrada = self.cache.pop((ruta, clave), None)
+            if entrada is None or entrada[0] != firma:
+                self.fallos += 1
+                return None
+            self.cache[(ruta, clave)] = entrada
+            self.aciertos += 1
+            return entrada[1], entrada[2]
+
+    def recordar(self, ruta, clave, firma, detecciones, procesadas):
+        with self.cerrojo:
+            self.cache[(ruta, clave)] = (firma, detecciones, procesadas)
+            while len(self.cache) > self.capacidad:
+                self.cache.pop(next(iter(self.cache)))
+
+    def detectar_con_cache(self, ruta, firma, clave, detector, parametros, cancelado):
+        """detectar_fuente con la caché del servicio. Devuelve (detecciones, procesadas)"""
+        detecciones, procesadas = detectar_fuente(ruta, detector, parametros['paso_video'],
+                                                  parametros['movimiento_video'], cancelado)
+        
+        # Una detección interrumpida no se recuerda: el tablero podría no haberse buscado entero
+        if firma is not None and not cancelado():
+            self.recordar(ruta, clave, firma, detecciones, procesadas)
+        return detecciones, procesadas
+
+    def detectar_camara(self, trabajo, camara, rutas, clave, detector):
+        """Detecciones de cada archivo de una cámara: de la caché o, si no están, del grupo de hilos"""
+        fuentes = [None] * len(rutas)
+        pendientes = []
+        for i, ruta in enumerate(rutas):
+            firma = firma_archivo(ruta)
+            fuentes[i] = self.consultar(ruta, clave, firma)
+            if fuentes[i] is None:
+                pendientes.append((i, ruta, firma))
+        en_cache = len(rutas) - len(pendientes)
+        trabajo.avanzar(camara, en_cache, en_cache)
+        
+        # Pocas tareas de cada trabajo en la cola del grupo, para que los trabajos simultáneos se intercalen
+        cancelado = lambda: trabajo.cancelado
+        pendientes = iter(pendientes)
+        en_curso = {}
+        while True:
+            while len(en_curso) < 2 * self.hilos and not trabajo.cancelado:
+                siguiente = next(pendientes, None)
+                if siguiente is None:
+                    break
+                i, ruta, firma = siguiente
+                future = self.executor.submit(self.detectar_con_cache, ruta, firma, clave, detector,
+                                              trabajo.parametros, cancelado)
+                en_curso[future] = i
+            if not en_curso:
+                return fuentes
+            listos, _ = concurrent.futures.wait(en_curso, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in listos:
+                fuentes[en_curso.pop(future)] = future.result()
+            trabajo.avanzar(camara, len(listos))
+
+    def informe(self, camara, fuentes, output_path, parametros):
+        """Cobertura de una cámara a partir de sus detecciones; con 'guardar' escribe además el mapa y la sesión"""
+        image_resolution = tuple(parametros['image_resolution'])
+        resultados = ResultadosDeteccion(camara, parametros['chessboard_size'], image_resolution,
+                                         parametros['sensibilidad'])
+        resultados.tablero = parametros['tablero']
+        detecciones = [deteccion for encontradas, _ in fuentes for deteccion in encontradas]
+        for archivo, esquinas, tamano, variante in sorted(detecciones, key=lambda d: clave_orden(d[0])):
+            resultados.agregar(archivo, esquinas, tamano, variante)
+        resultados.total_files = sum(procesadas for _, procesadas in fuentes)
+        
+        informe = {'detectadas': len(resultados), 'total': resultados.total_files}
+        if not len(resultados):
+            return informe
+        polygons_info, heatmap, duplicadas = mapa_de_resultados(resultados, image_resolution, parametros['tolerancia'])
+        analisis = analizar_cobertura(
+            heatmap, cuadrilateros_de_poligonos(polygons_info, polygons_info.seleccion), image_resolution
+        )
+        informe.update(resumen_cobertura(analisis), duplicadas=duplicadas)
+        if parametros['guardar']:
+            guardar_mapa(resultados, output_path, polygons_info.seleccion, heatmap)
+            informe['mapa'] = output_path
+        return informe
+
+    def ejecutar(self, trabajo):
+        parametros = trabajo.parametros
+        try:
+            camaras = camaras_de_carpeta(trabajo.carpeta)
+            if not camaras:
+                raise ValueError(f"No se encontraron imágenes en {trabajo.carpeta}")
+            clave = clave_deteccion(parametros)
+            detector = self.detector(clave, parametros)
+            trabajo.comenzar(sum(len(rutas) for _, rutas, _ in camaras), [nombre for nombre, _, _ in camaras])
+            
+            informes = {}
+            for nombre, rutas, output_path in camaras:
+                fuentes = self.detectar_camara(trabajo, nombre, rutas, clave, detector)
+                if trabajo.cancelado:
+                    trabajo.finalizar("cancelado")
+                    self.log(f"🛑 Trabajo {trabajo.id} cancelado")
+                    return
+                informes[nombre] = self.informe(nombre, fuentes, output_path, parametros)
+                trabajo.emitir("camara", camara=nombre, detectadas=informes[nombre]['detectadas'],
+                               puntuacion=informes[nombre].get('puntuacion'))
+        except (OSError, ValueError, RuntimeError, cv2.error) as e:
+            trabajo.finalizar("error", error=str(e))
+            self.log(f"❌ Trabajo {trabajo.id}: {str(e)}")
+            return
+        trabajo.finalizar("terminado", informes)
+        self.log(f"📊 Trabajo {trabajo.id} ({trabajo.carpeta}): {trabajo.total} archivos, {trabajo.en_cache} en caché, "
+                 f"{trabajo.duracion * 1000:.0f} ms")
+
+    def cerrar(self):
+        with self.cerrojo:
+            for trabajo in self.trabajos.values():
+                trabajo.cancelado = True
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class _ManejadorServicio(BaseHTTPRequestHandler):
+    """API HTTP del servicio: JSON, y los eventos de un trabajo como una línea JSON por evento"""
+
+    def log_message(self, format, *args):
+        pass  # Una consulta tras cada disparo llenaría la consola
+
+    def responder(self, codigo, datos):
+        cuerpo = json.dumps(datos, ensure_ascii=False).encode('utf-8')
+        self.send_response(codigo)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def autorizada(self):
+        """Comprueba Host, Origin y el token de la petición; si no pasa, responde con el error.
+
+        Cualquier página abierta en el navegador puede enviar peticiones a 127.0.0.1: con un Host
+        o un Origin ajenos se rechazan, y sin el token del servicio también. Por el socket Unix
+        (solo accesible para el usuario del servicio) no se exige nada.
+        """
+        token = self.server.token
+        if token is None:
+            return True
+        host = urlsplit("//" + self.headers.get('Host', "")).hostname
+        origen = self.headers.get('Origin')
+        if host not in HOSTS_SERVICIO or (origen is not None and urlsplit(origen).hostname not in HOSTS_SERVICIO):
+            self.responder(403, {'error': "Solo se admiten peticiones a 127.0.0.1 o localhost"})
+            return False
+        esquema, _, recibido = self.headers.get('Authorization', "").partition(' ')
+        if esquema.lower() != 'bearer' or not secrets.compare_digest(recibido.strip().encode(), token.encode()):
+            self.responder(401, {'error': f"Falta el token del servicio (Authorization: Bearer, "
+                                          f"en {ARCHIVO_TOKEN_SERVICIO} o ${VARIABLE_TOKEN_SERVICIO})"})
+            return False
+        return True
+
+    def ruta(self):
+        """(partes de la ruta, parámetros de la consulta)"""
+        url = urlsplit(self.path)
+        return [parte for parte in url.path.split('/') if parte], parse_qs(url.query)
+
+    def buscar_trabajo(self, partes):
+        try:
+            trabajo = self.server.servicio.trabajo(int(partes[1]))
+        except ValueError:
+            trabajo = None
+        if trabajo is None:
+            self.responder(404, {'error': f"No existe el trabajo {partes[1]}"})
+        return trabajo
+
+    def do_GET(self):
+        if not self.autorizada():
+            return
+        partes, consulta = self.ruta()
+        servicio = self.server.servicio
+        if partes in ([], ['estado']):
+            self.responder(200, servicio.estado())
+        elif partes == ['trabajos']:
+            self.responder(200, [trabajo.resumen(completo=False) for trabajo in servicio.listar()])
+        elif len(partes) == 2 and partes[0] == 'trabajos':
+            trabajo = self.buscar_trabajo(partes)
+            if trabajo is not None:
+                self.responder(200, trabajo.resumen())
+        elif len(partes) == 3 and partes[0] == 'trabajos' and partes[2] == 'eventos':
+            try:
+                desde = int(consulta.get('desde', ['0'])[0])
+            except ValueError:
+                self.responder(400, {'error': "'desde' debe ser un número de evento"})
+                return
+            trabajo = self.buscar_trabajo(partes)
+            if trabajo is not None:
+                self.enviar_eventos(trabajo, desde)
+        else:
+            self.responder(404, {'error': f"Ruta desconocida: {self.path}"})
+
+    def do_POST(self):
+        if not self.autorizada():
+            return
+        partes, consulta = self.ruta()
+        if partes != ['trabajos']:
+            self.responder(404, {'error': f"Ruta desconocida: {self.path}"})
+            return
+        # Exigir JSON obliga a los navegadores a una consulta previa (CORS) que el servicio no atiende
+        if self.headers.get('Content-Type', "").split(';')[0].strip().lower() != 'application/json':
+            self.responder(415, {'error': "El cuerpo debe ser JSON (Content-Type: application/json)"})
+            return
+        try:
+            datos = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b"{}")
+            carpeta, parametros = parametros_trabajo(datos)
+        except (ValueError, TypeError) as e:
+            self.responder(400, {'error': str(e)})
+            return
+        trabajo = self.server.servicio.crear_trabajo(carpeta, parametros)
+        if datos.get('esperar') or 'esperar' in consulta:
+            trabajo.esperar()
+            self.responder(200, trabajo.resumen())
+        else:
+            self.responder(202, trabajo.resumen())
+
+    def do_DELETE(self):
+        if not self.autorizada():
+            return
+        partes, _ = self.ruta()
+        if len(partes) != 2 or partes[0] != 'trabajos':
+            self.responder(404, {'error': f"Ruta desconocida: {self.path}"})
+            return
+        trabajo = self.buscar_trabajo(partes)
+        if trabajo is not None:
+            trabajo.cancelado = True
+            self.responder(200, trabajo.resumen(completo=False))
+
+    def enviar_eventos(self, trabajo, desde):
+        """Transmite los eventos del trabajo según se producen; la conexión se cierra al terminar"""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+        self.end_headers()
+        try:
+            for evento in trabajo.seguir(desde):
+                self.wfile.write(json.dumps(evento, ensure_ascii=False).encode('utf-8') + b"\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # El cliente dejó de seguir el trabajo
+
+
+if hasattr(socketserver, 'UnixStreamServer'):
+    class _ServidorUnix(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+
+def token_servicio():
+    """Token de la API por TCP: el de $MAPA_COBERTURA_TOKEN, o el del archivo del usuario (se crea si falta)"""
+    token = os.environ.get(VARIABLE_TOKEN_SERVICIO, "").strip()
+    if token:
+        return token
+    try:
+        with open(ARCHIVO_TOKEN_SERVICIO, 'r', encoding='utf-8') as f:
+            token = f.read().strip()
+    except FileNotFoundError:
+        pass
+    if not token:
+        token = secrets.token_hex(16)
+        descriptor = os.open(ARCHIVO_TOKEN_SERVICIO, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(descriptor, 'w', encoding='utf-8') as f:
+            f.write(token + "\n")
+    os.chmod(ARCHIVO_TOKEN_SERVICIO, 0o600)  # Solo para el usuario del servicio
+    return token
+
+
+def servir(servicio, puerto=PUERTO_SERVICIO, ruta_socket=None, token=None):
+    """Crea el servidor HTTP del servicio, solo en este equipo: localhost:puerto o un socket Unix.
+
+    Por TCP las peticiones deben llevar el token (por defecto, el de token_servicio()).
+    """
+    if ruta_socket:
+        if not hasattr(socketserver, 'UnixStreamServer'):
+            raise OSError("Este sistema no admite sockets Unix; use --puerto")
+        # El socket de una ejecución anterior impediría abrir el nuevo
+        if os.path.exists(ruta_socket) and stat.S_ISSOCK(os.stat(ruta_socket).st_mode):
+            os.remove(ruta_socket)
+        servidor = _ServidorUnix(ruta_socket, _ManejadorServicio)
+        os.chmod(ruta_socket, 0o600)  # La API lee carpetas arbitrarias: solo para el usuario del servicio
+        token = None
+    else:
+        servidor = ThreadingHTTPServer(("127.0.0.1", puerto), _ManejadorServicio)
+        token = token or token_servicio()
+    servidor.servicio = servicio
+    servidor.token = token
+    return servidor
+
+
+# Equivalencia de caminos de detección: cada optimización (hilos, lotes, seguimiento, API
+# asíncrona...) se compara con la detección de referencia sobre las mismas imágenes
+TOLERANCIA_EQUIVALENCIA_PX = 0.05  # Desplazamiento máximo de una esquina (px, resolución original)
+# % máximo de píxeles del mapa de calor que pueden cambiar respecto al de cv2.fillConvexPoly.
+# El rasterizado por lotes es exacto (también en los bordes), así que no se acepta ninguno
+TOLERANCIA_EQUIVALENCIA_MAPA = 0.0
+IMAGENES_SINTETICAS = 24
+
+
+def generar_imagenes_sinteticas(carpeta, n=IMAGENES_SINTETICAS, chessboard_size=CHESSBOARD_SIZE,
+                                resolucion=(2048, 1536), tablero="damero", semilla=0):
+    """Escribe n JPEG de una captura simulada: el tablero se mueve poco a poco por la imagen.
+
+    Algunas imágenes salen desenfocadas, oscuras o sin tablero, para que los caminos rápidos
+    también se comparen en los casos difíciles. Devuelve las rutas en orden de captura.
+    """
+    rng = np.random.default_rng(semilla)
+    ancho, alto = resolucion
+    cuadro = 60
+    columnas, filas = chessboard_size[0] + 1, chessboard_size[1] + 1
+    if tablero == "charuco":
+        plantilla = crear_detector("charuco", chessboard_size, 3.0).board.generateImage(
+            (columnas * cuadro + 2 * cuadro, filas * cuadro + 2 * cuadro), marginSize=cuadro)
+    else:
+        plantilla = np.full(((filas + 2) * cuadro, (columnas + 2) * cuadro), 255, dtype=np.uint8)
+        for fila in range(filas):
+            for columna in range(columnas):
+                if (fila + columna) % 2 == 0:
+                    plantilla[(fila + 1) * cuadro:(fila + 2) * cuadro, (columna + 1) * cuadro:(columna + 2) * cuadro] = 0
+    alto_plantilla, ancho_plantilla = plantilla.shape
+    origen = np.float32([[0, 0], [ancho_plantilla, 0], [ancho_plantilla, alto_plantilla], [0, alto_plantilla]])
+
+    os.makedirs(carpeta, exist_ok=True)
+    rutas = []
+    centro = np.array([ancho / 2, alto / 2])
+    for i in range(n):
+        imagen = np.full((alto, ancho), 170, dtype=np.uint8)
+        if i != n - 1:  # la última, sin tablero
+            escala = rng.uniform(0.35, 0.6) * ancho / ancho_plantilla
+            medio = np.array([ancho_plantilla, alto_plantilla]) * escala / 2
+            centro = np.clip(centro + rng.normal(0, 0.08, 2) * (ancho, alto), medio * 1.3, (ancho, alto) - medio * 1.3)
+            angulo = rng.uniform(-0.3, 0.3)
+            giro = np.array([[np.cos(angulo), -np.sin(angulo)], [np.sin(angulo), np.cos(angulo)]])
+            destino = (origen - origen.mean(axis=0)) * escala @ giro.T + centro
+            destino += rng.uniform(-0.06, 0.06, (4, 2)) * medio  # algo de perspectiva
+            homografia = cv2.getPerspectiveTransform(origen, destino.astype(np.float32))
+            cv2.warpPerspective(plantilla, homografia, (ancho, alto), imagen, borderMode=cv2.BORDER_TRANSPARENT)
+        if i % 8 == 5:
+            imagen = cv2.blur(imagen, (31, 1))  # movimiento: solo se detecta con las variantes
+        elif i % 8 == 7:
+            imagen = (imagen * 0.25).astype(np.uint8)  # subexpuesta
+        ruido = rng.normal(0, 4, imagen.shape)
+        imagen = np.clip(imagen + ruido, 0, 255).astype(np.uint8)
+        ruta = os.path.join(carpeta, f"sintetica_{i:04d}.jpg")
+        cv2.imwrite(ruta, imagen, [cv2.IMWRITE_JPEG_QUALITY, 92])
+        rutas.append(ruta)
+    return rutas
+
+
+def _detectar_referencia(rutas, parametros, hilos):
+    """Camino de referencia: cada imagen por separado, en serie y con la cascada completa"""
+    detector = crear_detector(parametros['tablero'], parametros['chessboard_size'], parametros['sensibilidad'],
+                              parametros['diccionario'])
+    detecciones = {}
+    for ruta in rutas:
+        deteccion = detectar_archivo(ruta, detector)
+        if deteccion is not None:
+            detecciones[ruta] = deteccion[:2]
+    return detecciones
+
+
+def _detectar_hilos(rutas, parametros, hilos):
+    """Como la referencia, con un detector compartido por varios hilos"""
+    detector = crear_detector(parametros['tablero'], parametros['chessboard_size'], parametros['sensibilidad'],
+                              parametros['diccionario'])
+    with concurrent.futures.ThreadPoolExecutor(max_workers=hilos) as executor:
+        detecciones = executor.map(lambda ruta: detectar_archivo(ruta, detector), rutas)
+        return {ruta: deteccion[:2] for ruta, deteccion in zip(rutas, detecciones) if deteccion is not None}
+
+
+def _detectar_lote(rutas, parametros, hilos):
+    """Lote de un trabajador del procesamiento distribuido"""
+    _, _, archivos, esquinas, tamanos, _, _ = procesar_lote(
+        (0, "", rutas, dict(parametros, paso_video=PASO_VIDEO, movimiento_video=UMBRAL_MOVIMIENTO_VIDEO)), hilos
+    )
+    return {ruta: (esquinas[i], tuple(int(v) for v in tamanos[i])) for i, ruta in enumerate(archivos)}
+
+
+def _detectar_seguimiento(rutas, parametros, hilos, completa=True):
+    """Seguimiento del tablero entre imágenes consecutivas, como en la interfaz (un solo tramo)"""
+    detector = crear_detector(parametros['tablero'], parametros['chessboard_size'], parametros['sensibilidad'],
+                              parametros['diccionario'])
+    seguimiento = SeguimientoROI()
+    detecciones = {}
+    for ruta in sorted(rutas, key=clave_orden):
+        img = leer_imagen(ruta)
+        if img is None:
+            continue
+        _, gray, escala = reducir_para_deteccion(img)
+        region = seguimiento.region(gray.shape[1], gray.shape[0])
+        esquinas, _ = detector.detectar(gray, region=region, completa=completa)
+        seguimiento.actualizar(esquinas, gray.shape[1], gray.shape[0])
+        if esquinas is not None:
+            detecciones[ruta] = (esquinas * np.array(escala, dtype=np.float32), (img.shape[1], img.shape[0]))
+    return detecciones
+
+
+def _detectar_rapida(rutas, parametros, hilos):
+    """Detección rápida de las imágenes de mala calidad, aplicada a todas (no es equivalente: sirve de control)"""
+    detector = crear_detector(parametros['tablero'], parametros['chessboard_size'], parametros['sensibilidad'],
+                              parametros['diccionario'])
+
+    def detectar(ruta):
+        img = leer_imagen(ruta)
+        if img is None:
+            return None
+        _, gray, escala = reducir_para_deteccion(img)
+        esquinas, _ = detector.detectar(gray, completa=False)
+        if esquinas is None:
+            return None
+        return esquinas * np.array(escala, dtype=np.float32), (img.shape[1], img.shape[0])
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=hilos) as executor:
+        return {ruta: deteccion for ruta, deteccion in zip(rutas, executor.map(detectar, rutas)) if deteccion is not None}
+
+
+def _detectar_asincrona(rutas, parametros, hilos):
+    """API asíncrona (detectar_en_directo)"""
+    async def recoger():
+        detecciones = {}
+        async for evento in detectar_en_directo(
+                rutas, parametros['chessboard_size'], parametros['image_resolution'], parametros['sensibilidad'],
+                parametros['tablero'], parametros['diccionario'], hilos=hilos, instantanea_cada=0):
+            if evento['evento'] == 'imagen' and evento['esquinas'] is not None:
+                detecciones[evento['archivo']] = (evento['esquinas'], evento['tamano'])
+        return detecciones
+    return asyncio.run(recoger())
+
+
+# Caminos de detección (nombre -> función(rutas, parametros, hilos) que devuelve {ruta: (esquinas, (ancho, alto))}).
+# Un camino nuevo se compara con la referencia añadiéndolo aquí
+CAMINOS_DETECCION = {
+    "referencia": _detectar_referencia,
+    "hilos": _detectar_hilos,
+    "lote": _detectar_lote,
+    "seguimiento": _detectar_seguimiento,
+    "asincrona": _detectar_asincrona,
+    "rapida": _detectar_rapida,
+}
+CAMINOS_EQUIVALENTES = ("hilos", "lote", "seguimiento", "asincrona")  # los que deben dar lo mismo que la referencia
+
+
+def _poligonos_de_detecciones(detecciones, chessboard_size):
+    archivos = sorted(detecciones, key=clave_orden)
+    esquinas = np.stack([np.asarray(detecciones[ruta][0], dtype=np.float32).reshape(-1, 2) for ruta in archivos])
+    return Poligonos.desde_esquinas(archivos, esquinas, chessboard_size)
+
+
+def _mapa_de_detecciones(detecciones, chessboard_size, image_resolution):
+    """Acumulador de todas las detecciones (sin quitar duplicadas), con el rasterizado por lotes"""
+    if not detecciones:
+        return np.zeros((image_resolution[1], image_resolution[0]), dtype=np.float32)
+    return rasterizar_poligonos(_poligonos_de_detecciones(detecciones, chessboard_size), image_resolution)
+
+
+def _mapa_de_referencia(detecciones, chessboard_size, image_resolution):
+    """Acumulador de referencia: un cv2.fillConvexPoly por imagen dentro de su bbox recortado, sumados.
+
+    Es el cálculo original del mapa; el de los caminos rápidos (rasterizar_cuadrilateros) debe
+    coincidir con él píxel a píxel.
+    """
+    width, height = image_resolution
+    heatmap = np.zeros((height, width), dtype=np.float32)
+    if not detecciones:
+        return heatmap
+    polygons_info = _poligonos_de_detecciones(detecciones, chessboard_size)
+    puntos = polygons_info.puntos
+    for i, (x_min, y_min, x_max, y_max) in enumerate(polygons_info.bboxes.tolist()):
+        x_min, y_min = max(x_min, 0), max(y_min, 0)
+        x_max, y_max = min(x_max, width - 1), min(y_max, height - 1)
+        if x_max < x_min or y_max < y_min:
+            continue
+        local_mask = np.zeros((y_max - y_min + 1, x_max - x_min + 1), dtype=np.float32)
+        cv2.fillConvexPoly(local_mask, puntos[i] - np.array([x_min, y_min], dtype=np.int32), 1.0)
+        heatmap[y_min:y_max+1, x_min:x_max+1] += local_mask
+    return heatmap
+
+
+def comparar_detecciones(referencia, camino, chessboard_size, image_resolution,
+                         tolerancia_px=TOLERANCIA_EQUIVALENCIA_PX, tolerancia_mapa=TOLERANCIA_EQUIVALENCIA_MAPA,
+                         max_diferencias=0):
+    """Diferencias entre dos resultados {ruta: (esquinas, tamaño)}: detecciones, esquinas y mapa de calor.
+
+    Devuelve un diccionario con 'equivalente' a True si todo queda dentro de las tolerancias.
+    Una esquina vista en uno y no en el otro (ChArUco) cuenta como desplazamiento infinito.
+    El mapa de la referencia se acumula con cv2.fillConvexPoly imagen a imagen y el del camino
+    con el rasterizado por lotes, así que la comparación del mapa también cubre este último.
+    """
+    solo_referencia = sorted(set(referencia) - set(camino), key=clave_orden)
+    solo_camino = sorted(set(camino) - set(referencia), key=clave_orden)
+    desplazamientos = {}
+    tamanos_distintos = []
+    for ruta in sorted(set(referencia) & set(camino), key=clave_orden):
+        a = np.asarray(referencia[ruta][0], dtype=np.float32).reshape(-1, 2)
+        b = np.asarray(camino[ruta][0], dtype=np.float32).reshape(-1, 2)
+        if tuple(referencia[ruta][1]) != tuple(camino[ruta][1]):
+            tamanos_distintos.append(ruta)
+        if a.shape != b.shape or (np.isnan(a) != np.isnan(b)).any():
+            desplazamientos[ruta] = math.inf
+        else:
+            distancias = np.linalg.norm(a - b, axis=1)
+            desplazamientos[ruta] = float(np.nanmax(distancias)) if not np.isnan(distancias).all() else 0.0
+    peor = max(desplazamientos, key=desplazamientos.get) if desplazamientos else None
+    desplazamiento_max = desplazamientos[peor] if peor is not None else 0.0
+    fuera = [ruta for ruta, d in desplazamientos.items() if d > tolerancia_px]
+
+    mapa_referencia = _mapa_de_referencia(referencia, chessboard_size, image_resolution)
+    mapa_camino = _mapa_de_detecciones(camino, chessboard_size, image_resolution)
+    diferencia = np.abs(mapa_referencia - mapa_camino)
+    pixeles_distintos = int(np.count_nonzero(diferencia))
+    pct_distintos = 100.0 * pixeles_distintos / diferencia.size
+
+    diferencias = len(solo_referencia) + len(solo_camino) + len(fuera) + len(tamanos_distintos)
+    return {
+        'detectadas_referencia': len(referencia),
+        'detectadas_camino': len(camino),
+        'solo_referencia': [os.path.basename(ruta) for ruta in solo_referencia],
+        'solo_camino': [os.path.basename(ruta) for ruta in solo_camino],
+        'tamanos_distintos': [os.path.basename(ruta) for ruta in tamanos_distintos],
+        'desplazamiento_max_px': round(desplazamiento_max, 4) if math.isfinite(desplazamiento_max) else None,
+        'peor_imagen': os.path.basename(peor) if peor is not None and desplazamiento_max > 0 else None,
+        'fuera_de_tolerancia': [os.path.basename(ruta) for ruta in fuera],
+        'mapa_pixeles_distintos': pixeles_distintos,
+        'mapa_pct_distintos': round(pct_distintos, 4),
+        'mapa_diferencia_max': float(diferencia.max()) if diferencia.size else 0.0,
+        'equivalente': diferencias <= max_diferencias and pct_distintos <= tolerancia_mapa,
+    }
+
+
+def comparar_caminos(rutas, parametros, caminos=CAMINOS_EQUIVALENTES, referencia="referencia", hilos=MAX_WORKERS,
+                     tolerancia_px=TOLERANCIA_EQUIVALENCIA_PX, tolerancia_mapa=TOLERANCIA_EQUIVALENCIA_MAPA,
+                     max_diferencias=0):
+    """Ejecuta la referencia y cada camino sobre las mismas imágenes y compara sus resultados.
+
+    parametros: los del procesamiento distribuido ('chessboard_size', 'image_resolution',
+    'sensibilidad', 'tablero', 'diccionario'). Los caminos son nombres de CAMINOS_DETECCION o
+    funciones con la misma firma. Devuelve {nombre: informe de comparar_detecciones, con tiempos}.
+    """
+    parametros = dict(parametros, chessboard_size=tuple(parametros['chessboard_size']),
+                      image_resolution=tuple(parametros['image_resolution']))
+    inicio = time.perf_counter()
+    detecciones_referencia = CAMINOS_DETECCION.get(referencia, referencia)(rutas, parametros, hilos)
+    tiempo_referencia = time.perf_counter() - inicio
+
+    informes = {}
+    for camino in caminos:
+        nombre = camino if isinstance(camino, str) else getattr(camino, '__name__', repr(camino))
+        inicio = time.perf_counter()
+        detecciones = CAMINOS_DETECCION.get(camino, camino)(rutas, parametros, hilos)
+        tiempo = time.perf_counter() - inicio
+        informe = comparar_detecciones(
+            detecciones_referencia, detecciones, parametros['chessboard_size'], parametros['image_resolution'],
+            tolerancia_px, tolerancia_mapa, max_diferencias
+        )
+        informe.update({
+            'imagenes': len(rutas),
+            'tiempo_referencia_s': round(tiempo_referencia, 3),
+            'tiempo_camino_s': round(tiempo, 3),
+            'aceleracion': round(tiempo_referencia / tiempo, 2) if tiempo > 0 else None,
+        })
+        informes[nombre] = informe
+    return informes
+
+
+def buscar_sesiones(ruta):
+    """Carpetas de resultados (_deteccion) en una ruta: ella misma o sus subcarpetas"""
+    if os.path.exists(os.path.join(ruta, "meta.json")):
+        return [ruta]
+    return [d for d in sorted(glob.glob(os.path.join(ruta, "*_deteccion")))
+            if os.path.exists(os.path.join(d, "meta.json"))]
+
+
+def cli_analizar(args):
+    """Muestra las puntuaciones de cobertura de las sesiones guardadas"""
+    grid = tuple(int(v) for v in args.rejilla.lower().split('x'))
+    sesiones = buscar_sesiones(args.ruta)
+    if not sesiones:
+        print(f"No se encontraron resultados de detección en {args.ruta}", file=sys.stderr)
+        return 1
+    
+    informes = {}
+    for sesion in sesiones:
+        resultados, polygons_info, selected, heatmap = cargar_sesion(sesion)
+        analisis = analizar_cobertura(
+            heatmap, cuadrilateros_de_poligonos(polygons_info, selected), resultados.image_resolution, grid
+        )
+        informes[resultados.camera_name] = resumen_cobertura(analisis)
+    
+    if args.json:
+        print(json.dumps(informes, indent=2, ensure_ascii=False))
+        return 0
+    
+    print(f"{'Cámara':<24} {'Imágenes':>8} {'Puntuación':>10} {'Celdas':>8} {'Máx.':>6}  Escala / Inclinación")
+    for camera_name, informe in sorted(informes.items(), key=lambda kv: kv[1]['puntuacion']):
+        print(f"{camera_name:<24} {informe['imagenes']:>8} {informe['puntuacion']:>9.1f}% "
+              f"{informe['celdas_cubiertas']:>3}/{informe['celdas_total']:<4} {informe['conteo_max']:>6.0f}  "
+              f"{informe['hist_escala']} / {informe['hist_inclinacion']}")
+    return 0
+
+
+def cli_seleccionar(args):
+    """Guarda en la sesión una selección automática de pocas imágenes"""
+    resultados, polygons_info, _, _ = cargar_sesion(args.sesion)
+    elegidas = seleccionar_subconjunto(
+        cuadrilateros_de_poligonos(polygons_info), resultados.image_resolution,
+        max_imagenes=args.imagenes, cobertura_objetivo=args.cobertura / 100.0, contornos=polygons_info.contornos
+    )
+    selected = np.zeros(len(polygons_info), dtype=bool)
+    selected[elegidas] = True
+    heatmap = rasterizar_poligonos(polygons_info, resultados.image_resolution, selected)
+    guardar_sesion_en(args.sesion, selected, heatmap)
+    
+    print(f"{resultados.camera_name}: {len(elegidas)} de {len(polygons_info)} imágenes seleccionadas")
+    for i in elegidas:
+        print(f"  {resultados.archivos[i]}")
+    return 0
+
+
+def cli_metadatos(args):
+    """Resume resoluciones y tamaños de las imágenes de una carpeta leyendo solo las cabeceras"""
+    inicio = time.perf_counter()
+    metadatos = escanear_metadatos(buscar_imagenes(args.carpeta, args.recursivo))
+    duracion = time.perf_counter() - inicio
+    
+    print(f"{metadatos['archivos']} archivos, {formatear_bytes(metadatos['bytes'])} ({duracion:.2f}s)")
+    for (ancho, alto), rutas in sorted(metadatos['resoluciones'].items(), key=lambda kv: -len(kv[1])):
+        print(f"  {ancho}×{alto}: {len(rutas)}")
+    for ruta in metadatos['ilegibles']:
+        print(f"  ilegible: {ruta}")
+    
+    principal = resolucion_principal(metadatos)
+    if principal is None:
+        return 1
+    if len(metadatos['resoluciones']) > 1:
+        print(f"Resoluciones mezcladas; la más frecuente es {principal[0]}×{principal[1]}", file=sys.stderr)
+        return 2
+    return 0
+
+
+def camaras_de_carpeta(carpeta):
+    """Cámaras de una carpeta: sus subcarpetas con imágenes o, si no hay, la propia carpeta.
+
+    Devuelve una lista de (nombre, rutas, ruta del mapa de calor) con los mismos nombres que la interfaz.
+    """
+    carpeta = os.path.abspath(carpeta)
+    cache = CacheDirectorios()
+    _, subcarpetas = cache.listar(carpeta)
+    camaras = []
+    for subcarpeta in sorted(subcarpetas):
+        nombre = os.path.basename(subcarpeta)
+        if es_carpeta_de_salida(nombre):
+            continue
+        rutas = buscar_imagenes(subcarpeta, cache=cache)
+        if rutas:
+            camaras.append((nombre, rutas, os.path.join(carpeta, f"mapa_calor_{nombre}.png")))
+    if not camaras:
+        rutas = buscar_imagenes(carpeta, cache=cache)
+        if rutas:
+            nombre = os.path.basename(carpeta)
+            camaras.append((nombre, rutas, os.path.join(os.path.dirname(carpeta), f"mapa_calor_{nombre}.png")))
+    return camaras
+
+
+def cli_coordinar(args):
+    """Reparte la detección entre trabajadores y guarda mapas y sesiones como la interfaz"""
+    camaras = camaras_de_carpeta(args.carpeta)
+    if not camaras:
+        print(f"No se encontraron imágenes en {args.carpeta}", file=sys.stderr)
+        return 1
+    image_resolution = tuple(int(v) for v in args.resolucion.lower().split('x'))
+    parametros = {
+        'chessboard_size': [int(v) for v in args.damero.lower().split('x')],
+        'image_resolution': list(image_resolution),
+        'sensibilidad': args.sensibilidad,
+        'tablero': args.tablero,
+        'diccionario': args.diccionario,
+        'paso_video': args.paso_video,
+        'movimiento_video': args.movimiento_video,
+    }
+    inicio = time.perf_counter()
+    por_camara = coordinar(
+        [(nombre, rutas) for nombre, rutas, _ in camaras], parametros, args.puerto,
+        args.clave, args.lote, args.locales, args.hilos
+    )
+    print(f"⏱️ Detección distribuida en {time.perf_counter() - inicio:.1f}s")
+
+    for nombre, _, output_path in camaras:
+        resultados = por_camara[nombre]
+        if not len(resultados):
+            print(f"❌ {nombre}: sin imágenes válidas")
+            continue
+        polygons_info, heatmap, duplicadas = mapa_de_resultados(resultados, image_resolution, args.tolerancia)
+        guardar_mapa(resultados, output_path, polygons_info.seleccion, heatmap)
+        analisis = analizar_cobertura(
+            heatmap, cuadrilateros_de_poligonos(polygons_info, polygons_info.seleccion), image_resolution
+        )
+        print(f"📊 {nombre}: {len(resultados)}/{resultados.total_files} detectadas, {duplicadas} duplicadas, "
+              f"cobertura {analisis['puntuacion']:.0f}% - {output_path}")
+    return 0
+
+
+def cli_trabajador(args):
+    """Procesa lotes de un coordinador hasta que termine"""
+    try:
+        with hilos_opencv(args.hilos):
+            lotes = trabajar(args.direccion, args.clave, args.hilos)
+    except ConnectionRefusedError:
+        print(f"No se pudo conectar con el coordinador en {args.direccion}", file=sys.stderr)
+        return 1
+    except AuthenticationError:
+        print("La clave no coincide con la del coordinador", file=sys.stderr)
+        return 1
+    print(f"🏁 {lotes} lotes procesados")
+    return 0
+
+
+def cli_calibrar(args):
+    """Calibra cada sesión con su selección guardada, varias cámaras en paralelo"""
+    sesiones = buscar_sesiones(args.ruta)
+    if not sesiones:
+        print(f"No se encontraron resultados de detección en {args.ruta}", file=sys.stderr)
+        return 1
+    
+    informes = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        for sesion, future in [(sesion, executor.submit(calibrar_sesion, sesion)) for sesion in sesiones]:
+            try:
+                resultado = future.result()
+            except (OSError, ValueError, cv2.error) as e:
+                print(f"{sesion}: no se pudo calibrar: {str(e)}", file=sys.stderr)
+                continue
+            if resultado is None:
+                print(f"{sesion}: imágenes insuficientes para calibrar", file=sys.stderr)
+                continue
+            informes[sesion] = {
+                'rms': round(resultado['rms'], 4),
+                'imagenes': len(resultado['indices']),
+                'matriz': np.round(resultado['matriz'], 3).tolist(),
+                'distorsion': np.round(resultado['distorsion'], 6).tolist(),
+                'error_max': round(float(resultado['errores'].max()), 4),
+            }
+    
+    if args.json:
+        print(json.dumps(informes, indent=2, ensure_ascii=False))
+        return 0 if informes else 1
+    for sesion, informe in informes.items():
+        matriz = informe['matriz']
+        print(f"{os.path.basename(sesion):<32} RMS {informe['rms']:.3f} px  {informe['imagenes']:>5} imágenes  "
+              f"fx {matriz[0][0]:.1f} fy {matriz[1][1]:.1f} cx {matriz[0][2]:.1f} cy {matriz[1][2]:.1f}  "
+              f"máx. {informe['error_max']:.2f} px")
+    return 0 if informes else 1
+
+
+def cli_servicio(args):
+    """Servicio local que atiende trabajos de cobertura con los hilos y las detecciones ya en memoria"""
+    servicio = ServicioCobertura(args.hilos)
+    try:
+        servidor = servir(servicio, args.puerto, args.socket)
+    except OSError as e:
+        print(f"No se pudo abrir el servicio: {str(e)}", file=sys.stderr)
+        return 1
+    direccion = args.socket or f"http://127.0.0.1:{servidor.server_address[1]}"
+    print(f"🛰️ Servicio en {direccion} con {args.hilos} hilos (Ctrl+C para terminar)")
+    if servidor.token is not None:
+        origen = f"${VARIABLE_TOKEN_SERVICIO}" if os.environ.get(VARIABLE_TOKEN_SERVICIO, "").strip() else ARCHIVO_TOKEN_SERVICIO
+        print(f"🔑 Token de la API en {origen} (cabecera Authorization: Bearer <token>)")
+    try:
+        with hilos_opencv(args.hilos):
+            servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        servicio.cerrar()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
+    return 0
+
+
+def cli_comparar(args):
+    """Compara caminos de detección con la referencia sobre una carpeta o imágenes sintéticas"""
+    chessboard_size = tuple(int(v) for v in args.damero.lower().split('x'))
+    caminos = [c.strip() for c in args.caminos.split(',') if c.strip()] if args.caminos else list(CAMINOS_EQUIVALENTES)
+    desconocidos = [c for c in caminos + [args.referencia] if c not in CAMINOS_DETECCION]
+    if desconocidos:
+        print(f"Caminos desconocidos: {', '.join(desconocidos)} (disponibles: {', '.join(CAMINOS_DETECCION)})",
+              file=sys.stderr)
+        return 1
+
+    temporal = None
+    if args.carpeta:
+        # Los vídeos se muestrean igual en todos los caminos; aquí solo se comparan imágenes
+        rutas = [ruta for ruta in buscar_imagenes(args.carpeta) if not es_video(ruta)]
+    else:
+        temporal = tempfile.mkdtemp(prefix="equivalencia_")
+        rutas = generar_imagenes_sinteticas(temporal, args.sinteticas, chessboard_size, tablero=args.tablero)
+    try:
+        if not rutas:
+            print(f"No se encontraron imágenes en {args.carpeta}", file=sys.stderr)
+            return 1
+        if args.resolucion:
+            image_resolution = tuple(int(v) for v in args.resolucion.lower().split('x'))
+        else:
+            image_resolution = resolucion_principal(escanear_metadatos(rutas))
+            if image_resolution is None:
+                print("No se pudo leer la resolución de las imágenes; indique --resolucion", file=sys.stderr)
+                return 1
+        parametros = {
+            'chessboard_size': chessboard_size,
+            'image_resolution': image_resolution,
+            'sensibilidad': args.sensibilidad,
+            'tablero': args.tablero,
+            'diccionario': args.diccionario,
+        }
+        with hilos_opencv(args.hilos):
+            informes = comparar_caminos(rutas, parametros, caminos, args.referencia, args.hilos,
+                                        args.tolerancia_px, args.tolerancia_mapa, args.max_diferencias)
+    finally:
+        if temporal is not None:
+            shutil.rmtree(temporal, ignore_errors=True)
+
+    equivalentes = all(informe['equivalente'] for informe in informes.values())
+    if args.json:
+        print(json.dumps(informes, indent=2, ensure_ascii=False))
+        return 0 if equivalentes else 2
+
+    print(f"{len(rutas)} imágenes ({'carpeta ' + args.carpeta if args.carpeta else 'sintéticas'}), "
+          f"referencia '{args.referencia}': {next(iter(informes.values()))['detectadas_referencia']} detectadas "
+          f"en {next(iter(informes.values()))['tiempo_referencia_s']:.2f}s")
+    print(f"{'Camino':<14} {'Detect.':>7} {'Solo ref.':>9} {'Solo cam.':>9} {'Desp. máx.':>11} "
+          f"{'Mapa ≠':>9} {'Tiempo':>8} {'×':>6}  Resultado")
+    for nombre, informe in informes.items():
+        desplazamiento = informe['desplazamiento_max_px']
+        print(f"{nombre:<14} {informe['detectadas_camino']:>7} {len(informe['solo_referencia']):>9} "
+              f"{len(informe['solo_camino']):>9} "
+              f"{(f'{desplazamiento:.4f} px' if desplazamiento is not None else 'esquinas ≠'):>11} "
+              f"{informe['mapa_pct_distintos']:>8.3f}% {informe['tiempo_camino_s']:>7.2f}s "
+              f"{informe['aceleracion'] or 0:>6.2f}  {'✅ equivalente' if informe['equivalente'] else '❌ distinto'}")
+        for clave, texto in (('solo_referencia', "solo en la referencia"), ('solo_camino', "solo en el camino"),
+                             ('fuera_de_tolerancia', "esquinas desplazadas"), ('tamanos_distintos', "tamaño distinto")):
+            if informe[clave]:
+                print(f"    {texto}: {', '.join(informe[clave])}")
+    return 0 if equivalentes else 2
+
+
+def main_cli(argv):
+    parser = argparse.ArgumentParser(
+        prog="crear_mapa_cobertura",
+        description="Herramientas de línea de comandos del generador de mapas de calor"
+    )
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+    
+    analizar = subparsers.add_parser("analizar", help="Puntuaciones de cobertura de resultados guardados")
+    analizar.add_argument("ruta", help="Carpeta _deteccion o carpeta que contiene varias")
+    analizar.add_argument("--rejilla", default=f"{REJILLA_COBERTURA[0]}x{REJILLA_COBERTURA[1]}",
+                          help="Celdas de la rejilla del sensor, p. ej. 8x6")
+    analizar.add_argument("--json", action="store_true", help="Salida en JSON")
+    analizar.set_defaults(func=cli_analizar)
+    
+    seleccionar = subparsers.add_parser("seleccionar", help="Selección automática de pocas imágenes en una sesión")
+    seleccionar.add_argument("sesion", help="Carpeta _deteccion de la cámara")
+    seleccionar.add_argument("--imagenes", type=int, default=None, help="Número de imágenes a elegir")
+    seleccionar.add_argument("--cobertura", type=float, default=100.0,
+                             help="Cobertura objetivo en %% si no se indica --imagenes (por defecto 100)")
+    seleccionar.set_defaults(func=cli_seleccionar)
+    
+    calibrar = subparsers.add_parser("calibrar", help="Calibra cada cámara con las esquinas de su selección")
+    calibrar.add_argument("ruta", help="Carpeta _deteccion o carpeta que contiene varias")
+    calibrar.add_argument("--json", action="store_true", help="Salida en JSON")
+    calibrar.set_defaults(func=cli_calibrar)
+    
+    metadatos = subparsers.add_parser("metadatos", help="Resoluciones y tamaños leyendo solo las cabeceras")
+    metadatos.add_argument("carpeta", help="Carpeta de imágenes")
+    metadatos.add_argument("-r", "--recursivo", action="store_true", help="Incluir subcarpetas")
+    metadatos.set_defaults(func=cli_metadatos)
+    
+    clave = os.environ.get(VARIABLE_CLAVE, "")
+    coordinar_parser = subparsers.add_parser("coordinar", help="Reparte la detección entre trabajadores")
+    coordinar_parser.add_argument("carpeta", help="Carpeta de una cámara o con una subcarpeta por cámara")
+    coordinar_parser.add_argument("--damero", default=f"{CHESSBOARD_SIZE[0]}x{CHESSBOARD_SIZE[1]}",
+                                  help="Esquinas interiores del damero, p. ej. 10x7")
+    coordinar_parser.add_argument("--resolucion", default=f"{IMAGE_RESOLUTION[0]}x{IMAGE_RESOLUTION[1]}",
+                                  help="Resolución del mapa de calor, p. ej. 4096x3000")
+    coordinar_parser.add_argument("--sensibilidad", type=float, default=3.0, help="Sensibilidad de detección")
+    coordinar_parser.add_argument("--tablero", choices=list(TIPOS_TABLERO.values()), default="damero",
+                                  help="Tipo de tablero")
+    coordinar_parser.add_argument("--diccionario", choices=list(DICCIONARIOS_CHARUCO), default=DICCIONARIO_CHARUCO,
+                                  help="Diccionario de marcadores del tablero ChArUco")
+    coordinar_parser.add_argument("--paso-video", type=int, default=PASO_VIDEO, help="Un fotograma de cada N")
+    coordinar_parser.add_argument("--movimiento-video", type=float, default=UMBRAL_MOVIMIENTO_VIDEO,
+                                  help="Movimiento mínimo entre fotogramas de vídeo")
+    coordinar_parser.add_argument("--tolerancia", type=float, default=TOLERANCIA_DUPLICADOS,
+                                  help="Tolerancia de poses duplicadas en %% de la diagonal (0 = no detectar)")
+    coordinar_parser.add_argument("--lote", type=int, default=LOTE_DISTRIBUIDO, help="Imágenes por tarea")
+    coordinar_parser.add_argument("--puerto", type=int, default=PUERTO_DISTRIBUIDO, help="Puerto de la cola (0 = libre)")
+    coordinar_parser.add_argument("--clave", default=clave, help=f"Clave compartida (por defecto ${VARIABLE_CLAVE})")
+    coordinar_parser.add_argument("--locales", type=int, default=0, help="Trabajadores a lanzar en este equipo")
+    coordinar_parser.add_argument("--hilos", type=int, default=MAX_WORKERS, help="Hilos de los trabajadores locales")
+    coordinar_parser.set_defaults(func=cli_coordinar)
+    
+    trabajador = subparsers.add_parser("trabajador", help="Procesa lotes de un coordinador")
+    trabajador.add_argument("direccion", help="host:puerto del coordinador")
+    trabajador.add_argument("--clave", default=clave, help=f"Clave compartida (por defecto ${VARIABLE_CLAVE})")
+    trabajador.add_argument("--hilos", type=int, default=MAX_WORKERS, help="Hilos de detección")
+    trabajador.set_defaults(func=cli_trabajador)
+    
+    servicio = subparsers.add_parser("servicio", help="Servicio local de cobertura con hilos y detecciones en memoria")
+    servicio.add_argument("--puerto", type=int, default=PUERTO_SERVICIO, help="Puerto en 127.0.0.1 (0 = libre)")
+    servicio.add_argument("--socket", default=None, help="Socket Unix en lugar del puerto")
+    servicio.add_argument("--hilos", type=int, default=MAX_WORKERS, help="Hilos de detección")
+    servicio.set_defaults(func=cli_servicio)
+    
+    comparar = subparsers.add_parser("comparar", help="Compara caminos rápidos de detección con la referencia")
+    comparar.add_argument("carpeta", nargs="?", default=None,
+                          help="Carpeta de imágenes (si no se indica, se generan imágenes sintéticas)")
+    comparar.add_argument("--caminos", default=None,
+                          help=f"Caminos separados por comas entre {', '.join(CAMINOS_DETECCION)} "
+                               f"(por defecto {','.join(CAMINOS_EQUIVALENTES)})")
+    comparar.add_argument("--referencia", default="referencia", help="Camino de referencia")
+    comparar.add_argument("--sinteticas", type=int, default=IMAGENES_SINTETICAS, help="Imágenes sintéticas a generar")
+    comparar.add_argument("--damero", default=f"{CHESSBOARD_SIZE[0]}x{CHESSBOARD_SIZE[1]}",
+                          help="Esquinas interiores del damero, p. ej. 10x7")
+    comparar.add_argument("--resolucion", default=None,
+                          help="Resolución del mapa de calor (por defecto, la más frecuente de las imágenes)")
+    comparar.add_argument("--sensibilidad", type=float, default=3.0, help="Sensibilidad de detección")
+    comparar.add_argument("--tablero", choices=list(TIPOS_TABLERO.values()), default="damero", help="Tipo de tablero")
+    comparar.add_argument("--diccionario", choices=list(DICCIONARIOS_CHARUCO), default=DICCIONARIO_CHARUCO,
+                          help="Diccionario de marcadores del tablero ChArUco")
+    comparar.add_argument("--tolerancia-px", type=float, default=TOLERANCIA_EQUIVALENCIA_PX,
+                          help="Desplazamiento máximo de una esquina en píxeles")
+    comparar.add_argument("--tolerancia-mapa", type=float, default=TOLERANCIA_EQUIVALENCIA_MAPA,
+                          help="%% máximo de píxeles del mapa de calor distintos del de cv2.fillConvexPoly")
+    comparar.add_argument("--max-diferencias", type=int, default=0,
+                          help="Imágenes que pueden diferir (detección, tamaño o esquinas)")
+    comparar.add_argument("--hilos", type=int, default=MAX_WORKERS, help="Hilos de los caminos paralelos")
+    comparar.add_argument("--json", action="store_true", help="Salida en JSON")
+    comparar.set_defaults(func=cli_comparar)
+    
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
 def main():
+    # Con argumentos se usa la línea de comandos; sin ellos, la interfaz gráfica
+    if len(sys.argv) > 1:
+        sys.exit(main_cli(sys.argv[1:]))
+    
     # Usar ttkbootstrap en lugar de tkinter estándar
     root = ttk.Window(
         title="Generador de Mapa de Calor - Calibración Multi-Cámara",
@@ -0,0 +1,32 @@
+"""Los caminos rápidos de detección deben dar lo mismo que la referencia"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crear_mapa_cobertura import (  # noqa: E402
+    CAMINOS_EQUIVALENTES, CHESSBOARD_SIZE, comparar_caminos, generar_imagenes_sinteticas
+)
+
+
+@pytest.fixture(scope="module")
+def informes(tmp_path_factory):
+    carpeta = tmp_path_factory.mktemp("sinteticas")
+    rutas = generar_imagenes_sinteticas(str(carpeta), n=8)
+    parametros = {
+        'chessboard_size': CHESSBOARD_SIZE,
+        'image_resolution': (2048, 1536),
+        'sensibilidad': 3.0,
+        'tablero': 'damero',
+        'diccionario': '5x5 (100)',
+    }
+    return comparar_caminos(rutas, parametros)
+
+
+@pytest.mark.parametrize("camino", CAMINOS_EQUIVALENTES)
+def test_camino_equivalente(informes, camino):
+    informe = informes[camino]
+    assert informe['detectadas_referencia'] > 0
+    assert informe['equivalente'], informe